@@ -0,0 +1,292 @@
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import Integer, String, and_, func, literal, or_, select, union_all
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import FunctionElement
+
+from . import models, recorrentes
+
+# Uma janela é (cartao_id, inicio, fim_exclusivo). cartao_id None representa os gastos no débito.
+Janela = Tuple[Optional[int], datetime, datetime]
+
+
+def periodo_fatura(ano: int, mes: int, dia_fechamento: int):
+    """
+    Calcula o período de compras para uma fatura.
+    Regra: Para a fatura de Agosto (mês 8) com fechamento dia 20,
+    o período é de 20 de Julho a 19 de Agosto.
+    """
+    # 1. Calcula o fim do período (inclusive).
+    # Este é o dia ANTERIOR ao fechamento da fatura do mês atual.
+    try:
+        fechamento_atual = datetime(ano, mes, dia_fechamento)
+    except ValueError:
+        # Lida com dias inválidos (ex: dia 31), pegando o último dia do mês
+        fechamento_atual = (datetime(ano, mes, 1) + relativedelta(months=1)) - timedelta(days=1)
+    
+    periodo_fim = fechamento_atual - timedelta(days=1)
+
+    # 2. Calcula o início do período (inclusive).
+    # Este é o dia de fechamento do MÊS ANTERIOR.
+    periodo_inicio = fechamento_atual - relativedelta(months=1)
+    
+    return periodo_inicio, periodo_fim
+
+
+def _filtro_janelas(coluna_data, coluna_cartao, janelas: List[Janela]):
+    condicoes = []
+    for cartao_id, inicio, fim in janelas:
+        filtro_cartao = coluna_cartao.is_(None) if cartao_id is None else coluna_cartao == cartao_id
+        condicoes.append(and_(filtro_cartao, coluna_data >= inicio, coluna_data < fim))
+    return or_(*condicoes)
+
+
+class mes_ano(FunctionElement):
+    """Formata uma coluna de data como 'AAAA-MM' no dialeto do banco em uso."""
+    type = String()
+    inherit_cache = True
+
+
+@compiles(mes_ano)
+def _mes_ano_sqlite(elemento, compilador, **kw):
+    return "strftime('%%Y-%%m', %s)" % compilador.process(elemento.clauses, **kw)
+
+
+@compiles(mes_ano, "postgresql")
+def _mes_ano_postgresql(elemento, compilador, **kw):
+    return "to_char(%s, 'YYYY-MM')" % compilador.process(elemento.clauses, **kw)
+
+
+def _lancamentos(filtro_normais, filtro_parcelas, responsavel: Optional[str] = None):
+    """
+    Subconsulta com um lançamento por gasto à vista e um por parcela.
+    Colunas: categoria_id, cartao_id, responsavel, data, valor.
+    """
+    normais = select(
+        models.Gasto.categoria_id,
+        models.Gasto.cartao_id,
+        models.Gasto.responsavel,
+        models.Gasto.data.label("data"),
+        models.Gasto.valor,
+    ).where(models.Gasto.is_parcelado == False, *filtro_normais)
+    parcelas = select(
+        models.Gasto.categoria_id,
+        models.Parcela.cartao_id,
+        models.Gasto.responsavel,
+        models.Parcela.data_vencimento.label("data"),
+        models.Parcela.valor,
+    ).join(models.Parcela.gasto).where(*filtro_parcelas)
+    if responsavel:
+        normais = normais.where(models.Gasto.responsavel == responsavel)
+        parcelas = parcelas.where(models.Gasto.responsavel == responsavel)
+    return union_all(normais, parcelas).subquery("lancamentos")
+
+
+def lancamentos_por_janelas(janelas: List[Janela], responsavel: Optional[str] = None):
+    """Lançamentos que caem nas janelas, cada cartão (ou o débito) com a sua."""
+    return _lancamentos(
+        [_filtro_janelas(models.Gasto.data, models.Gasto.cartao_id, janelas)],
+        [_filtro_janelas(models.Parcela.data_vencimento, models.Parcela.cartao_id, janelas)],
+        responsavel,
+    )
+
+
+def todos_lancamentos():
+    """Todos os lançamentos, sem filtro (base do consolidado mensal)."""
+    return _lancamentos([], [])
+
+
+def lancamentos_de_gastos(ids: List[int]):
+    """Lançamentos (compra à vista ou parcelas) dos gastos da lista."""
+    return _lancamentos([models.Gasto.id.in_(ids)], [models.Gasto.id.in_(ids)])
+
+
+def lancamentos_por_periodo(inicio: datetime, fim: datetime, categoria_id: Optional[int] = None,
+                            cartao_id: Optional[int] = None, responsavel: Optional[str] = None):
+    """Lançamentos entre inicio (inclusive) e fim (exclusivo), com filtros opcionais."""
+    filtro_normais = [models.Gasto.data >= inicio, models.Gasto.data < fim]
+    filtro_parcelas = [models.Parcela.data_vencimento >= inicio, models.Parcela.data_vencimento < fim]
+    if categoria_id:
+        filtro_normais.append(models.Gasto.categoria_id == categoria_id)
+        filtro_parcelas.append(models.Gasto.categoria_id == categoria_id)
+    if cartao_id:
+        filtro_normais.append(models.Gasto.cartao_id == cartao_id)
+        filtro_parcelas.append(models.Parcela.cartao_id == cartao_id)
+    return _lancamentos(filtro_normais, filtro_parcelas, responsavel)
+
+
+def lancamentos_de_cartoes(db: Session, cartao_ids: List[int], inicio: datetime, fim: datetime):
+    """
+    Lançamentos dos cartões entre inicio (inclusive) e fim (exclusivo) numa única consulta.
+    Linhas: (gasto_id, parcela, cartao_id, data, valor); parcela é None nas compras à vista.
+    """
+    normais = select(
+        models.Gasto.id.label("gasto_id"),
+        literal(None, Integer).label("parcela"),
+        models.Gasto.cartao_id,
+        models.Gasto.data.label("data"),
+        models.Gasto.valor,
+    ).where(models.Gasto.is_parcelado == False, models.Gasto.cartao_id.in_(cartao_ids),
+            models.Gasto.data >= inicio, models.Gasto.data < fim)
+    parcelas = select(
+        models.Parcela.gasto_id,
+        models.Parcela.numero,
+        models.Parcela.cartao_id,
+        models.Parcela.data_vencimento,
+        models.Parcela.valor,
+    ).where(models.Parcela.cartao_id.in_(cartao_ids),
+            models.Parcela.data_vencimento >= inicio, models.Parcela.data_vencimento < fim)
+    return db.execute(union_all(normais, parcelas)).all()
+
+
+def totais_agrupados(db: Session, janelas: List[Janela], responsavel: Optional[str] = None):
+    """Soma e conta os lançamentos das janelas agrupando por (categoria_id, cartao_id, responsavel)."""
+    if not janelas:
+        return []
+    lancamentos = lancamentos_por_janelas(janelas, responsavel)
+    consulta = select(
+        lancamentos.c.categoria_id,
+        lancamentos.c.cartao_id,
+        lancamentos.c.responsavel,
+        func.sum(lancamentos.c.valor),
+        func.count(),
+    ).group_by(
+        lancamentos.c.categoria_id,
+        lancamentos.c.cartao_id,
+        lancamentos.c.responsavel,
+    )
+    return db.execute(consulta).all()
+
+
+def totais_consolidados(db: Session, mes: str, somente_debito: bool = False, responsavel: Optional[str] = None):
+    """
+    As mesmas linhas de totais_agrupados para o mês civil 'AAAA-MM' inteiro, lidas do consolidado
+    (resumo_mensal) em vez de somar os lançamentos.
+    """
+    tabela = models.ResumoMensal
+    consulta = select(tabela.categoria_id, tabela.cartao_id, tabela.responsavel, tabela.total, tabela.quantidade).where(
+        tabela.mes == mes
+    )
+    if somente_debito:
+        consulta = consulta.where(tabela.cartao_id.is_(None))
+    if responsavel:
+        consulta = consulta.where(tabela.responsavel == responsavel)
+    return db.execute(consulta).all()
+
+
+def montar_resumo(db: Session, grupos) -> dict:
+    """Consolida as linhas de totais_agrupados no formato do schemas.Resumo."""
+    nomes_categorias = dict(db.query(models.Categoria.id, models.Categoria.nome).all())
+    nomes_cartoes = dict(db.query(models.CartaoCredito.id, models.CartaoCredito.nome).all())
+
+    por_categoria, por_responsavel, por_cartao = {}, {}, {}
+    total_debito = total_cartoes = 0.0
+    quantidade = 0
+
+    def acumular(destino, chave, id, nome, total, qtd):
+        item = destino.setdefault(chave, {"id": id, "nome": nome, "total": 0.0, "quantidade": 0})
+        item["total"] += total
+        item["quantidade"] += qtd
+
+    for categoria_id, cartao_id, responsavel, total, qtd in grupos:
+        total = total or 0.0
+        quantidade += qtd
+        if cartao_id is None:
+            total_debito += total
+        else:
+            total_cartoes += total
+            acumular(por_cartao, cartao_id, cartao_id, nomes_cartoes.get(cartao_id, "Cartão removido"), total, qtd)
+        acumular(por_categoria, categoria_id, categoria_id, nomes_categorias.get(categoria_id, "Sem Categoria"), total, qtd)
+        acumular(por_responsavel, responsavel, None, responsavel, total, qtd)
+
+    def ordenar(itens):
+        for item in itens.values():
+            item["total"] = round(item["total"], 2)
+        return sorted(itens.values(), key=lambda item: item["total"], reverse=True)
+
+    return {
+        "total": round(total_debito + total_cartoes, 2),
+        "total_debito": round(total_debito, 2),
+        "total_cartoes": round(total_cartoes, 2),
+        "quantidade": quantidade,
+        "por_categoria": ordenar(por_categoria),
+        "por_responsavel": ordenar(por_responsavel),
+        "por_cartao": ordenar(por_cartao),
+    }
+
+
+# Dimensões aceitas pelo relatório mensal: coluna da subconsulta e tabela de nomes
+DIMENSOES_RELATORIO = {
+    "categoria": ("categoria_id", models.Categoria),
+    "cartao": ("cartao_id", models.CartaoCredito),
+    "responsavel": ("responsavel", None),
+}
+
+
+def relatorio_mensal(db: Session, meses: List[str], agrupar: Optional[str] = None, categoria_id: Optional[int] = None,
+                     cartao_id: Optional[int] = None, responsavel: Optional[str] = None) -> dict:
+    """
+    Lê o consolidado (resumo_mensal): uma linha por mês e combinação de dimensões, agrupada por 'AAAA-MM'
+    (e pela dimensão pedida). Retorna séries alinhadas à lista de meses, com zero nos meses sem lançamentos.
+    """
+    tabela = models.ResumoMensal
+    colunas = [tabela.mes]
+    if agrupar:
+        colunas.append(getattr(tabela, DIMENSOES_RELATORIO[agrupar][0]))
+    consulta = select(*colunas, func.sum(tabela.total), func.sum(tabela.quantidade)).where(
+        tabela.mes >= meses[0], tabela.mes <= meses[-1]
+    ).group_by(*colunas)
+    if categoria_id:
+        consulta = consulta.where(tabela.categoria_id == categoria_id)
+    if cartao_id:
+        consulta = consulta.where(tabela.cartao_id == cartao_id)
+    if responsavel:
+        consulta = consulta.where(tabela.responsavel == responsavel)
+    linhas = db.execute(consulta).all()
+
+    # Ocorrências dos gastos recorrentes: não estão no consolidado, entram como linhas de um lançamento
+    inicio = datetime.strptime(meses[0], "%Y-%m")
+    fim = datetime.strptime(meses[-1], "%Y-%m") + relativedelta(months=+1)
+    for ocorrencia in recorrentes.ocorrencias(db, inicio, fim, [cartao_id] if cartao_id else None):
+        if (categoria_id and ocorrencia.categoria_id != categoria_id) or (responsavel and ocorrencia.responsavel != responsavel):
+            continue
+        dimensao = [getattr(ocorrencia, DIMENSOES_RELATORIO[agrupar][0])] if agrupar else []
+        linhas.append((ocorrencia.data.strftime("%Y-%m"), *dimensao, ocorrencia.valor, 1))
+
+    posicao = {m: i for i, m in enumerate(meses)}
+    total = [0.0] * len(meses)
+    quantidade = [0] * len(meses)
+    series = {}
+    for linha in linhas:
+        i = posicao.get(linha[0])
+        if i is None:
+            continue
+        soma, qtd = linha[-2] or 0.0, linha[-1]
+        total[i] += soma
+        quantidade[i] += qtd
+        if agrupar:
+            serie = series.setdefault(linha[1], [0.0] * len(meses))
+            serie[i] += soma
+
+    resultado = {
+        "meses": meses,
+        "total": [round(v, 2) for v in total],
+        "quantidade": quantidade,
+        "series": [],
+    }
+    if agrupar:
+        tabela = DIMENSOES_RELATORIO[agrupar][1]
+        nomes = dict(db.query(tabela.id, tabela.nome).all()) if tabela is not None else {}
+        for chave, valores in series.items():
+            if tabela is None:
+                id, nome = None, chave
+            elif chave is None:
+                id, nome = None, "Débito" if agrupar == "cartao" else "Sem Categoria"
+            else:
+                id, nome = chave, nomes.get(chave, "Removido")
+            resultado["series"].append({"id": id, "nome": nome, "valores": [round(v, 2) for v in valores]})
+        resultado["series"].sort(key=lambda serie: sum(serie["valores"]), reverse=True)
+    return resultado
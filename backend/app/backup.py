@@ -0,0 +1,348 @@
+"""
+Backups do banco SQLite sem parar a aplicação.
+
+A cópia usa a API de backup online do SQLite (sqlite3.Connection.backup) em passos de PAGINAS páginas
+com PAUSA_MS entre eles. Cada passo segura o banco só enquanto copia as suas páginas, então as escritas
+seguem entre um passo e outro; a pausa também dilui o I/O da cópia. Uma escrita de outra conexão no meio
+da cópia faz o SQLite recomeçar do início: depois de MAX_REINICIOS recomeços a cópia termina num passo só
+(no modo WAL isso não bloqueia as escritas, só adia o checkpoint).
+
+A cópia é conferida (PRAGMA quick_check), comprimida (gzip ou xz) e ganha um manifesto JSON ao lado, com o
+SHA-256 do arquivo comprimido e do banco. Os arquivos são gravados com outro nome e renomeados no fim: um
+backup interrompido nunca aparece como válido.
+
+restaurar confere os dois SHA-256, descomprime e grava por cima do banco com a mesma API de backup, o que é
+seguro mesmo com a aplicação aberta (reinicie-a depois: os caches em memória não veem a troca). Antes, o
+estado atual vira um backup 'antes-da-restauracao'. O contador de sincronização continua de onde estava,
+com todas as linhas em versão nova e as que sumiram em 'remocoes', para os clientes de GET /sync.
+
+Com BACKUP_INTERVALO_MIN > 0 a aplicação faz um backup a cada intervalo em BACKUP_PASTA (padrão: 'backups'
+ao lado do banco) e mantém os BACKUP_MANTER mais recentes. Comando: backend/backup.py.
+"""
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy.engine import make_url
+
+from . import metricas, sincronizacao
+
+INTERVALO_MIN = float(os.getenv("BACKUP_INTERVALO_MIN", "0"))
+PASTA = os.getenv("BACKUP_PASTA")
+MANTER = int(os.getenv("BACKUP_MANTER", "7"))
+COMPRESSAO = os.getenv("BACKUP_COMPRESSAO", "gzip")
+PAGINAS = int(os.getenv("BACKUP_PAGINAS", "256"))
+PAUSA_MS = float(os.getenv("BACKUP_PAUSA_MS", "10"))
+MAX_REINICIOS = 3
+
+# Nome -> (extensão, função que abre o arquivo comprimido)
+COMPRESSOES = {
+    "gzip": (".gz", lambda caminho, modo: gzip.open(caminho, modo, compresslevel=6)),
+    # lzma.open não aceita preset na leitura
+    "xz": (".xz", lambda caminho, modo: lzma.open(caminho, modo, **({"preset": 6} if "w" in modo else {}))),
+    "nenhuma": ("", open),
+}
+EXTENSAO_MANIFESTO = ".json"
+PREFIXO = "calculadora"
+PEDACO = 1024 * 1024
+
+
+class _MuitosReinicios(Exception):
+    pass
+
+
+def caminho_do_banco(url: str) -> Optional[str]:
+    """Caminho do arquivo de um banco SQLite; None para outros bancos ou banco em memória."""
+    url_obj = make_url(url)
+    if url_obj.get_backend_name() != "sqlite" or url_obj.database in (None, "", ":memory:"):
+        return None
+    return os.path.abspath(url_obj.database)
+
+
+def pasta_padrao(origem: str) -> str:
+    return PASTA or os.path.join(os.path.dirname(origem), "backups")
+
+
+# --- CÓPIA ---
+def copiar(origem: str, destino: str, paginas: int = PAGINAS, pausa_ms: float = PAUSA_MS) -> dict:
+    """Copia o banco em uso para 'destino' (um arquivo SQLite novo). Retorna páginas, passos e recomeços."""
+    estado = {"passos": 0, "reinicios": 0, "restantes": None, "paginas": 0}
+
+    def progresso(_status, restantes, total):
+        estado["passos"] += 1
+        estado["paginas"] = total
+        if estado["restantes"] is not None and restantes > estado["restantes"]:
+            estado["reinicios"] += 1
+            if estado["reinicios"] > MAX_REINICIOS:
+                raise _MuitosReinicios()
+        estado["restantes"] = restantes
+        # O 'sleep' de backup() só vale quando o banco está ocupado; a pausa entre passos fica aqui
+        if restantes and pausa_ms > 0:
+            time.sleep(pausa_ms / 1000)
+
+    fonte = sqlite3.connect(origem, timeout=30)
+    alvo = sqlite3.connect(destino)
+    try:
+        try:
+            fonte.backup(alvo, pages=paginas, progress=progresso, sleep=pausa_ms / 1000)
+        except _MuitosReinicios:
+            fonte.backup(alvo)
+            estado["passos"] += 1
+            estado["passo_unico"] = True
+    finally:
+        alvo.close()
+        fonte.close()
+    del estado["restantes"]
+    return estado
+
+
+def _sha256(caminho: str) -> str:
+    resumo = hashlib.sha256()
+    with open(caminho, "rb") as arquivo:
+        for pedaco in iter(lambda: arquivo.read(PEDACO), b""):
+            resumo.update(pedaco)
+    return resumo.hexdigest()
+
+
+def _versoes(caminho: str) -> dict:
+    conexao = sqlite3.connect(caminho)
+    try:
+        resultado = {"quick_check": conexao.execute("PRAGMA quick_check").fetchone()[0]}
+        for nome, consulta in (("versao_esquema", "SELECT versao FROM versao_esquema"),
+                               ("versao_alteracoes", "SELECT valor FROM versao_alteracoes WHERE id = 1")):
+            try:
+                linha = conexao.execute(consulta).fetchone()
+            except sqlite3.OperationalError: # Banco anterior às migrações
+                linha = None
+            resultado[nome] = linha[0] if linha else None
+        return resultado
+    finally:
+        conexao.close()
+
+
+def _nome_livre(pasta: str, prefixo: str, extensao: str, momento: datetime) -> str:
+    base = f"{prefixo}-{momento.strftime('%Y%m%d-%H%M%S')}"
+    nome, contador = base, 1
+    while os.path.exists(os.path.join(pasta, nome + extensao)):
+        contador += 1
+        nome = f"{base}-{contador}"
+    return nome
+
+
+def fazer_backup(origem: str, pasta: str, compressao: str = COMPRESSAO, paginas: int = PAGINAS,
+                 pausa_ms: float = PAUSA_MS, prefixo: str = PREFIXO) -> dict:
+    """Grava um backup comprimido de 'origem' em 'pasta' e retorna o manifesto (com o caminho do arquivo)."""
+    if compressao not in COMPRESSOES:
+        raise ValueError(f"Compressão deve ser uma de {sorted(COMPRESSOES)}")
+    if not os.path.exists(origem):
+        raise FileNotFoundError(origem)
+    os.makedirs(pasta, exist_ok=True)
+    extensao, abrir = COMPRESSOES[compressao]
+    momento = datetime.utcnow()
+    nome = _nome_livre(pasta, prefixo, ".db" + extensao, momento)
+    arquivo = os.path.join(pasta, nome + ".db" + extensao)
+    # Sem compressão 'arquivo' + ".parcial" seria este mesmo nome
+    temporario = os.path.join(pasta, nome + ".copia.parcial")
+    inicio = time.perf_counter()
+    try:
+        copia = copiar(origem, temporario, paginas, pausa_ms)
+        duracao_copia = time.perf_counter() - inicio
+        conferencia = _versoes(temporario)
+        if conferencia["quick_check"] != "ok":
+            raise RuntimeError(f"A cópia não passou no quick_check: {conferencia['quick_check']}")
+        with open(temporario, "rb") as entrada, abrir(arquivo + ".parcial", "wb") as saida:
+            shutil.copyfileobj(entrada, saida, PEDACO)
+        manifesto = {
+            "arquivo": os.path.basename(arquivo),
+            "criado_em": momento.isoformat(timespec="seconds"),
+            "origem": origem,
+            "compressao": compressao,
+            "tamanho_banco": os.path.getsize(temporario),
+            "sha256_banco": _sha256(temporario),
+            "tamanho": os.path.getsize(arquivo + ".parcial"),
+            "sha256": _sha256(arquivo + ".parcial"),
+            "versao_esquema": conferencia["versao_esquema"],
+            "versao_alteracoes": conferencia["versao_alteracoes"],
+            "paginas": copia["paginas"],
+            "passos": copia["passos"],
+            "reinicios": copia["reinicios"],
+            "duracao_copia_segundos": round(duracao_copia, 3),
+        }
+        manifesto["duracao_segundos"] = round(time.perf_counter() - inicio, 3)
+        os.replace(arquivo + ".parcial", arquivo)
+        with open(os.path.join(pasta, nome + EXTENSAO_MANIFESTO), "w", encoding="utf-8") as saida:
+            json.dump(manifesto, saida, indent=2, ensure_ascii=False)
+    finally:
+        for caminho in (temporario, arquivo + ".parcial"):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+    return {**manifesto, "caminho": arquivo}
+
+
+# --- CONSULTA E RETENÇÃO ---
+def listar(pasta: str) -> List[dict]:
+    """Manifestos dos backups da pasta, do mais antigo para o mais recente (com 'caminho')."""
+    if not os.path.isdir(pasta):
+        return []
+    manifestos = []
+    for nome in os.listdir(pasta):
+        if not nome.endswith(EXTENSAO_MANIFESTO):
+            continue
+        try:
+            with open(os.path.join(pasta, nome), encoding="utf-8") as arquivo:
+                manifesto = json.load(arquivo)
+        except (OSError, ValueError):
+            continue
+        manifesto["caminho"] = os.path.join(pasta, manifesto.get("arquivo", ""))
+        manifesto["_manifesto"] = os.path.join(pasta, nome)
+        manifestos.append(manifesto)
+    return sorted(manifestos, key=lambda manifesto: (manifesto.get("criado_em", ""), manifesto["caminho"]))
+
+
+def aplicar_retencao(pasta: str, manter: int = MANTER, prefixo: str = PREFIXO) -> List[str]:
+    """Apaga os backups com o prefixo além dos 'manter' mais recentes. Retorna os arquivos apagados."""
+    doprefixo = [manifesto for manifesto in listar(pasta) if manifesto.get("arquivo", "").startswith(prefixo + "-")]
+    apagados = []
+    for manifesto in doprefixo[:max(0, len(doprefixo) - manter)]:
+        for caminho in (manifesto["caminho"], manifesto["_manifesto"]):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+        apagados.append(manifesto["caminho"])
+    return apagados
+
+
+def _manifesto_de(arquivo: str) -> dict:
+    pasta, nome = os.path.split(os.path.abspath(arquivo))
+    for manifesto in listar(pasta):
+        if manifesto.get("arquivo") == nome:
+            return manifesto
+    raise ValueError(f"Manifesto de '{nome}' não encontrado em {pasta}")
+
+
+def verificar(arquivo: str) -> dict:
+    """Confere o SHA-256 do arquivo comprimido contra o manifesto. Levanta ValueError se não bate."""
+    manifesto = _manifesto_de(arquivo)
+    if _sha256(arquivo) != manifesto["sha256"]:
+        raise ValueError(f"SHA-256 de '{os.path.basename(arquivo)}' não confere com o manifesto")
+    return manifesto
+
+
+# --- RESTAURAÇÃO ---
+def _estado_de_sincronizacao(caminho: str) -> Optional[dict]:
+    """Contador e ids das tabelas sincronizadas; None se o banco não tem sincronização."""
+    conexao = sqlite3.connect(caminho, timeout=30)
+    try:
+        linha = conexao.execute("SELECT valor FROM versao_alteracoes WHERE id = 1").fetchone()
+        if linha is None:
+            return None
+        ids = {modelo.__tablename__: {linha_id for linha_id, in conexao.execute(f"SELECT id FROM {modelo.__tablename__}")}
+               for modelo in sincronizacao.TABELAS.values()}
+        return {"versao": linha[0], "ids": ids}
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conexao.close()
+
+
+def _continuar_versoes(conexao, anterior: dict):
+    # O contador não pode voltar: clientes de /sync já viram versões até 'anterior'. As linhas restauradas
+    # ganham versão nova (o UPDATE sem mudança passa pelo gatilho) e as que não existem mais viram remoções
+    conexao.execute("UPDATE versao_alteracoes SET valor = MAX(valor, ?) WHERE id = 1", (anterior["versao"],))
+    for tabela, ids_anteriores in anterior["ids"].items():
+        conexao.execute(f"UPDATE {tabela} SET versao = versao")
+        atuais = {linha_id for linha_id, in conexao.execute(f"SELECT id FROM {tabela}")}
+        for linha_id in sorted(ids_anteriores - atuais):
+            conexao.execute("UPDATE versao_alteracoes SET valor = valor + 1 WHERE id = 1")
+            conexao.execute("INSERT INTO remocoes (versao, tabela, linha_id) "
+                            "VALUES ((SELECT valor FROM versao_alteracoes WHERE id = 1), ?, ?)", (tabela, linha_id))
+
+
+def restaurar(arquivo: str, destino: str, pasta_seguranca: Optional[str] = None) -> dict:
+    """
+    Substitui o conteúdo de 'destino' pelo backup. Com pasta_seguranca, o estado atual é salvo antes
+    (prefixo 'antes-da-restauracao', fora da retenção). Retorna o manifesto do backup restaurado.
+    """
+    manifesto = verificar(arquivo)
+    extensao, abrir = COMPRESSOES[manifesto["compressao"]]
+    temporario = os.path.abspath(destino) + ".restaurando"
+    try:
+        with abrir(arquivo, "rb") as entrada, open(temporario, "wb") as saida:
+            shutil.copyfileobj(entrada, saida, PEDACO)
+        if _sha256(temporario) != manifesto["sha256_banco"]:
+            raise ValueError("O banco descomprimido não confere com o SHA-256 do manifesto")
+        anterior = None
+        if os.path.exists(destino):
+            if pasta_seguranca:
+                fazer_backup(destino, pasta_seguranca, prefixo="antes-da-restauracao")
+            anterior = _estado_de_sincronizacao(destino)
+        fonte = sqlite3.connect(temporario)
+        alvo = sqlite3.connect(destino, timeout=30)
+        try:
+            # Num passo só: quem lê o banco vê o estado antigo ou o restaurado, nunca uma mistura
+            fonte.backup(alvo)
+            if anterior is not None and _estado_de_sincronizacao(destino) is not None:
+                with alvo:
+                    _continuar_versoes(alvo, anterior)
+        finally:
+            alvo.close()
+            fonte.close()
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return manifesto
+
+
+# --- AGENDAMENTO ---
+class Agendador:
+    """Thread que faz um backup a cada 'intervalo' segundos e aplica a retenção."""
+
+    def __init__(self, origem: str, pasta: str, intervalo: float, manter: int = MANTER, compressao: str = COMPRESSAO):
+        self.origem = origem
+        self.pasta = pasta
+        self.intervalo = intervalo
+        self.manter = manter
+        self.compressao = compressao
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._rodar, name="backup", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+
+    def _rodar(self):
+        # O primeiro backup sai quando o último da pasta completar um intervalo (ou já, se não houver nenhum)
+        existentes = [manifesto for manifesto in listar(self.pasta) if manifesto.get("arquivo", "").startswith(PREFIXO + "-")]
+        espera = 0.0
+        if existentes:
+            idade = (datetime.utcnow() - datetime.fromisoformat(existentes[-1]["criado_em"])).total_seconds()
+            espera = max(0.0, self.intervalo - idade)
+        while not self._parar.wait(espera):
+            self.executar()
+            espera = self.intervalo
+
+    def executar(self) -> Optional[dict]:
+        try:
+            manifesto = fazer_backup(self.origem, self.pasta, self.compressao)
+            aplicar_retencao(self.pasta, self.manter)
+        except Exception as erro:
+            metricas.registro.incrementar("backup_falhas_total")
+            print(f"Falha no backup de {self.origem}: {erro}")
+            return None
+        metricas.registro.incrementar("backup_total")
+        metricas.registro.incrementar("backup_duracao_segundos_total", manifesto["duracao_segundos"])
+        metricas.registro.incrementar("backup_bytes_total", manifesto["tamanho"])
+        print(f"Backup gravado: {manifesto['caminho']} ({manifesto['duracao_segundos']:.1f} s)")
+        return manifesto
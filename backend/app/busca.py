@@ -0,0 +1,196 @@
+"""
+Busca textual de gastos (GET /gastos/busca).
+
+No SQLite com FTS5 o índice é a tabela virtual 'gastos_fts' (rowid = gastos.id) com nome, anotação,
+nome da categoria e responsável. Gatilhos mantêm o índice em dia em qualquer escrita, inclusive as
+importações e inserções em lote que não passam pelo ORM. Sem FTS5 (ou em outros bancos) a busca cai
+para LIKE, com o mesmo contrato mas sem relevância.
+
+Cada termo digitado vira um prefixo ('merc' acha 'Mercado') e todos precisam aparecer; acentos e
+maiúsculas são ignorados.
+"""
+import base64
+import re
+import weakref
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import column, inspect, literal_column, or_, select, table, tuple_
+from sqlalchemy.orm import Session, joinedload
+
+from . import models
+
+TABELA = "gastos_fts"
+ORDENS = ("relevancia", "data")
+
+# Pesos do bm25 na ordem das colunas: o nome vale mais que a categoria, que vale mais que a anotação
+PESOS = (10.0, 2.0, 4.0, 1.0)
+
+_fts = table(TABELA, column("rowid"), column("rank"))
+_coluna_match = literal_column(TABELA)
+
+# Termos: sequências de letras/dígitos; o resto da entrada (aspas, operadores do FTS5) é descartado
+_TERMO = re.compile(r"\w+", re.UNICODE)
+
+# Engines em que a tabela do índice já foi encontrada (ou não)
+_disponivel = weakref.WeakKeyDictionary()
+
+
+# --- ESQUEMA (usado pela migração) ---
+def _texto_do_gasto(prefixo: str) -> str:
+    return (f"{prefixo}.id, {prefixo}.nome, COALESCE({prefixo}.anotacao, ''), "
+            f"COALESCE((SELECT nome FROM categorias WHERE id = {prefixo}.categoria_id), ''), "
+            f"COALESCE({prefixo}.responsavel, '')")
+
+
+GATILHOS = {
+    "gastos_fts_ai": f"""
+        CREATE TRIGGER IF NOT EXISTS gastos_fts_ai AFTER INSERT ON gastos BEGIN
+            INSERT INTO {TABELA} (rowid, nome, anotacao, categoria, responsavel) VALUES ({_texto_do_gasto('new')});
+        END""",
+    "gastos_fts_ad": f"""
+        CREATE TRIGGER IF NOT EXISTS gastos_fts_ad AFTER DELETE ON gastos BEGIN
+            DELETE FROM {TABELA} WHERE rowid = old.id;
+        END""",
+    "gastos_fts_au": f"""
+        CREATE TRIGGER IF NOT EXISTS gastos_fts_au AFTER UPDATE OF nome, anotacao, categoria_id, responsavel ON gastos BEGIN
+            DELETE FROM {TABELA} WHERE rowid = old.id;
+            INSERT INTO {TABELA} (rowid, nome, anotacao, categoria, responsavel) VALUES ({_texto_do_gasto('new')});
+        END""",
+    "categorias_fts_au": f"""
+        CREATE TRIGGER IF NOT EXISTS categorias_fts_au AFTER UPDATE OF nome ON categorias BEGIN
+            UPDATE {TABELA} SET categoria = new.nome WHERE rowid IN (SELECT id FROM gastos WHERE categoria_id = new.id);
+        END""",
+}
+
+
+def suporta_fts5(conexao) -> bool:
+    if conexao.dialect.name != "sqlite":
+        return False
+    opcoes = {linha[0] for linha in conexao.exec_driver_sql("PRAGMA compile_options")}
+    return "ENABLE_FTS5" in opcoes
+
+
+def criar_indice(conexao) -> bool:
+    """Cria a tabela FTS5, os gatilhos e indexa os gastos existentes. False se o banco não tem FTS5."""
+    if not suporta_fts5(conexao):
+        return False
+    versao = tuple(int(parte) for parte in conexao.exec_driver_sql("SELECT sqlite_version()").scalar().split("."))
+    # remove_diacritics 2 (SQLite 3.27+) também trata letras com mais de um acento combinado
+    diacriticos = 2 if versao >= (3, 27) else 1
+    conexao.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA} USING fts5(nome, anotacao, categoria, responsavel, "
+        f"tokenize='unicode61 remove_diacritics {diacriticos}', prefix='2 3')"
+    )
+    conexao.exec_driver_sql(f"INSERT INTO {TABELA} ({TABELA}, rank) VALUES ('rank', 'bm25({', '.join(map(str, PESOS))})')")
+    for comando in GATILHOS.values():
+        conexao.exec_driver_sql(comando)
+    reconstruir_indice(conexao)
+    return True
+
+
+def reconstruir_indice(conexao):
+    """Reindexa todos os gastos (ex.: depois de mexer no banco com os gatilhos desligados)."""
+    conexao.exec_driver_sql(f"DELETE FROM {TABELA}")
+    conexao.exec_driver_sql(f"INSERT INTO {TABELA} (rowid, nome, anotacao, categoria, responsavel) "
+                            f"SELECT {_texto_do_gasto('gastos')} FROM gastos")
+    conexao.exec_driver_sql(f"INSERT INTO {TABELA} ({TABELA}) VALUES ('optimize')")
+
+
+def indice_disponivel(db: Session) -> bool:
+    engine = db.get_bind()
+    if engine not in _disponivel:
+        _disponivel[engine] = inspect(engine).has_table(TABELA)
+    return _disponivel[engine]
+
+
+# --- CONSULTA ---
+def termos(texto: str) -> List[str]:
+    return _TERMO.findall(texto)
+
+
+def expressao_fts(lista_termos: List[str]) -> str:
+    # Cada termo entre aspas (literal para o FTS5) e com '*' para casar como prefixo
+    return " ".join(f'"{termo}"*' for termo in lista_termos)
+
+
+def encode_cursor(chave, gasto_id: int) -> str:
+    valor = chave.isoformat() if isinstance(chave, datetime) else repr(chave)
+    return base64.urlsafe_b64encode(f"{valor}|{gasto_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str, ordem: str) -> Tuple[object, int]:
+    """Levanta ValueError se o cursor não foi gerado por encode_cursor para a mesma ordem."""
+    valor, gasto_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    chave = datetime.fromisoformat(valor) if ordem == "data" else float(valor)
+    return chave, int(gasto_id)
+
+
+def _filtros(consulta, data_inicio, data_fim, cartao_id, categoria_id):
+    if data_inicio:
+        consulta = consulta.where(models.Gasto.data >= data_inicio)
+    if data_fim:
+        consulta = consulta.where(models.Gasto.data < data_fim)
+    if cartao_id:
+        consulta = consulta.where(models.Gasto.cartao_id == cartao_id)
+    if categoria_id:
+        consulta = consulta.where(models.Gasto.categoria_id == categoria_id)
+    return consulta
+
+
+def _ids_fts(db: Session, lista_termos, ordem, limit, cursor, **filtros):
+    consulta = select(models.Gasto.id, _fts.c.rank, models.Gasto.data).join_from(
+        _fts, models.Gasto, models.Gasto.id == _fts.c.rowid
+    ).where(_coluna_match.op("MATCH")(expressao_fts(lista_termos)))
+    consulta = _filtros(consulta, **filtros)
+    if ordem == "relevancia":
+        # rank do FTS5 = bm25 com os PESOS; menor é mais relevante
+        if cursor:
+            consulta = consulta.where(or_(_fts.c.rank > cursor[0], (_fts.c.rank == cursor[0]) & (models.Gasto.id < cursor[1])))
+        consulta = consulta.order_by(_fts.c.rank, models.Gasto.id.desc())
+    else:
+        if cursor:
+            consulta = consulta.where(tuple_(models.Gasto.data, models.Gasto.id) < tuple_(*cursor))
+        consulta = consulta.order_by(models.Gasto.data.desc(), models.Gasto.id.desc())
+    return [(gasto_id, rank if ordem == "relevancia" else data) for gasto_id, rank, data in db.execute(consulta.limit(limit))]
+
+
+def _ids_like(db: Session, lista_termos, ordem, limit, cursor, **filtros):
+    # Sem índice textual: cada termo precisa começar alguma palavra de algum dos campos; sem relevância, sempre por data
+    consulta = select(models.Gasto.id, models.Gasto.data).join(models.Gasto.categoria)
+    campos = (models.Gasto.nome, models.Gasto.anotacao, models.Categoria.nome, models.Gasto.responsavel)
+    for termo in lista_termos:
+        consulta = consulta.where(or_(*(condicao for campo in campos
+                                        for condicao in (campo.ilike(f"{termo}%"), campo.ilike(f"% {termo}%")))))
+    consulta = _filtros(consulta, **filtros)
+    if cursor:
+        consulta = consulta.where(tuple_(models.Gasto.data, models.Gasto.id) < tuple_(*cursor))
+    consulta = consulta.order_by(models.Gasto.data.desc(), models.Gasto.id.desc())
+    return list(db.execute(consulta.limit(limit)))
+
+
+def buscar(db: Session, texto: str, ordem: str = "relevancia", limit: int = 50, cursor: Optional[str] = None,
+           data_inicio: Optional[datetime] = None, data_fim: Optional[datetime] = None,
+           cartao_id: Optional[int] = None, categoria_id: Optional[int] = None) -> dict:
+    """
+    Uma página de gastos (compras parceladas uma vez, com o valor total) que contêm todos os termos.
+    Levanta ValueError para texto sem termos ou cursor inválido.
+    """
+    lista_termos = termos(texto)
+    if not lista_termos:
+        raise ValueError("Informe ao menos um termo de busca")
+    usa_fts = indice_disponivel(db)
+    if not usa_fts:
+        ordem = "data"
+    posicao = decode_cursor(cursor, ordem) if cursor else None
+    filtros = {"data_inicio": data_inicio, "data_fim": data_fim, "cartao_id": cartao_id, "categoria_id": categoria_id}
+    buscar_ids = _ids_fts if usa_fts else _ids_like
+    chaves = buscar_ids(db, lista_termos, ordem, limit, posicao, **filtros)
+
+    ids = [gasto_id for gasto_id, _ in chaves]
+    gastos = {gasto.id: gasto for gasto in db.query(models.Gasto).options(
+        joinedload(models.Gasto.categoria),
+        joinedload(models.Gasto.cartao)
+    ).filter(models.Gasto.id.in_(ids))} if ids else {}
+    proximo_cursor = encode_cursor(chaves[-1][1], chaves[-1][0]) if len(chaves) == limit else None
+    return {"itens": [gastos[gasto_id] for gasto_id in ids], "proximo_cursor": proximo_cursor}
@@ -0,0 +1,113 @@
+"""
+Cache em processo das respostas das telas de mês e de fatura.
+
+Cada entrada guarda o JSON já serializado, o ETag e a abrangência dos dados que ela mostra:
+o intervalo de datas [inicio, fim) e o cartão (None = qualquer cartão ou débito). As escritas de
+gastos invalidam só as entradas que cruzam o intervalo e o cartão tocados; escritas em categorias e
+cartões limpam tudo, já que os nomes aparecem embutidos nos gastos.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Hashable, Iterable, List, Optional, Tuple
+
+from .parcelas import calcular_parcelas, como_datetime
+
+# CACHE_MAX_ENTRADAS=0 desliga o armazenamento (o ETag continua sendo enviado)
+MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "256"))
+
+# (inicio, fim exclusivo, cartao_id) afetados por uma escrita
+Abrangencia = Tuple[datetime, datetime, Optional[int]]
+
+
+class Entrada:
+    __slots__ = ("corpo", "etag", "inicio", "fim", "cartao_id")
+
+    def __init__(self, corpo: bytes, inicio: datetime, fim: datetime, cartao_id: Optional[int]):
+        self.corpo = corpo
+        self.etag = '"' + hashlib.blake2b(corpo, digest_size=16).hexdigest() + '"'
+        self.inicio = inicio
+        self.fim = fim
+        self.cartao_id = cartao_id
+
+    def afetada_por(self, inicio: datetime, fim: datetime, cartao_id: Optional[int]) -> bool:
+        if self.inicio >= fim or inicio >= self.fim:
+            return False
+        return self.cartao_id is None or self.cartao_id == cartao_id
+
+
+class CacheRespostas:
+    """LRU limitado. Leituras vêm do event loop e invalidações do threadpool, por isso o lock."""
+
+    def __init__(self, max_entradas: int = MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[Hashable, Entrada]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Incrementada a cada invalidação: uma resposta calculada antes dela não pode ser guardada depois
+        self.geracao = 0
+        # Falso no modo com vários workers: as escritas acontecem em outro processo e não invalidariam nada aqui
+        self.ativo = True
+        self.acertos = 0
+        self.falhas = 0
+
+    def obter(self, chave: Hashable) -> Optional[Entrada]:
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return entrada
+
+    def guardar(self, chave: Hashable, corpo: bytes, inicio: datetime, fim: datetime,
+                cartao_id: Optional[int], geracao: int) -> Entrada:
+        entrada = Entrada(corpo, inicio, fim, cartao_id)
+        with self._lock:
+            if self.max_entradas <= 0 or geracao != self.geracao:
+                return entrada
+            self._entradas[chave] = entrada
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return entrada
+
+    def invalidar(self, abrangencias: Iterable[Abrangencia]) -> int:
+        abrangencias = list(abrangencias)
+        with self._lock:
+            self.geracao += 1
+            removidas = [chave for chave, entrada in self._entradas.items()
+                         if any(entrada.afetada_por(*abrangencia) for abrangencia in abrangencias)]
+            for chave in removidas:
+                del self._entradas[chave]
+        return len(removidas)
+
+    def limpar(self):
+        with self._lock:
+            self.geracao += 1
+            self._entradas.clear()
+
+    def desativar(self):
+        """Não guarda mais respostas (o ETag continua sendo calculado e enviado)."""
+        with self._lock:
+            self.ativo = False
+            self.max_entradas = 0
+            self.geracao += 1
+            self._entradas.clear()
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+def abrangencia_gasto(gasto) -> List[Abrangencia]:
+    """
+    Intervalo que um gasto ocupa nas telas: a data da compra e, se parcelado, todos os vencimentos.
+    Aceita o modelo ou qualquer objeto com os mesmos atributos (ex.: valores antigos de um update).
+    """
+    datas = [como_datetime(gasto.data)] + [dados["data_vencimento"] for dados in calcular_parcelas(gasto)]
+    return [(min(datas), max(datas) + timedelta(days=1), gasto.cartao_id)]
+
+
+respostas = CacheRespostas()
@@ -0,0 +1,139 @@
+"""
+Formato compacto das listas de gastos (formato=compacto nas rotas de mês e de fatura).
+
+Em vez de repetir categoria e cartão completos em cada linha, a resposta traz:
+  campos      nomes das colunas de cada linha
+  linhas      uma lista de valores por gasto, na ordem de 'campos' (categoria_id/cartao_id no lugar dos objetos)
+  categorias  e cartoes: cada registro referenciado, enviado uma única vez
+As linhas saem direto de colunas escalares do banco, sem passar por schemas.Gasto, e o JSON é
+codificado com orjson quando o pacote está instalado.
+"""
+import json
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import Integer, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from . import metricas, models, recorrentes
+from . import referencias as _referencias
+
+try:
+    import orjson
+except ImportError: # orjson é opcional; sem ele usamos o json da biblioteca padrão
+    orjson = None
+
+FORMATOS = ("completo", "compacto")
+
+CAMPOS = ["id", "nome", "anotacao", "valor", "responsavel", "data", "categoria_id", "cartao_id",
+          "is_parcelado", "numero_parcelas", "valor_parcela", "parcela_atual"]
+# Posições usadas ao montar as linhas das parcelas
+POSICAO_VALOR = CAMPOS.index("valor")
+POSICAO_DATA = CAMPOS.index("data")
+POSICAO_PARCELA = CAMPOS.index("parcela_atual")
+
+# Ids por consulta ao buscar gastos pelo id
+TAMANHO_LOTE_IDS = 500
+
+
+def _padrao_json(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(valor).__name__}")
+
+
+def codificar(dados) -> bytes:
+    """JSON em bytes; datas no mesmo formato ISO que o Pydantic usa nas respostas completas."""
+    with metricas.serializando():
+        if orjson is not None:
+            return orjson.dumps(dados)
+        return json.dumps(dados, default=_padrao_json, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _selecao(valor, parcela):
+    return select(models.Gasto.id, models.Gasto.nome, models.Gasto.anotacao, valor, models.Gasto.responsavel,
+                  models.Gasto.data, models.Gasto.categoria_id, models.Gasto.cartao_id, models.Gasto.is_parcelado,
+                  models.Gasto.numero_parcelas, models.Gasto.valor_parcela, parcela)
+
+
+def linhas_do_periodo(db: Session, data_inicio: datetime, data_fim: datetime, cartao_id: Optional[int] = None,
+                      somente_debito: bool = False) -> List[list]:
+    """
+    Linhas de main._get_gastos_por_periodo: compras à vista na data, parcelas no vencimento (valor da parcela)
+    e as ocorrências dos gastos recorrentes (id negativo).
+    """
+    normais = _selecao(models.Gasto.valor, literal(None, Integer)).where(
+        models.Gasto.is_parcelado == False,
+        models.Gasto.data >= data_inicio,
+        models.Gasto.data < data_fim
+    )
+    parcelas = _selecao(models.Parcela.valor, models.Parcela.numero).join_from(
+        models.Parcela, models.Gasto, models.Parcela.gasto_id == models.Gasto.id
+    ).where(
+        models.Parcela.data_vencimento >= data_inicio,
+        models.Parcela.data_vencimento < data_fim
+    )
+    if cartao_id:
+        normais = normais.where(models.Gasto.cartao_id == cartao_id)
+        parcelas = parcelas.where(models.Parcela.cartao_id == cartao_id)
+    if somente_debito:
+        normais = normais.where(models.Gasto.cartao_id.is_(None))
+        parcelas = parcelas.where(models.Gasto.cartao_id.is_(None))
+    linhas = [list(linha) for linha in db.execute(union_all(normais, parcelas))]
+    cartoes = [None] if somente_debito else [cartao_id] if cartao_id else None
+    linhas.extend(recorrentes.como_linha(ocorrencia) for ocorrencia in recorrentes.ocorrencias(db, data_inicio, data_fim, cartoes))
+    linhas.sort(key=lambda linha: (linha[POSICAO_DATA], linha[0]), reverse=True)
+    return linhas
+
+
+def linhas_parceladas(db: Session, data_inicio_mes: datetime, data_fim_mes: datetime) -> List[list]:
+    """Linhas de main._get_parcelados_do_mes: valor total da compra e a parcela que vence no mês."""
+    consulta = _selecao(models.Gasto.valor, models.Parcela.numero).join_from(
+        models.Parcela, models.Gasto, models.Parcela.gasto_id == models.Gasto.id
+    ).where(
+        models.Parcela.data_vencimento >= data_inicio_mes,
+        models.Parcela.data_vencimento < data_fim_mes
+    ).order_by(models.Gasto.data.desc(), models.Gasto.id.desc())
+    return [list(linha) for linha in db.execute(consulta)]
+
+
+def linhas_por_id(db: Session, ids: Iterable[int]) -> Dict[int, list]:
+    """Linha de cada gasto (valor cheio, sem parcela_atual), buscada em lotes de ids."""
+    ids = sorted(set(ids))
+    linhas = {}
+    for inicio in range(0, len(ids), TAMANHO_LOTE_IDS):
+        consulta = _selecao(models.Gasto.valor, literal(None, Integer)).where(
+            models.Gasto.id.in_(ids[inicio:inicio + TAMANHO_LOTE_IDS]))
+        for linha in db.execute(consulta):
+            linhas[linha[0]] = list(linha)
+    return linhas
+
+
+def linha_da_parcela(linha: list, numero: int, valor: float) -> list:
+    linha = list(linha)
+    linha[POSICAO_VALOR] = valor
+    linha[POSICAO_PARCELA] = numero
+    return linha
+
+
+def referencias(db: Session, linhas: Iterable[list]) -> dict:
+    """Categorias e cartões citados pelas linhas, cada um uma vez (da memória, ver referencias.py)."""
+    categoria_ids, cartao_ids = set(), set()
+    for linha in linhas:
+        categoria_ids.add(linha[6])
+        if linha[7] is not None:
+            cartao_ids.add(linha[7])
+    atual = _referencias.cobrindo(db, categoria_ids, cartao_ids)
+    categorias = [atual.categorias[i] for i in sorted(categoria_ids) if i in atual.categorias]
+    cartoes = [atual.cartoes[i] for i in sorted(cartao_ids) if i in atual.cartoes]
+    return {
+        "campos": CAMPOS,
+        "categorias": [{"id": c.id, "nome": c.nome, "is_active": c.is_active} for c in categorias],
+        "cartoes": [{"id": c.id, "nome": c.nome, "dia_fechamento": c.dia_fechamento, "is_active": c.is_active}
+                    for c in cartoes],
+    }
+
+
+def lista(db: Session, linhas: List[list]) -> dict:
+    """Payload compacto de uma lista de gastos."""
+    return {**referencias(db, linhas), "linhas": linhas}
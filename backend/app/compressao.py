@@ -0,0 +1,122 @@
+"""
+Compressão das respostas (COMPRESSAO=1): brotli quando o pacote opcional 'brotli' está instalado e o cliente
+aceita 'br', senão gzip. Respostas menores que COMPRESSAO_MINIMO bytes (padrão 1024) saem como estão.
+Respostas em streaming (NDJSON, exportações) são comprimidas pedaço a pedaço, sem juntar o corpo.
+"""
+import os
+import zlib
+
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError: # brotli é opcional; sem ele só gzip é oferecido
+    brotli = None
+
+HABILITADA = os.getenv("COMPRESSAO", "0").lower() in ("1", "true", "sim")
+MINIMO = int(os.getenv("COMPRESSAO_MINIMO", "1024"))
+# Corpos maiores que isso são comprimidos no threadpool para não travar o event loop
+LIMITE_NO_LOOP = 128 * 1024
+
+
+class _Gzip:
+    codificacao = "gzip"
+
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def comprimir(self, corpo: bytes, final: bool) -> bytes:
+        return self._compressor.compress(corpo) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Brotli:
+    codificacao = "br"
+
+    def __init__(self):
+        # Qualidade 5: bem mais rápida que a padrão (11) e ainda menor que o gzip
+        self._compressor = brotli.Compressor(quality=5)
+
+    def comprimir(self, corpo: bytes, final: bool) -> bytes:
+        saida = self._compressor.process(corpo)
+        return saida + (self._compressor.finish() if final else self._compressor.flush())
+
+
+def _escolher(accept_encoding: str):
+    aceitas = {parte.split(";")[0].strip().lower() for parte in accept_encoding.split(",")}
+    if brotli is not None and "br" in aceitas:
+        return _Brotli
+    if "gzip" in aceitas:
+        return _Gzip
+    return None
+
+
+class MiddlewareCompressao:
+    def __init__(self, app, minimo: int = MINIMO):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        tipo = _escolher(Headers(scope=scope).get("accept-encoding", ""))
+        if tipo is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None
+        compressor = None
+        ignorar = False
+
+        async def enviar(mensagem):
+            nonlocal inicio, compressor, ignorar
+            if mensagem["type"] == "http.response.start":
+                cabecalhos = Headers(raw=mensagem["headers"])
+                # Já comprimida ou sem corpo (ex.: 304): repassa sem mexer
+                ignorar = "content-encoding" in cabecalhos or mensagem["status"] in (204, 304)
+                if ignorar:
+                    await send(mensagem)
+                else:
+                    inicio = mensagem
+                return
+            if mensagem["type"] != "http.response.body" or ignorar:
+                await send(mensagem)
+                return
+
+            corpo = mensagem.get("body", b"")
+            continua = mensagem.get("more_body", False)
+            if inicio is not None:
+                cabecalhos = MutableHeaders(raw=inicio["headers"])
+                cabecalhos.add_vary_header("Accept-Encoding")
+                if not continua and len(corpo) < self.minimo:
+                    await send(inicio)
+                    await send(mensagem)
+                    ignorar = True
+                    return
+                compressor = tipo()
+                cabecalhos["Content-Encoding"] = compressor.codificacao
+                if "content-length" in cabecalhos:
+                    del cabecalhos["Content-Length"]
+                # O corpo enviado deixa de ser byte a byte o do ETag; o cache HTTP aceita um ETag fraco
+                etag = cabecalhos.get("etag")
+                if etag and not etag.startswith("W/"):
+                    cabecalhos["ETag"] = "W/" + etag
+                if not continua:
+                    corpo = await self._comprimir(compressor, corpo, True)
+                    cabecalhos["Content-Length"] = str(len(corpo))
+                    await send(inicio)
+                    await send({"type": "http.response.body", "body": corpo})
+                    return
+                await send(inicio)
+                inicio = None
+            await send({"type": "http.response.body", "body": await self._comprimir(compressor, corpo, not continua),
+                        "more_body": continua})
+
+        await self.app(scope, receive, enviar)
+
+    @staticmethod
+    async def _comprimir(compressor, corpo: bytes, final: bool) -> bytes:
+        if len(corpo) > LIMITE_NO_LOOP:
+            return await run_in_threadpool(compressor.comprimir, corpo, final)
+        return compressor.comprimir(corpo, final)
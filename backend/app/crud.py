@@ -1,5 +1,10 @@
 # backend/app/crud.py
-from sqlalchemy.orm import Session
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session, joinedload
 from . import models, schemas
 
 # Função para criar um novo gasto
@@ -10,6 +15,49 @@ def create_gasto(db: Session, gasto: schemas.GastoCreate):
     db.refresh(db_gasto)
     return db_gasto
 
-# Função para buscar uma lista de gastos
-def get_gastos(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Gasto).offset(skip).limit(limit).all()
\ No newline at end of file
+# --- Paginação por chave (keyset) sobre (data, id), a mesma ordem das listagens ---
+def encode_cursor(data: datetime, gasto_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{data.isoformat()}|{gasto_id}".encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Levanta ValueError se o cursor não foi gerado por encode_cursor."""
+    data, gasto_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(data), int(gasto_id)
+
+def query_gastos(db: Session, data_inicio: Optional[datetime] = None, data_fim: Optional[datetime] = None,
+                 cartao_id: Optional[int] = None, categoria_id: Optional[int] = None):
+    """Gastos (sem expandir parcelas) do mais recente para o mais antigo, com filtros opcionais."""
+    query = db.query(models.Gasto).options(
+        joinedload(models.Gasto.categoria),
+        joinedload(models.Gasto.cartao)
+    )
+    if data_inicio:
+        query = query.filter(models.Gasto.data >= data_inicio)
+    if data_fim:
+        query = query.filter(models.Gasto.data < data_fim)
+    if cartao_id:
+        query = query.filter(models.Gasto.cartao_id == cartao_id)
+    if categoria_id:
+        query = query.filter(models.Gasto.categoria_id == categoria_id)
+    return query.order_by(models.Gasto.data.desc(), models.Gasto.id.desc())
+
+# Função para buscar uma página de gastos
+def get_gastos(db: Session, limit: int = 100, cursor: Optional[Tuple[datetime, int]] = None, **filtros):
+    """
+    Retorna até 'limit' gastos estritamente depois do cursor (data, id) na ordem decrescente.
+    Ao contrário de OFFSET, o custo não cresce com a profundidade da página: o filtro usa o índice de 'data'.
+    """
+    query = query_gastos(db, **filtros)
+    if cursor:
+        query = query.filter(tuple_(models.Gasto.data, models.Gasto.id) < tuple_(*cursor))
+    return query.limit(limit).all()
+
+# Página de contribuições de uma meta, da mais recente para a mais antiga
+def get_contribuicoes(db: Session, meta_id: int, limit: int = 100, cursor: Optional[Tuple[datetime, int]] = None,
+                      responsavel: Optional[str] = None):
+    query = db.query(models.Contribuicao).filter(models.Contribuicao.meta_id == meta_id)
+    if responsavel:
+        query = query.filter(models.Contribuicao.responsavel == responsavel)
+    if cursor:
+        query = query.filter(tuple_(models.Contribuicao.data_contribuicao, models.Contribuicao.id) < tuple_(*cursor))
+    return query.order_by(models.Contribuicao.data_contribuicao.desc(), models.Contribuicao.id.desc()).limit(limit).all()
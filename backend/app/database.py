@@ -1,14 +1,129 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.declarative import declarative_base
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db")
 
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# --- PERFIS DO SQLITE ---
+# "padrao" mantém o comportamento original do SQLite (journal DELETE, synchronous FULL).
+# "desempenho" usa WAL: leituras não bloqueiam a escrita e cada commit só faz fsync no checkpoint.
+PERFIS = {
+    "padrao": {},
+    "desempenho": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64 * 1024, # Negativo = KiB, ou seja, 64 MiB por conexão
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
 
-Base = declarative_base()
\ No newline at end of file
+# Cada pragma pode ser sobrescrito por variável de ambiente, ex.: SQLITE_SYNCHRONOUS=FULL
+PRAGMAS = ("journal_mode", "synchronous", "mmap_size", "cache_size", "temp_store", "busy_timeout")
+
+
+def configuracao_sqlite(perfil: str = None) -> dict:
+    perfil = perfil or os.getenv("DB_PERFIL", "desempenho")
+    if perfil not in PERFIS:
+        raise ValueError(f"Perfil de banco desconhecido: '{perfil}'. Use um de {sorted(PERFIS)}.")
+    pragmas = dict(PERFIS[perfil])
+    for nome in PRAGMAS:
+        valor = os.getenv(f"SQLITE_{nome.upper()}")
+        if valor:
+            pragmas[nome] = valor
+    return pragmas
+
+
+def criar_engine(url: str = None, perfil: str = None):
+    """
+    Cria a engine do SQLAlchemy aplicando o perfil de pragmas em cada conexão nova do pool.
+    Para bancos que não são SQLite, só o tamanho do pool é configurado.
+    """
+    url = url or DATABASE_URL
+    opcoes = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "8")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "8")),
+    }
+    if make_url(url).get_backend_name() != "sqlite":
+        return create_engine(url, **opcoes)
+
+    if make_url(url).database in (None, "", ":memory:"):
+        # Banco em memória existe só na conexão: sem pool
+        opcoes = {}
+    engine = create_engine(url, connect_args={"check_same_thread": False}, **opcoes)
+    _registrar_pragmas(engine, perfil)
+    return engine
+
+
+def _registrar_pragmas(engine, perfil: str = None):
+    pragmas = configuracao_sqlite(perfil)
+
+    @event.listens_for(engine, "connect")
+    def aplicar_pragmas(conexao_dbapi, _registro):
+        cursor = conexao_dbapi.cursor()
+        for nome, valor in pragmas.items():
+            cursor.execute(f"PRAGMA {nome}={valor}")
+        cursor.close()
+
+
+# --- MODO ASSÍNCRONO ---
+# Com DB_ASYNC=1 as rotas de leitura usam uma engine assíncrona (aiosqlite no SQLite, asyncpg no PostgreSQL)
+# e não ocupam o threadpool enquanto esperam o banco. As escritas continuam na engine síncrona.
+DRIVERS_ASYNC = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+
+def modo_async() -> bool:
+    return os.getenv("DB_ASYNC", "").lower() in ("1", "true", "sim")
+
+
+def url_async(url: str) -> str:
+    """Troca o driver da URL pelo equivalente assíncrono (mantém o driver se ele já for assíncrono)."""
+    url_obj = make_url(url)
+    if url_obj.get_dialect().is_async:
+        return url
+    backend = url_obj.get_backend_name()
+    if backend not in DRIVERS_ASYNC:
+        raise ValueError(f"Não há driver assíncrono configurado para o banco '{backend}'.")
+    return url_obj.set(drivername=DRIVERS_ASYNC[backend]).render_as_string(hide_password=False)
+
+
+def criar_engine_async(url: str = None, perfil: str = None):
+    """
+    Cria a AsyncEngine equivalente a criar_engine: mesmo pool e, no SQLite, os mesmos pragmas.
+    Requer os pacotes opcionais 'greenlet' e 'aiosqlite' (ou 'asyncpg').
+    """
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = url_async(url or DATABASE_URL)
+    opcoes = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "8")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "8")),
+    }
+    if make_url(url).get_backend_name() != "sqlite":
+        return create_async_engine(url, **opcoes)
+
+    if make_url(url).database in (None, "", ":memory:"):
+        opcoes = {}
+    engine = create_async_engine(url, **opcoes)
+    # Os eventos de conexão ficam na engine síncrona que a AsyncEngine envolve
+    _registrar_pragmas(engine.sync_engine, perfil)
+    return engine
+
+
+class SessaoBanco:
+    """
+    Sessão entregue às rotas de leitura. As consultas continuam sendo funções síncronas que recebem
+    uma Session; executar() roda a função no threadpool (modo síncrono) ou via AsyncSession.run_sync
+    (modo assíncrono), sem bloquear o event loop em nenhum dos dois.
+    """
+
+    def __init__(self, sessao=None, sessao_async=None):
+        self.sessao = sessao
+        self.sessao_async = sessao_async
+
+    async def executar(self, funcao, *args, **kwargs):
+        if self.sessao_async is not None:
+            return await self.sessao_async.run_sync(funcao, *args, **kwargs)
+        return await run_in_threadpool(funcao, self.sessao, *args, **kwargs)
@@ -0,0 +1,327 @@
+"""
+Escritas num processo só, para o modo com vários workers (backend/servidor_producao.py).
+
+Com SQLite, vários processos gravando ao mesmo tempo disputam o lock do banco e os commits concorrentes
+voltam "database is locked". Nesse modo cada worker atende as leituras e repassa as requisições de
+escrita (POST, PUT, PATCH e DELETE) ao processo escritor por multiprocessing.connection. O escritor roda a
+mesma aplicação: junta as requisições que chegaram enquanto o lote anterior era gravado, executa uma a
+uma, cada qual no seu SAVEPOINT (uma que falha não desfaz as outras), e faz um único COMMIT, ou seja, um
+fsync, para o lote inteiro. As respostas só voltam depois do commit, com o status e o corpo que a rota
+gerou (ids incluídos).
+
+Variáveis: ESCRITOR_ENDERECO ("host:porta" ou caminho de um socket Unix), ESCRITOR_CHAVE (authkey das
+conexões, obrigatória), ESCRITOR_MAX_LOTE (requisições por commit, padrão 64) e ESCRITOR_ESPERA_MS
+(janela extra para juntar escritas antes de gravar, padrão 0).
+
+A importação de extratos (ROTAS_DIRETAS) não passa pelo escritor: o corpo pode ter muitos MB e ela grava em
+vários commits, um por lote de linhas. Repassada, ela iria inteira na memória do worker e ocuparia um lote
+do escritor, segurando o lock de escrita (e todas as outras escritas) até o fim. O worker grava direto, e o
+busy_timeout do perfil de banco faz os commits dele e os do escritor se revezarem.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from contextvars import ContextVar
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from typing import List, Optional, Tuple, Union
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from . import database
+
+METODOS_ESCRITA = {"POST", "PUT", "PATCH", "DELETE"}
+# (método, caminho) das escritas que o worker executa ele mesmo
+ROTAS_DIRETAS = {("POST", "/gastos/import")}
+MAX_LOTE = int(os.getenv("ESCRITOR_MAX_LOTE", "64"))
+ESPERA_MS = float(os.getenv("ESCRITOR_ESPERA_MS", "0"))
+
+# Chaves do escopo ASGI repassadas ao escritor junto com o corpo
+CAMPOS_ESCOPO = ("method", "path", "raw_path", "root_path", "query_string", "headers", "scheme", "http_version",
+                 "client", "server")
+
+# (status, cabecalhos, corpo)
+Resposta = Tuple[int, List[Tuple[bytes, bytes]], bytes]
+
+_JSON = [(b"content-type", b"application/json")]
+RESPOSTA_INDISPONIVEL: Resposta = (503, _JSON, '{"detail":"Processo de escrita indisponível"}'.encode())
+RESPOSTA_FALHA_LOTE: Resposta = (503, _JSON, '{"detail":"Falha ao gravar as alterações; tente novamente"}'.encode())
+
+logger = logging.getLogger("calculadora.escritor")
+
+# Conexão com a transação do lote em andamento; preenchida no escritor enquanto uma requisição executa
+conexao_do_lote: ContextVar = ContextVar("conexao_do_lote", default=None)
+
+# Verdadeiro no processo escritor, que executa as escritas em vez de repassá-las
+NESTE_PROCESSO = False
+
+
+def endereco(texto: Optional[str] = None) -> Union[Tuple[str, int], str]:
+    """'host:porta' vira endereço TCP; qualquer outro texto é o caminho de um socket Unix (ou pipe no Windows)."""
+    texto = texto or os.getenv("ESCRITOR_ENDERECO")
+    if not texto:
+        raise RuntimeError("Defina ESCRITOR_ENDERECO com o endereço do processo escritor.")
+    host, separador, porta = texto.rpartition(":")
+    if separador and porta.isdigit():
+        return host, int(porta)
+    return texto
+
+
+def chave(texto: Optional[str] = None) -> bytes:
+    # As mensagens são pickles: sem autenticação qualquer processo que alcance o endereço executaria escritas
+    texto = texto or os.getenv("ESCRITOR_CHAVE")
+    if not texto:
+        raise RuntimeError("Defina ESCRITOR_CHAVE com a chave compartilhada entre os workers e o escritor.")
+    return texto.encode()
+
+
+def delegar_escritas() -> bool:
+    """Este processo é um worker que deve repassar as escritas (ESCRITOR_ENDERECO definido, fora do escritor)."""
+    return bool(os.getenv("ESCRITOR_ENDERECO")) and not NESTE_PROCESSO
+
+
+def aguardar(endereco_escritor, chave_escritor: bytes, timeout: float = 60.0) -> bool:
+    """Espera o escritor aceitar conexões (ele só escuta depois das migrações). False se o tempo acabar."""
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            Client(endereco_escritor, authkey=chave_escritor).close()
+            return True
+        except (OSError, EOFError):
+            time.sleep(0.1)
+    return False
+
+
+# --- WORKERS ---
+class ClienteEscritor:
+    """Conexões com o escritor reaproveitadas entre requisições: uma por escrita em andamento no worker."""
+
+    def __init__(self, endereco_escritor, chave_escritor: bytes):
+        self.endereco = endereco_escritor
+        self.chave = chave_escritor
+        self._livres = []
+        self._lock = threading.Lock()
+
+    def enviar(self, pedido) -> Resposta:
+        with self._lock:
+            conexao = self._livres.pop() if self._livres else None
+        if conexao is None:
+            conexao = Client(self.endereco, authkey=self.chave)
+        try:
+            conexao.send(pedido)
+            resposta = conexao.recv()
+        except BaseException:
+            conexao.close()
+            raise
+        with self._lock:
+            self._livres.append(conexao)
+        return resposta
+
+    def fechar(self):
+        with self._lock:
+            livres, self._livres = self._livres, []
+        for conexao in livres:
+            conexao.close()
+
+
+_cliente: Optional[ClienteEscritor] = None
+
+
+def conectar():
+    global _cliente
+    _cliente = ClienteEscritor(endereco(), chave())
+
+
+def desconectar():
+    global _cliente
+    if _cliente is not None:
+        _cliente.fechar()
+        _cliente = None
+
+
+class MiddlewareEscritor:
+    """Nos workers, repassa as escritas ao escritor e devolve a resposta dele; o resto segue para a aplicação."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        cliente = _cliente
+        if (cliente is None or scope["type"] != "http" or scope["method"] not in METODOS_ESCRITA
+                or (scope["method"], scope["path"]) in ROTAS_DIRETAS):
+            await self.app(scope, receive, send)
+            return
+        partes = []
+        while True:
+            mensagem = await receive()
+            partes.append(mensagem.get("body", b""))
+            if not mensagem.get("more_body"):
+                break
+        pedido = ({campo: scope.get(campo) for campo in CAMPOS_ESCOPO}, b"".join(partes))
+        try:
+            status, cabecalhos, corpo = await run_in_threadpool(cliente.enviar, pedido)
+        except (OSError, EOFError):
+            logger.exception("Sem comunicação com o processo escritor")
+            status, cabecalhos, corpo = RESPOSTA_INDISPONIVEL
+        await send({"type": "http.response.start", "status": status, "headers": cabecalhos})
+        await send({"type": "http.response.body", "body": corpo})
+
+
+# --- PROCESSO ESCRITOR ---
+class _Pedido:
+    __slots__ = ("escopo", "corpo", "futuro")
+
+    def __init__(self, escopo: dict, corpo: bytes):
+        self.escopo = escopo
+        self.corpo = corpo
+        self.futuro: Future = Future()
+
+
+def criar_engine_do_lote(url):
+    """
+    Engine do escritor. No SQLite o pysqlite abre transações sozinho e não antes de um SAVEPOINT (que então
+    vira a transação externa e grava ao ser liberado); aqui o BEGIN é explícito e IMMEDIATE, já pegando o
+    lock de escrita, e os SAVEPOINTs das requisições ficam dentro dele.
+    """
+    engine = database.criar_engine(url)
+    if make_url(url).get_backend_name() == "sqlite":
+        @event.listens_for(engine, "connect")
+        def sem_transacao_implicita(conexao_dbapi, _registro):
+            conexao_dbapi.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def iniciar(conexao):
+            conexao.exec_driver_sql("BEGIN IMMEDIATE")
+    return engine
+
+
+class Escritor:
+    def __init__(self, app, engine, max_lote: int = MAX_LOTE, espera_ms: float = ESPERA_MS):
+        self.app = app
+        self.engine = engine
+        self.max_lote = max(1, max_lote)
+        self.espera = espera_ms / 1000
+        self.lotes = 0
+        self.pedidos = 0
+
+    async def executar(self, escopo: dict, corpo: bytes) -> Resposta:
+        """Passa uma requisição pela aplicação ASGI e junta a resposta."""
+        status, cabecalhos, partes = 500, [], []
+        entregue = False
+
+        async def receive():
+            nonlocal entregue
+            if not entregue:
+                entregue = True
+                return {"type": "http.request", "body": corpo, "more_body": False}
+            # Não há desconexão a relatar: quem espera por ela é cancelado quando a resposta termina
+            await asyncio.Event().wait()
+
+        async def send(mensagem):
+            nonlocal status, cabecalhos
+            if mensagem["type"] == "http.response.start":
+                status, cabecalhos = mensagem["status"], list(mensagem.get("headers", []))
+            elif mensagem["type"] == "http.response.body":
+                partes.append(mensagem.get("body", b""))
+
+        try:
+            await self.app({**escopo, "type": "http", "asgi": {"version": "3.0"}}, receive, send)
+        except Exception:
+            # O ServerErrorMiddleware já enviou o 500; o erro chega aqui para ser registrado
+            logger.exception("Erro ao executar %s %s", escopo.get("method"), escopo.get("path"))
+        return status, cabecalhos, b"".join(partes)
+
+    async def gravar_lote(self, lote: List[_Pedido]) -> List[Resposta]:
+        """Executa o lote numa transação só; as requisições com erro (status >= 400) voltam ao seu SAVEPOINT."""
+        respostas = []
+        try:
+            with self.engine.connect() as conexao:
+                with conexao.begin():
+                    for pedido in lote:
+                        ponto = conexao.begin_nested()
+                        marcador = conexao_do_lote.set(conexao)
+                        try:
+                            resposta = await self.executar(pedido.escopo, pedido.corpo)
+                        finally:
+                            conexao_do_lote.reset(marcador)
+                        if resposta[0] < 400:
+                            ponto.commit()
+                        else:
+                            ponto.rollback()
+                        respostas.append(resposta)
+        except Exception:
+            logger.exception("Falha ao gravar um lote de %d escritas", len(lote))
+            return [RESPOSTA_FALHA_LOTE] * len(lote)
+        self.lotes += 1
+        self.pedidos += len(lote)
+        return respostas
+
+    async def rodar(self, fila: asyncio.Queue):
+        # Group commit: o que chegou enquanto o lote anterior gravava entra todo no próximo
+        while True:
+            lote = [await fila.get()]
+            if self.espera:
+                await asyncio.sleep(self.espera)
+            while len(lote) < self.max_lote and not fila.empty():
+                lote.append(fila.get_nowait())
+            for pedido, resposta in zip(lote, await self.gravar_lote(lote)):
+                pedido.futuro.set_result(resposta)
+
+    def atender(self, conexao, loop, fila: asyncio.Queue):
+        """Thread de uma conexão de worker: um pedido por vez, respondido depois do commit do lote."""
+        with conexao:
+            while True:
+                try:
+                    escopo, corpo = conexao.recv()
+                except (EOFError, OSError):
+                    return
+                pedido = _Pedido(escopo, corpo)
+                loop.call_soon_threadsafe(fila.put_nowait, pedido)
+                try:
+                    conexao.send(pedido.futuro.result())
+                except OSError:
+                    return
+
+    def aceitar(self, listener, loop, fila: asyncio.Queue):
+        while True:
+            try:
+                conexao = listener.accept()
+            except AuthenticationError:
+                logger.warning("Conexão recusada: chave do escritor não confere")
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self.atender, args=(conexao, loop, fila), daemon=True).start()
+
+
+def servir(endereco_escritor: Optional[str] = None, chave_escritor: Optional[str] = None):
+    """Ponto de entrada do processo escritor: sobe a aplicação (com as migrações) e atende até ser encerrado."""
+    global NESTE_PROCESSO
+    NESTE_PROCESSO = True
+    asyncio.run(_servir(endereco(endereco_escritor), chave(chave_escritor)))
+
+
+async def _servir(endereco_escritor, chave_escritor: bytes):
+    from . import main
+
+    async with main.app.router.lifespan_context(main.app):
+        engine = criar_engine_do_lote(main.engine.url.render_as_string(hide_password=False))
+        escritor = Escritor(main.app, engine)
+        fila = asyncio.Queue()
+        if isinstance(endereco_escritor, str) and os.path.exists(endereco_escritor):
+            os.remove(endereco_escritor) # socket Unix de uma execução anterior
+        # backlog alto: cada worker abre várias conexões de uma vez quando as escritas chegam juntas
+        listener = Listener(endereco_escritor, backlog=128, authkey=chave_escritor)
+        threading.Thread(target=escritor.aceitar, args=(listener, asyncio.get_running_loop(), fila), daemon=True).start()
+        print(f"Processo escritor aguardando em {endereco_escritor} (até {escritor.max_lote} escritas por commit).")
+        try:
+            await escritor.rodar(fila)
+        finally:
+            listener.close()
+            engine.dispose()
+            print(f"Processo escritor finalizado: {escritor.pedidos} escritas em {escritor.lotes} commits.")
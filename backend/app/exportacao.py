@@ -0,0 +1,109 @@
+import csv
+import io
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Linhas lidas do banco (e escritas no arquivo) por vez
+TAMANHO_LOTE = 5000
+
+
+def _consulta_gastos():
+    # Uma linha por gasto à vista e uma por parcela das compras parceladas
+    return select(
+        models.Gasto.id.label("gasto_id"),
+        models.Parcela.numero.label("parcela"),
+        models.Gasto.numero_parcelas,
+        models.Gasto.data.label("data_compra"),
+        func.coalesce(models.Parcela.data_vencimento, models.Gasto.data).label("data"),
+        models.Gasto.nome,
+        models.Gasto.anotacao,
+        func.coalesce(models.Parcela.valor, models.Gasto.valor).label("valor"),
+        models.Gasto.valor.label("valor_total"),
+        models.Gasto.responsavel,
+        models.Categoria.nome.label("categoria"),
+        models.CartaoCredito.nome.label("cartao"),
+    ).outerjoin(
+        models.Parcela, models.Parcela.gasto_id == models.Gasto.id
+    ).outerjoin(
+        models.Categoria, models.Categoria.id == models.Gasto.categoria_id
+    ).outerjoin(
+        models.CartaoCredito, models.CartaoCredito.id == models.Gasto.cartao_id
+    ).order_by(models.Gasto.id, models.Parcela.numero)
+
+
+def _consulta_metas():
+    return select(
+        models.Meta.id,
+        models.Meta.nome,
+        models.Meta.valor_objetivo,
+        models.Meta.valor_atual,
+        models.Meta.data_objetivo,
+        models.Meta.data_criacao,
+    ).order_by(models.Meta.id)
+
+
+def _consulta_contribuicoes():
+    return select(
+        models.Contribuicao.id,
+        models.Contribuicao.meta_id,
+        models.Meta.nome.label("meta"),
+        models.Contribuicao.valor,
+        models.Contribuicao.responsavel,
+        models.Contribuicao.data_contribuicao,
+    ).outerjoin(models.Meta, models.Meta.id == models.Contribuicao.meta_id).order_by(models.Contribuicao.id)
+
+
+# Entidade -> (consulta, tipos das colunas na mesma ordem do SELECT)
+EXPORTACOES = {
+    "gastos": (_consulta_gastos, ["int", "int", "int", "datetime", "datetime", "str", "str", "float", "float", "str", "str", "str"]),
+    "metas": (_consulta_metas, ["int", "str", "float", "float", "datetime", "datetime"]),
+    "contribuicoes": (_consulta_contribuicoes, ["int", "int", "str", "float", "str", "datetime"]),
+}
+
+FORMATOS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+def ler_lotes(db: Session, entidade: str) -> Tuple[List[str], Iterator[list]]:
+    """Retorna os nomes das colunas e um iterador de lotes de linhas lidos com cursor no servidor."""
+    consulta = EXPORTACOES[entidade][0]()
+    resultado = db.execute(consulta.execution_options(yield_per=TAMANHO_LOTE))
+    return list(resultado.keys()), resultado.partitions()
+
+
+def gerar_csv(colunas: List[str], lotes: Iterator[list]) -> Iterator[str]:
+    """Gera o CSV em pedaços, um por lote, sem acumular o arquivo inteiro."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(colunas)
+    for lote in lotes:
+        escritor.writerows(lote)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def escrever_parquet(entidade: str, colunas: List[str], lotes: Iterator[list], destino):
+    """
+    Escreve um row group por lote. Depende do pyarrow (opcional);
+    levanta RuntimeError se ele não estiver instalado.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Exportação em Parquet requer o pacote 'pyarrow'.")
+    tipos = {"int": pa.int64(), "float": pa.float64(), "str": pa.string(), "datetime": pa.timestamp("us")}
+    esquema = pa.schema([(nome, tipos[tipo]) for nome, tipo in zip(colunas, EXPORTACOES[entidade][1])])
+    with pq.ParquetWriter(destino, esquema, compression="zstd") as escritor:
+        for lote in lotes:
+            colunas_lote = list(zip(*lote))
+            escritor.write_batch(pa.record_batch(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(colunas_lote, esquema)],
+                schema=esquema,
+            ))
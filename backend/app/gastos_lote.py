@@ -0,0 +1,116 @@
+"""
+Escritas em lote de gastos: /gastos/lote (criar, alterar e excluir muitos de uma vez) e a troca de
+categoria do DELETE /categorias/{id}?mover_para=.
+
+Os gastos afetados são resolvidos uma vez para uma lista de ids (o filtro pode deixar de casar depois
+da alteração, ex.: mover da categoria A para a B). Cada grupo de até TAMANHO_GRUPO ids recebe um único
+UPDATE/DELETE, e o cronograma de parcelas e o consolidado mensal acompanham na mesma transação.
+Nenhuma função faz commit: a rota confirma tudo de uma vez e limpa o cache.
+"""
+from datetime import timedelta
+from typing import List
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models, parcelas, resumo_mensal, schemas
+
+# Ids por comando IN (...), abaixo do limite de parâmetros do SQLite
+TAMANHO_GRUPO = 500
+
+# Não podem ser anulados em lote: são NOT NULL no banco ou obrigatórios em schemas.Gasto (a listagem quebraria)
+CAMPOS_OBRIGATORIOS = {"nome", "categoria_id", "responsavel", "is_parcelado", "numero_parcelas", "valor", "data"}
+
+
+def _grupos(ids: List[int]):
+    for inicio in range(0, len(ids), TAMANHO_GRUPO):
+        yield ids[inicio:inicio + TAMANHO_GRUPO]
+
+
+def filtro_vazio(filtro: schemas.FiltroGastos) -> bool:
+    return not filtro.model_dump(exclude_none=True)
+
+
+def ids_do_filtro(db: Session, filtro: schemas.FiltroGastos) -> List[int]:
+    """Ids dos gastos que casam com todos os critérios do filtro (fim inclusive)."""
+    consulta = select(models.Gasto.id)
+    if filtro.ids is not None:
+        consulta = consulta.where(models.Gasto.id.in_(filtro.ids))
+    if filtro.categoria_id is not None:
+        consulta = consulta.where(models.Gasto.categoria_id == filtro.categoria_id)
+    if filtro.cartao_id is not None:
+        consulta = consulta.where(models.Gasto.cartao_id == filtro.cartao_id)
+    if filtro.responsavel is not None:
+        consulta = consulta.where(models.Gasto.responsavel == filtro.responsavel)
+    if filtro.inicio is not None:
+        consulta = consulta.where(models.Gasto.data >= parcelas.como_datetime(filtro.inicio))
+    if filtro.fim is not None:
+        consulta = consulta.where(models.Gasto.data < parcelas.como_datetime(filtro.fim) + timedelta(days=1))
+    return list(db.execute(consulta.order_by(models.Gasto.id)).scalars())
+
+
+def inserir(db: Session, gastos: List[schemas.GastoCreate]) -> List[int]:
+    """Um INSERT com RETURNING para todos os gastos, o cronograma das parcelas e o consolidado. Retorna os ids."""
+    linhas = []
+    for gasto in gastos:
+        dados = gasto.model_dump()
+        dados["data"] = parcelas.como_datetime(dados["data"])
+        linhas.append(dados)
+    # RETURNING na ordem dos parâmetros para gerar o cronograma das compras parceladas
+    ids = db.execute(
+        insert(models.Gasto).returning(models.Gasto.id, sort_by_parameter_order=True), linhas
+    ).scalars().all()
+    cronograma = []
+    for gasto_id, gasto in zip(ids, gastos):
+        cronograma.extend({**dados, "gasto_id": gasto_id} for dados in parcelas.calcular_parcelas(gasto))
+    if cronograma:
+        db.execute(insert(models.Parcela), cronograma)
+    resumo_mensal.aplicar(db, resumo_mensal.somar_gastos(gastos))
+    return ids
+
+
+def _refazer_parcelas(db: Session, ids: List[int]):
+    db.execute(delete(models.Parcela).where(models.Parcela.gasto_id.in_(ids)))
+    compras = db.execute(
+        select(models.Gasto.id, models.Gasto.is_parcelado, models.Gasto.numero_parcelas, models.Gasto.data,
+               models.Gasto.valor, models.Gasto.valor_parcela, models.Gasto.cartao_id)
+        .where(models.Gasto.id.in_(ids), models.Gasto.is_parcelado == True)
+    )
+    cronograma = [{**dados, "gasto_id": compra.id} for compra in compras for dados in parcelas.calcular_parcelas(compra)]
+    if cronograma:
+        db.execute(insert(models.Parcela), cronograma)
+
+
+def atualizar(db: Session, ids: List[int], valores: dict) -> int:
+    """
+    Aplica os mesmos valores a todos os gastos da lista. Mudar só o cartão atualiza as parcelas com um
+    UPDATE; mudar data, valor ou parcelamento refaz o cronograma dos gastos do grupo.
+    """
+    if valores.get("data") is not None:
+        valores = {**valores, "data": parcelas.como_datetime(valores["data"])}
+    campos_parcelamento = parcelas.CAMPOS_PARCELAMENTO & valores.keys()
+    variacoes = []
+    for grupo in _grupos(ids):
+        antes = resumo_mensal.lancamentos_dos_gastos(db, grupo)
+        db.execute(update(models.Gasto).where(models.Gasto.id.in_(grupo)).values(**valores)
+                   .execution_options(synchronize_session=False))
+        if campos_parcelamento == {"cartao_id"}:
+            db.execute(update(models.Parcela).where(models.Parcela.gasto_id.in_(grupo))
+                       .values(cartao_id=valores["cartao_id"]).execution_options(synchronize_session=False))
+        elif campos_parcelamento:
+            _refazer_parcelas(db, grupo)
+        variacoes.append(resumo_mensal.diferenca(antes, resumo_mensal.lancamentos_dos_gastos(db, grupo)))
+    # O consolidado recebe a soma de todos os grupos de uma vez
+    resumo_mensal.aplicar(db, resumo_mensal.somar(variacoes))
+    return len(ids)
+
+
+def excluir(db: Session, ids: List[int]) -> int:
+    variacoes = []
+    for grupo in _grupos(ids):
+        variacoes.append(resumo_mensal.lancamentos_dos_gastos(db, grupo))
+        # Sem PRAGMA foreign_keys o ON DELETE CASCADE não vale no SQLite: as parcelas saem explicitamente
+        db.execute(delete(models.Parcela).where(models.Parcela.gasto_id.in_(grupo)))
+        db.execute(delete(models.Gasto).where(models.Gasto.id.in_(grupo)).execution_options(synchronize_session=False))
+    resumo_mensal.aplicar(db, resumo_mensal.somar(variacoes), sinal=-1)
+    return len(ids)
@@ -0,0 +1,231 @@
+import csv
+import itertools
+import re
+import time
+import unicodedata
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from . import gastos_lote, models, schemas
+
+# Linhas validadas por transação (um executemany e um commit por lote)
+TAMANHO_LOTE = 1000
+
+# Cabeçalhos aceitos no CSV, já normalizados (minúsculas, sem acento)
+COLUNAS_CSV = {
+    "data": "data",
+    "nome": "nome",
+    "descricao": "nome",
+    "valor": "valor",
+    "categoria": "categoria",
+    "cartao": "cartao",
+    "responsavel": "responsavel",
+    "anotacao": "anotacao",
+    "parcelas": "numero_parcelas",
+    "numero_parcelas": "numero_parcelas",
+}
+
+FORMATOS_DATA = ("%Y-%m-%d", "%d/%m/%Y", "%Y%m%d")
+
+
+class ErroLinha(Exception):
+    pass
+
+
+def _normalizar(texto: str) -> str:
+    texto = unicodedata.normalize("NFKD", texto.strip().lower())
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def _parse_data(texto: str):
+    texto = texto.strip()
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ErroLinha(f"Data inválida: '{texto}'")
+
+
+# Só pontos, cada um seguido de exatamente três dígitos: "1.500" e "1.234.567" são milhares, não decimais
+_SO_MILHAR = re.compile(r"[-+]?\d{1,3}(\.\d{3})+")
+
+
+def _parse_valor(texto: str) -> float:
+    """
+    Aceita "1.234,56", "1234,56", "1,234.56", "1234.56" e "1.500": com os dois separadores, o último é o
+    decimal; só com vírgula, ela é o decimal; só com pontos, cada um seguido de três dígitos, são de milhar.
+    Mantém o sinal: quem decide o que um valor negativo significa é o Importador (ver SINAIS).
+    """
+    original = texto
+    texto = texto.strip().replace("R$", "").replace(" ", "")
+    if "," in texto and "." in texto:
+        milhar, decimal = (".", ",") if texto.rfind(",") > texto.rfind(".") else (",", ".")
+        if texto.count(decimal) > 1:
+            raise ErroLinha(f"Valor inválido: '{original.strip()}'")
+        texto = texto.replace(milhar, "").replace(decimal, ".")
+    elif "," in texto:
+        texto = texto.replace(",", ".")
+    elif _SO_MILHAR.fullmatch(texto):
+        texto = texto.replace(".", "")
+    try:
+        return float(texto)
+    except ValueError:
+        raise ErroLinha(f"Valor inválido: '{original.strip()}'")
+
+
+# Como os gastos aparecem no arquivo: "positivo" é uma lista de gastos (valor negativo é erro na linha);
+# "negativo" é um extrato bancário, com débitos negativos e créditos positivos, que são ignorados
+SINAIS = ("positivo", "negativo")
+
+# Formatos cujo sinal é fixo: no OFX o TRNAMT de um débito é sempre negativo
+SINAL_DO_FORMATO = {"ofx": "negativo"}
+
+
+# --- LEITORES: produzem (numero_da_linha, dict com campos brutos) sem carregar o arquivo inteiro ---
+def ler_csv(linhas: Iterable[str]) -> Iterator[Tuple[int, dict]]:
+    linhas = iter(linhas)
+    primeira = next(linhas, None)
+    if primeira is None:
+        return
+    # Extratos de bancos brasileiros costumam usar ';' por causa da vírgula decimal
+    delimitador = ";" if primeira.count(";") > primeira.count(",") else ","
+    leitor = csv.reader(itertools.chain([primeira], linhas), delimiter=delimitador)
+    cabecalho = [COLUNAS_CSV.get(_normalizar(c)) for c in next(leitor)]
+    for numero, valores in enumerate(leitor, start=2):
+        if not any(v.strip() for v in valores):
+            continue
+        yield numero, {campo: valor for campo, valor in zip(cabecalho, valores) if campo}
+
+
+# Abertura com o valor que vem depois dela, ou o fechamento de uma transação: no OFX 2.x em XML várias
+# transações podem estar na mesma linha, então tudo é tratado na ordem do documento
+_TAG_OFX = re.compile(r"<(\w+|/STMTTRN)>([^<\r\n]*)", re.IGNORECASE)
+
+
+def ler_ofx(linhas: Iterable[str]) -> Iterator[Tuple[int, dict]]:
+    """
+    Lê as transações (<STMTTRN>) de um extrato OFX, SGML ou XML, linha a linha.
+    Débitos (TRNAMT negativo) viram gastos; créditos são ignorados.
+    """
+    transacao = None
+    inicio = 0
+    for numero, linha in enumerate(linhas, start=1):
+        for tag, valor in _TAG_OFX.findall(linha):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                transacao, inicio = {}, numero
+            elif tag == "/STMTTRN":
+                if transacao is not None and transacao.get("TRNAMT", "").startswith("-"):
+                    yield inicio, {
+                        "data": transacao.get("DTPOSTED", "")[:8], # AAAAMMDD[hhmmss[.xxx][fuso]]
+                        "nome": transacao.get("NAME") or transacao.get("MEMO", ""),
+                        "valor": transacao["TRNAMT"],
+                        "anotacao": transacao.get("MEMO") if transacao.get("NAME") else None,
+                    }
+                transacao = None
+            elif transacao is not None and valor.strip():
+                transacao[tag] = valor.strip()
+
+
+class Importador:
+    """
+    Valida e insere gastos em lotes. Os nomes de categoria e cartão são resolvidos
+    por um dicionário carregado uma vez, e cada lote vira um único executemany.
+    """
+
+    def __init__(self, db: Session, categoria_padrao: Optional[str] = None, cartao_padrao: Optional[str] = None,
+                 responsavel_padrao: str = "Eu", tamanho_lote: int = TAMANHO_LOTE, sinal: str = "positivo"):
+        if sinal not in SINAIS:
+            raise ValueError(f"Sinal deve ser um de {SINAIS}")
+        self.db = db
+        self.categorias = {_normalizar(nome): id for id, nome in db.query(models.Categoria.id, models.Categoria.nome)}
+        self.cartoes = {_normalizar(nome): id for id, nome in db.query(models.CartaoCredito.id, models.CartaoCredito.nome)}
+        self.categoria_padrao = categoria_padrao
+        self.cartao_padrao = cartao_padrao
+        self.responsavel_padrao = responsavel_padrao
+        self.tamanho_lote = tamanho_lote
+        self.sinal = sinal
+        self.inseridos = 0
+        self.erros: List[dict] = []
+        self.lotes = 0
+
+    def _resolver(self, tabela: dict, nome: Optional[str], mensagem: str) -> Optional[int]:
+        if not nome:
+            return None
+        id = tabela.get(_normalizar(nome))
+        if id is None:
+            raise ErroLinha(f"{mensagem}: '{nome}'")
+        return id
+
+    def _validar(self, campos: dict) -> Optional[schemas.GastoCreate]:
+        """O gasto da linha, ou None para um crédito de extrato (sinal "negativo"), que não é gasto."""
+        valor = _parse_valor(campos.get("valor", ""))
+        if self.sinal == "negativo":
+            if valor >= 0:
+                return None
+            valor = -valor
+        elif valor < 0:
+            raise ErroLinha(f"Valor negativo: '{campos['valor'].strip()}' (num extrato com débitos negativos, use o sinal 'negativo')")
+        categoria = campos.get("categoria") or self.categoria_padrao
+        if not categoria:
+            raise ErroLinha("Categoria não informada")
+        numero_parcelas = int(campos.get("numero_parcelas") or 1)
+        return schemas.GastoCreate(
+            nome=(campos.get("nome") or "").strip(),
+            anotacao=(campos.get("anotacao") or None),
+            valor=valor,
+            responsavel=(campos.get("responsavel") or "").strip() or self.responsavel_padrao,
+            categoria_id=self._resolver(self.categorias, categoria, "Categoria não encontrada"),
+            data=_parse_data(campos.get("data", "")),
+            cartao_id=self._resolver(self.cartoes, campos.get("cartao") or self.cartao_padrao, "Cartão não encontrado"),
+            is_parcelado=numero_parcelas > 1,
+            numero_parcelas=numero_parcelas,
+            valor_parcela=round(valor / numero_parcelas, 2) if numero_parcelas > 1 else None,
+        )
+
+    def _gravar(self, lote: List[Tuple[int, schemas.GastoCreate]]):
+        try:
+            gastos_lote.inserir(self.db, [gasto for _, gasto in lote])
+            self.db.commit()
+        except SQLAlchemyError as e:
+            # Um lote é uma transação: se falhar, nenhuma linha dele é gravada
+            self.db.rollback()
+            self.erros.extend({"linha": numero, "erro": f"Falha ao gravar o lote: {e.__class__.__name__}"} for numero, _ in lote)
+            return
+        self.inseridos += len(lote)
+        self.lotes += 1
+
+    def importar(self, registros: Iterable[Tuple[int, dict]]) -> dict:
+        inicio = time.perf_counter()
+        lote = []
+        for numero, campos in registros:
+            try:
+                gasto = self._validar(campos)
+            except (ErroLinha, ValueError) as e:
+                mensagem = "; ".join(erro["msg"] for erro in e.errors()) if isinstance(e, ValidationError) else str(e)
+                self.erros.append({"linha": numero, "erro": mensagem})
+                continue
+            if gasto is None:
+                continue
+            lote.append((numero, gasto))
+            if len(lote) >= self.tamanho_lote:
+                self._gravar(lote)
+                lote = []
+        if lote:
+            self._gravar(lote)
+        duracao = time.perf_counter() - inicio
+        return {
+            "inseridos": self.inseridos,
+            "erros": self.erros,
+            "lotes": self.lotes,
+            "duracao_segundos": round(duracao, 3),
+            "linhas_por_segundo": round(self.inseridos / duracao, 1) if duracao > 0 else 0.0,
+        }
+
+
+LEITORES = {"csv": ler_csv, "ofx": ler_ofx}
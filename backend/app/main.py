@@ -1,44 +1,107 @@
+import asyncio
+import bisect
+import codecs
+import io
+import json
+import itertools
 import os
-from datetime import datetime, timedelta
+import tempfile
+from datetime import date, datetime, timedelta
 from typing import List, Optional
 
 from dateutil.relativedelta import relativedelta
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import Boolean, create_engine, extract
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from pydantic import TypeAdapter
+from sqlalchemy import Boolean, extract
 from sqlalchemy.orm import Session, sessionmaker, joinedload, selectinload
+from starlette.background import BackgroundTask
 from contextlib import asynccontextmanager
 
-from . import models, schemas
+from . import (agregacoes, backup, busca, cache, compacto, compressao, crud, database, escritor, exportacao, gastos_lote, importacao, metas, metricas,
+               migracoes, models, motor_vetorial, parcelas, projecao, recorrentes, referencias, resumo_mensal, schemas,
+               sincronizacao)
 
 # --- NOVA ESTRUTURA DE INICIALIZAÇÃO ---
 # Define variáveis globais que serão inicializadas depois
 engine = None
 SessionLocal = None
+# Só preenchidas com DB_ASYNC=1
+engine_async = None
+AsyncSessionLocal = None
+# Backups periódicos (BACKUP_INTERVALO_MIN > 0)
+agendador_backup = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global engine, SessionLocal
+    global engine, SessionLocal, engine_async, AsyncSessionLocal, agendador_backup
     # Este código roda QUANDO O SERVIDOR INICIA
     
     # Pega a URL do banco de dados que foi definida pelo run_desktop_app.py
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./app.db") # Mantém um padrão seguro
     
-    engine = create_engine(
-        DATABASE_URL, connect_args={"check_same_thread": False}
-    )
+    # Perfil de pragmas e pool definidos por DB_PERFIL (padrão: WAL)
+    engine = database.criar_engine(DATABASE_URL)
     SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    if metricas.HABILITADO:
+        metricas.instrumentar_engine(engine)
     
-    # Cria as tabelas no banco de dados
-    models.Base.metadata.create_all(bind=engine)
+    # Cria as tabelas no banco de dados e aplica as migrações pendentes (pulado se o esquema já está na versão atual)
+    for descricao in migracoes.preparar_banco(engine):
+        print(f"Migração aplicada: {descricao}")
     print("Banco de dados conectado e tabelas criadas.")
+
+    # Bancos antigos ainda não têm o cronograma de parcelas materializado
+    with SessionLocal() as db:
+        if parcelas.precisa_backfill(db):
+            total = parcelas.backfill_parcelas(db)
+            print(f"Cronograma de parcelas gerado ({total} parcelas).")
+            # O consolidado mensal foi montado sem as parcelas que acabaram de ser geradas
+            resumo_mensal.reconstruir(db.connection())
+            db.commit()
+
+    # Modo assíncrono: as rotas de leitura passam a usar uma engine aiosqlite/asyncpg
+    if database.modo_async():
+        from sqlalchemy.ext.asyncio import async_sessionmaker
+        engine_async = database.criar_engine_async(DATABASE_URL)
+        AsyncSessionLocal = async_sessionmaker(engine_async, autoflush=False, expire_on_commit=False)
+        if metricas.HABILITADO:
+            metricas.instrumentar_engine(engine_async.sync_engine)
+        print("Leituras usando a engine assíncrona.")
+    # Vários workers (servidor_producao.py): as escritas vão para o processo escritor. Cache e instantâneos em
+    # memória deste processo não veriam essas escritas, então ficam desligados
+    if escritor.delegar_escritas():
+        escritor.conectar()
+        cache.respostas.desativar()
+        motor_vetorial.HABILITADO = False
+        print("Escritas repassadas ao processo escritor.")
+    if motor_vetorial.MOTOR == "vetorial":
+        print("Motor de cálculo vetorizado." if motor_vetorial.HABILITADO
+              else "MOTOR_CALCULO=vetorial requer o pacote 'numpy'; usando as consultas SQL.")
+    # Com vários workers só o processo escritor (que não delega) agenda os backups
+    caminho_banco = backup.caminho_do_banco(DATABASE_URL)
+    if backup.INTERVALO_MIN > 0 and caminho_banco and not escritor.delegar_escritas():
+        agendador_backup = backup.Agendador(caminho_banco, backup.pasta_padrao(caminho_banco), backup.INTERVALO_MIN * 60)
+        agendador_backup.iniciar()
+        print(f"Backups a cada {backup.INTERVALO_MIN:g} min em {agendador_backup.pasta}.")
     
     yield
     # Este código roda QUANDO O SERVIDOR TERMINA (não usado por nós)
+    if agendador_backup is not None:
+        agendador_backup.parar()
+        agendador_backup = None
+    escritor.desconectar()
+    if engine_async is not None:
+        await engine_async.dispose()
+        engine_async = AsyncSessionLocal = None
     print("Servidor finalizado.")
 
 
 app = FastAPI(title="Calculadora Financeira API", lifespan=lifespan)
+# Precisa vir antes das rotas: todas passam a ser medidas quando METRICS_ENABLED=1
+app.router.route_class = metricas.RotaInstrumentada
 
 origins = ["*"]
 app.add_middleware(
@@ -48,77 +111,141 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if compressao.HABILITADA:
+    app.add_middleware(compressao.MiddlewareCompressao)
+# Por último, para ficar por fora: no modo com vários workers a escrita sai inteira para o escritor
+app.add_middleware(escritor.MiddlewareEscritor)
+
+def _abrir_sessao() -> Session:
+    # No processo escritor a sessão entra na transação do lote: o commit da rota só libera um SAVEPOINT
+    conexao = escritor.conexao_do_lote.get()
+    if conexao is not None:
+        return SessionLocal(bind=conexao, join_transaction_mode="create_savepoint")
+    return SessionLocal()
 
 def get_db():
     if SessionLocal is None:
         raise HTTPException(status_code=500, detail="A sessão com o banco de dados não foi inicializada.")
-    db = SessionLocal()
+    db = _abrir_sessao()
     try:
         yield db
     finally:
         db.close()
 
+async def get_sessao():
+    """Dependência das rotas de leitura: AsyncSession com DB_ASYNC=1, Session comum no threadpool caso contrário."""
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as sessao_async:
+            yield database.SessaoBanco(sessao_async=sessao_async)
+        return
+    if SessionLocal is None:
+        raise HTTPException(status_code=500, detail="A sessão com o banco de dados não foi inicializada.")
+    db = SessionLocal()
+    try:
+        yield database.SessaoBanco(sessao=db)
+    finally:
+        db.close()
+
+# --- CACHE DE RESPOSTAS ---
+_LISTA_GASTOS = TypeAdapter(List[schemas.Gasto])
+_FATURA = TypeAdapter(schemas.Fatura)
+_RESUMO = TypeAdapter(schemas.Resumo)
+_RESUMO_FATURA = TypeAdapter(schemas.ResumoFatura)
+_FATURAS_LOTE = TypeAdapter(schemas.FaturasLote)
+
+def _etag_confere(request: Request, etag: str) -> bool:
+    cabecalho = request.headers.get("if-none-match")
+    if not cabecalho:
+        return False
+    return any(valor.strip().removeprefix("W/") in (etag, "*") for valor in cabecalho.split(","))
+
+async def _responder_com_cache(request: Request, chave, inicio: datetime, fim: datetime, cartao_id: Optional[int],
+                               tipo: Optional[TypeAdapter], calcular):
+    """
+    Devolve a resposta guardada para 'chave' ou chama 'calcular' e guarda o JSON com a abrangência
+    [inicio, fim) / cartao_id usada na invalidação. Responde 304 quando o If-None-Match confere.
+    Com tipo=None, 'calcular' já devolve o JSON em bytes (formato compacto).
+    """
+    entrada = cache.respostas.obter(chave)
+    if entrada is None:
+        geracao = cache.respostas.geracao
+        resultado = await calcular()
+        if tipo is None:
+            corpo = resultado
+        else:
+            with metricas.serializando():
+                corpo = tipo.dump_json(tipo.validate_python(resultado, from_attributes=True))
+        entrada = cache.respostas.guardar(chave, corpo, inicio, fim, cartao_id, geracao)
+    # no-cache: o navegador pode guardar, mas sempre revalida com o ETag
+    cabecalhos = {"ETag": entrada.etag, "Cache-Control": "no-cache"}
+    if _etag_confere(request, entrada.etag):
+        return Response(status_code=304, headers=cabecalhos)
+    return Response(entrada.corpo, media_type="application/json", headers=cabecalhos)
+
 def _get_gastos_por_periodo(db: Session, data_inicio: datetime, data_fim: datetime, cartao_id: Optional[int] = None):
-    query_normais = db.query(models.Gasto).options(
-        joinedload(models.Gasto.categoria),
-        joinedload(models.Gasto.cartao)
-    ).filter(
+    if motor_vetorial.HABILITADO:
+        gastos = motor_vetorial.gastos_do_periodo(db, data_inicio, data_fim, cartao_id)
+    else:
+        gastos = _gastos_reais_do_periodo(db, data_inicio, data_fim, cartao_id)
+    # Ocorrências dos gastos recorrentes entram como linhas virtuais, como as parcelas
+    virtuais = recorrentes.ocorrencias(db, data_inicio, data_fim, [cartao_id] if cartao_id else None)
+    if virtuais:
+        gastos = sorted(gastos + virtuais, key=lambda x: (x.data, x.id), reverse=True)
+    return gastos
+
+def _gastos_reais_do_periodo(db: Session, data_inicio: datetime, data_fim: datetime, cartao_id: Optional[int] = None):
+    # Só colunas escalares: categoria e cartão vêm de referencias.py, sem JOIN nem objetos do ORM por linha
+    query_normais = db.query(*referencias.COLUNAS_GASTO).filter(
         models.Gasto.is_parcelado == False,
         models.Gasto.data >= data_inicio,
         models.Gasto.data < data_fim
     )
-    query_parcelados = db.query(models.Gasto).options(
-        joinedload(models.Gasto.categoria),
-        joinedload(models.Gasto.cartao)
-    ).filter(
-        models.Gasto.is_parcelado == True,
-        models.Gasto.data < data_fim
+    query_parcelas = db.query(models.Parcela.numero, models.Parcela.valor.label("valor_da_parcela"),
+                              *referencias.COLUNAS_GASTO).join(models.Parcela.gasto).filter(
+        models.Parcela.data_vencimento >= data_inicio,
+        models.Parcela.data_vencimento < data_fim
     )
     if cartao_id:
         query_normais = query_normais.filter(models.Gasto.cartao_id == cartao_id)
-        query_parcelados = query_parcelados.filter(models.Gasto.cartao_id == cartao_id)
-    gastos_normais = query_normais.all()
-    compras_parceladas_ativas = query_parcelados.all()
+        query_parcelas = query_parcelas.filter(models.Parcela.cartao_id == cartao_id)
+    gastos_normais = [schemas.Gasto.model_validate(gasto) for gasto in referencias.como_dicts(db, query_normais.all())]
     gastos_parcela_do_periodo = []
-    for compra in compras_parceladas_ativas:
-        for i in range(compra.numero_parcelas):
-            data_parcela_atual = compra.data + relativedelta(months=+i)
-            if data_inicio <= data_parcela_atual < data_fim:
-                gasto_virtual = schemas.Gasto.from_orm(compra)
-                gasto_virtual.valor = compra.valor_parcela
-                gasto_virtual.data = compra.data
-                gasto_virtual.parcela_atual = i + 1
-                gastos_parcela_do_periodo.append(gasto_virtual)
+    for gasto in referencias.como_dicts(db, query_parcelas.all()):
+        gasto["parcela_atual"] = gasto.pop("numero")
+        gasto["valor"] = gasto.pop("valor_da_parcela")
+        gastos_parcela_do_periodo.append(schemas.Gasto.model_validate(gasto))
     gastos_totais = gastos_normais + gastos_parcela_do_periodo
     gastos_totais.sort(key=lambda x: (x.data, x.id), reverse=True)
     return gastos_totais
 
-def _calcular_periodo_fatura(ano: int, mes: int, dia_fechamento: int):
+def _validar_formato(formato: str) -> bool:
+    """True para formato=compacto; veja app/compacto.py."""
+    if formato not in compacto.FORMATOS:
+        raise HTTPException(status_code=400, detail="Formato deve ser 'completo' ou 'compacto'")
+    return formato == "compacto"
+
+def _gastos_compactos(db: Session, data_inicio: datetime, data_fim: datetime, somente_debito: bool) -> bytes:
+    linhas = compacto.linhas_do_periodo(db, data_inicio, data_fim, somente_debito=somente_debito)
+    return compacto.codificar(compacto.lista(db, linhas))
+
+def _meses_da_fatura(ano: int, mes: int):
     """
-    Calcula o período de compras para uma fatura.
-    Regra: Para a fatura de Agosto (mês 8) com fechamento dia 20,
-    o período é de 20 de Julho a 19 de Agosto.
+    Intervalo que contém a janela da fatura (ano, mes) de qualquer cartão: do início do mês anterior ao fim do mês.
+    Usado como abrangência no cache sem precisar consultar o dia de fechamento.
     """
-    # 1. Calcula o fim do período (inclusive).
-    # Este é o dia ANTERIOR ao fechamento da fatura do mês atual.
-    try:
-        fechamento_atual = datetime(ano, mes, dia_fechamento)
-    except ValueError:
-        # Lida com dias inválidos (ex: dia 31), pegando o último dia do mês
-        fechamento_atual = (datetime(ano, mes, 1) + relativedelta(months=1)) - timedelta(days=1)
-    
-    periodo_fim = fechamento_atual - timedelta(days=1)
-
-    # 2. Calcula o início do período (inclusive).
-    # Este é o dia de fechamento do MÊS ANTERIOR.
-    periodo_inicio = fechamento_atual - relativedelta(months=1)
-    
-    return periodo_inicio, periodo_fim
+    fim = datetime(ano, mes, 1) + relativedelta(months=+1)
+    return fim - relativedelta(months=+2), fim
 
 @app.get("/")
 def read_root():
     return {"status": "API da Calculadora Financeira está no ar!"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    if not metricas.HABILITADO:
+        raise HTTPException(status_code=404, detail="Métricas desabilitadas. Defina METRICS_ENABLED=1.")
+    return metricas.registro.exportar()
+
 @app.post("/categorias/", response_model=schemas.Categoria, status_code=201)
 def create_categoria(categoria: schemas.CategoriaCreate, db: Session = Depends(get_db)):
     db_categoria = db.query(models.Categoria).filter(models.Categoria.nome == categoria.nome).first()
@@ -126,6 +253,8 @@ def create_categoria(categoria: schemas.CategoriaCreate, db: Session = Depends(g
         if not db_categoria.is_active:
             db_categoria.is_active = True
             db.commit()
+            referencias.invalidar()
+            cache.respostas.limpar()
             db.refresh(db_categoria)
             return db_categoria
         else:
@@ -133,106 +262,370 @@ def create_categoria(categoria: schemas.CategoriaCreate, db: Session = Depends(g
     new_categoria = models.Categoria(**categoria.model_dump())
     db.add(new_categoria)
     db.commit()
+    referencias.invalidar()
     db.refresh(new_categoria)
     return new_categoria
 
 @app.get("/categorias/", response_model=List[schemas.Categoria])
-def read_categorias(db: Session = Depends(get_db)):
-    return db.query(models.Categoria).filter(models.Categoria.is_active == True).order_by(models.Categoria.nome).all()
+async def read_categorias(sessao: database.SessaoBanco = Depends(get_sessao)):
+    return await sessao.executar(referencias.categorias_ativas)
 
 @app.delete("/categorias/{categoria_id}", status_code=200)
-def delete_categoria(categoria_id: int, db: Session = Depends(get_db)):
+def delete_categoria(categoria_id: int, mover_para: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    Uma categoria em uso (por gastos ou gastos recorrentes) é apenas desativada. Com mover_para=<id>, os
+    gastos e os recorrentes dela passam para a outra categoria (UPDATE em conjunto) e ela é removida, tudo
+    na mesma transação.
+    """
     db_categoria = db.query(models.Categoria).get(categoria_id)
     if not db_categoria:
         raise HTTPException(status_code=404, detail="Categoria não encontrada")
+    movidos = None
+    if mover_para is not None:
+        if mover_para == categoria_id or not db.query(models.Categoria).get(mover_para):
+            raise HTTPException(status_code=400, detail="Categoria de destino inválida")
+        ids = gastos_lote.ids_do_filtro(db, schemas.FiltroGastos(categoria_id=categoria_id))
+        movidos = gastos_lote.atualizar(db, ids, {"categoria_id": mover_para})
+        db.query(models.GastoRecorrente).filter(models.GastoRecorrente.categoria_id == categoria_id).update(
+            {"categoria_id": mover_para}, synchronize_session=False)
     gastos_associados = db.query(models.Gasto).filter(models.Gasto.categoria_id == categoria_id).count()
+    gastos_associados += db.query(models.GastoRecorrente).filter(models.GastoRecorrente.categoria_id == categoria_id).count()
     if gastos_associados > 0:
         db_categoria.is_active = False
         db.commit()
+        referencias.invalidar()
+        cache.respostas.limpar()
         return {"status": "soft_deleted", "message": "Categoria desativada pois está em uso. Altere os gastos existentes para poder removê-la permanentemente."}
     else:
         db.delete(db_categoria)
         db.commit()
+        referencias.invalidar()
+        cache.respostas.limpar()
+        if movidos is not None:
+            return {"status": "hard_deleted", "message": f"Categoria removida com sucesso; {movidos} gastos movidos.",
+                    "gastos_movidos": movidos}
         return {"status": "hard_deleted", "message": "Categoria removida com sucesso."}
 
 @app.post("/gastos/", response_model=schemas.Gasto, status_code=201)
 def create_gasto(gasto: schemas.GastoCreate, db: Session = Depends(get_db)):
     novo_gasto = models.Gasto(**gasto.model_dump())
+    parcelas.sincronizar_parcelas(novo_gasto)
     db.add(novo_gasto)
+    resumo_mensal.registrar_gasto(db, novo_gasto)
     db.commit()
+    cache.respostas.invalidar(cache.abrangencia_gasto(novo_gasto))
     db.refresh(novo_gasto)
     return novo_gasto
 
+# Acima disso o corpo da importação sai da memória e vai para um arquivo temporário
+LIMITE_MEMORIA_IMPORTACAO = 8 * 1024 * 1024
+
+@app.post("/gastos/import", response_model=schemas.ResultadoImportacao)
+async def import_gastos(request: Request, formato: str = "csv", categoria_padrao: Optional[str] = None,
+                        cartao_padrao: Optional[str] = None, responsavel_padrao: str = "Eu",
+                        encoding: str = "utf-8-sig", sinal: str = "positivo"):
+    """
+    Importa um extrato enviado como corpo da requisição (CSV ou OFX).
+    CSV: cabeçalho com data, nome, valor, categoria e, opcionalmente, cartao, responsavel, anotacao, parcelas.
+    Com sinal=negativo o CSV é um extrato bancário: débitos negativos viram gastos e créditos são ignorados.
+    Categorias e cartões são informados pelo nome; linhas inválidas são relatadas e não interrompem a importação.
+    """
+    leitor = importacao.LEITORES.get(formato)
+    if leitor is None:
+        raise HTTPException(status_code=400, detail="Formato deve ser 'csv' ou 'ofx'")
+    if sinal not in importacao.SINAIS:
+        raise HTTPException(status_code=400, detail="Sinal deve ser 'positivo' ou 'negativo'")
+    try:
+        codecs.lookup(encoding)
+    except LookupError:
+        raise HTTPException(status_code=400, detail=f"Encoding desconhecido: '{encoding}'")
+    sinal = importacao.SINAL_DO_FORMATO.get(formato, sinal)
+    if SessionLocal is None:
+        raise HTTPException(status_code=500, detail="A sessão com o banco de dados não foi inicializada.")
+    with tempfile.SpooledTemporaryFile(max_size=LIMITE_MEMORIA_IMPORTACAO) as arquivo:
+        async for pedaco in request.stream():
+            arquivo.write(pedaco)
+        arquivo.seek(0)
+
+        def importar():
+            texto = io.TextIOWrapper(arquivo, encoding=encoding, errors="replace", newline="")
+            try:
+                with _abrir_sessao() as db:
+                    importador = importacao.Importador(db, categoria_padrao, cartao_padrao, responsavel_padrao, sinal=sinal)
+                    resultado = importador.importar(leitor(texto))
+            finally:
+                texto.detach()
+            if resultado["inseridos"]:
+                cache.respostas.limpar()
+            return resultado
+
+        return await run_in_threadpool(importar)
+
+# Gastos por chamada no POST /gastos/lote
+MAX_GASTOS_LOTE = 10_000
+
+def _validar_referencias(db: Session, categoria_ids, cartao_ids):
+    for modelo, ids, mensagem in ((models.Categoria, categoria_ids, "Categoria não encontrada"),
+                                  (models.CartaoCredito, cartao_ids, "Cartão não encontrado")):
+        ids = {id for id in ids if id is not None}
+        if not ids:
+            continue
+        faltando = ids - {id for id, in db.query(modelo.id).filter(modelo.id.in_(ids))}
+        if faltando:
+            raise HTTPException(status_code=400, detail=f"{mensagem}: {', '.join(map(str, sorted(faltando)))}")
+
+def _ids_do_filtro_lote(db: Session, filtro: schemas.FiltroGastos):
+    # Sem critério nenhum o lote pegaria a tabela inteira: exige ao menos um
+    if gastos_lote.filtro_vazio(filtro):
+        raise HTTPException(status_code=400, detail="Informe ao menos um critério no filtro")
+    return gastos_lote.ids_do_filtro(db, filtro)
+
+@app.post("/gastos/lote", response_model=schemas.ResultadoLote)
+def create_gastos_lote(lote: schemas.GastosLoteCreate, dry_run: bool = False, db: Session = Depends(get_db)):
+    """Cria todos os gastos numa única transação (um INSERT para todos). Com dry_run=true só valida e conta."""
+    if len(lote.gastos) > MAX_GASTOS_LOTE:
+        raise HTTPException(status_code=400, detail=f"O máximo é de {MAX_GASTOS_LOTE} gastos por lote")
+    _validar_referencias(db, {gasto.categoria_id for gasto in lote.gastos}, {gasto.cartao_id for gasto in lote.gastos})
+    if dry_run or not lote.gastos:
+        return {"afetados": len(lote.gastos), "dry_run": dry_run}
+    ids = gastos_lote.inserir(db, lote.gastos)
+    db.commit()
+    cache.respostas.limpar()
+    return {"afetados": len(ids), "dry_run": False, "ids": ids}
+
+@app.patch("/gastos/lote", response_model=schemas.ResultadoLote)
+def update_gastos_lote(lote: schemas.GastosLoteUpdate, dry_run: bool = False, db: Session = Depends(get_db)):
+    """
+    Aplica os mesmos 'valores' a todos os gastos que casam com o 'filtro', com UPDATEs em conjunto numa
+    única transação. Ex.: {"filtro": {"categoria_id": 3}, "valores": {"categoria_id": 5}}.
+    Com dry_run=true só conta os gastos que seriam alterados.
+    """
+    valores = lote.valores.model_dump(exclude_unset=True)
+    if not valores:
+        raise HTTPException(status_code=400, detail="Informe ao menos um campo em 'valores'")
+    nulos = sorted(campo for campo in gastos_lote.CAMPOS_OBRIGATORIOS if campo in valores and valores[campo] is None)
+    if nulos:
+        raise HTTPException(status_code=400, detail=f"Campos que não aceitam nulo: {', '.join(nulos)}")
+    _validar_referencias(db, {valores.get("categoria_id")}, {valores.get("cartao_id")})
+    ids = _ids_do_filtro_lote(db, lote.filtro)
+    if dry_run or not ids:
+        return {"afetados": len(ids), "dry_run": dry_run}
+    gastos_lote.atualizar(db, ids, valores)
+    db.commit()
+    cache.respostas.limpar()
+    return {"afetados": len(ids), "dry_run": False}
+
+@app.delete("/gastos/lote", response_model=schemas.ResultadoLote)
+def delete_gastos_lote(lote: schemas.GastosLoteDelete, dry_run: bool = False, db: Session = Depends(get_db)):
+    """Exclui os gastos que casam com o 'filtro' (e suas parcelas) numa única transação. dry_run=true só conta."""
+    ids = _ids_do_filtro_lote(db, lote.filtro)
+    if dry_run or not ids:
+        return {"afetados": len(ids), "dry_run": dry_run}
+    gastos_lote.excluir(db, ids)
+    db.commit()
+    cache.respostas.limpar()
+    return {"afetados": len(ids), "dry_run": False}
+
 @app.put("/gastos/{gasto_id}", response_model=schemas.Gasto)
 def update_gasto(gasto_id: int, gasto_update: schemas.GastoUpdate, db: Session = Depends(get_db)):
-    db_gasto = db.query(models.Gasto).get(gasto_id)
+    if gasto_id < 0:
+        # Ocorrência virtual de um gasto recorrente: vira um gasto real antes de ser alterada
+        db_gasto = recorrentes.materializar(db, gasto_id)
+        if db_gasto:
+            resumo_mensal.registrar_gasto(db, db_gasto)
+    else:
+        db_gasto = db.query(models.Gasto).get(gasto_id)
     if not db_gasto:
         raise HTTPException(status_code=404, detail="Gasto não encontrado")
     update_data = gasto_update.model_dump(exclude_unset=True)
+    # O gasto pode sair de um período/cartão e entrar em outro: invalida os dois
+    abrangencias = cache.abrangencia_gasto(db_gasto)
+    lancamentos_antes = resumo_mensal.lancamentos_do_gasto(db_gasto)
     for key, value in update_data.items():
         setattr(db_gasto, key, value)
+    if parcelas.CAMPOS_PARCELAMENTO & update_data.keys():
+        parcelas.sincronizar_parcelas(db_gasto)
+    abrangencias += cache.abrangencia_gasto(db_gasto)
+    resumo_mensal.atualizar_gasto(db, lancamentos_antes, db_gasto)
     db.add(db_gasto)
     db.commit()
+    cache.respostas.invalidar(abrangencias)
     db.refresh(db_gasto)
     return db_gasto
 
 @app.delete("/gastos/{gasto_id}", status_code=204)
 def delete_gasto(gasto_id: int, db: Session = Depends(get_db)):
+    if gasto_id < 0:
+        # Ocorrência virtual: o mês passa a ser pulado pelo gasto recorrente
+        ocorrencia = recorrentes.pular(db, gasto_id)
+        if not ocorrencia:
+            raise HTTPException(status_code=404, detail="Gasto não encontrado")
+        db.commit()
+        cache.respostas.invalidar(cache.abrangencia_gasto(ocorrencia))
+        return {"detail": "Gasto deletado com sucesso"}
     db_gasto = db.query(models.Gasto).get(gasto_id)
     if not db_gasto:
         raise HTTPException(status_code=404, detail="Gasto não encontrado")
+    abrangencias = cache.abrangencia_gasto(db_gasto)
+    resumo_mensal.registrar_gasto(db, db_gasto, sinal=-1)
     db.delete(db_gasto)
     db.commit()
+    cache.respostas.invalidar(abrangencias)
     return {"detail": "Gasto deletado com sucesso"}
 
 @app.get("/gastos/", response_model=List[schemas.Gasto])
-def read_gastos(db: Session = Depends(get_db), ano: Optional[int] = None, mes: Optional[int] = None, tipo_pagamento: Optional[str] = None):
+async def read_gastos(request: Request, sessao: database.SessaoBanco = Depends(get_sessao), ano: Optional[int] = None,
+                      mes: Optional[int] = None, tipo_pagamento: Optional[str] = None, formato: str = "completo"):
     if not ano or not mes:
         raise HTTPException(status_code=400, detail="Ano e mês são obrigatórios")
     data_inicio = datetime(ano, mes, 1)
     data_fim = data_inicio + relativedelta(months=+1)
-    gastos = _get_gastos_por_periodo(db, data_inicio, data_fim)
-    if tipo_pagamento == 'debito':
-        gastos = [g for g in gastos if g.cartao is None]
-    return gastos
+    if _validar_formato(formato):
+        return await _responder_com_cache(
+            request, ("gastos_compacto", ano, mes, tipo_pagamento == 'debito'), data_inicio, data_fim, None, None,
+            lambda: sessao.executar(_gastos_compactos, data_inicio, data_fim, tipo_pagamento == 'debito'))
+
+    async def calcular():
+        gastos = await sessao.executar(_get_gastos_por_periodo, data_inicio, data_fim)
+        if tipo_pagamento == 'debito':
+            gastos = [g for g in gastos if g.cartao is None]
+        return gastos
+
+    return await _responder_com_cache(request, ("gastos", ano, mes, tipo_pagamento == 'debito'), data_inicio, data_fim,
+                                      None, _LISTA_GASTOS, calcular)
+
+# Tamanho do lote lido do cursor do banco no streaming
+TAMANHO_LOTE_STREAM = 500
+
+def _parse_data(valor: Optional[str], campo: str) -> Optional[datetime]:
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Parâmetro '{campo}' deve estar no formato AAAA-MM-DD")
+
+@app.get("/gastos/paginado", response_model=schemas.PaginaGastos)
+def read_gastos_paginado(db: Session = Depends(get_db), limit: int = 100, cursor: Optional[str] = None,
+                         inicio: Optional[str] = None, fim: Optional[str] = None,
+                         cartao_id: Optional[int] = None, categoria_id: Optional[int] = None):
+    """
+    Lista os gastos cadastrados (compras parceladas aparecem uma vez, com o valor total)
+    do mais recente para o mais antigo. Para a próxima página, envie o 'proximo_cursor' recebido.
+    """
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="'limit' deve estar entre 1 e 1000")
+    posicao = None
+    if cursor:
+        try:
+            posicao = crud.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+    data_fim = _parse_data(fim, "fim")
+    gastos = crud.get_gastos(
+        db, limit=limit, cursor=posicao,
+        data_inicio=_parse_data(inicio, "inicio"),
+        data_fim=data_fim + timedelta(days=1) if data_fim else None,
+        cartao_id=cartao_id, categoria_id=categoria_id,
+    )
+    proximo_cursor = None
+    if len(gastos) == limit:
+        proximo_cursor = crud.encode_cursor(gastos[-1].data, gastos[-1].id)
+    return {"itens": gastos, "proximo_cursor": proximo_cursor}
+
+@app.get("/gastos/busca", response_model=schemas.PaginaGastos)
+async def buscar_gastos(q: str, ordem: str = "relevancia", limit: int = 50, cursor: Optional[str] = None,
+                        inicio: Optional[str] = None, fim: Optional[str] = None, cartao_id: Optional[int] = None,
+                        categoria_id: Optional[int] = None, sessao: database.SessaoBanco = Depends(get_sessao)):
+    """
+    Busca gastos por nome, anotação, categoria ou responsável; cada termo casa como prefixo.
+    ordem="relevancia" (padrão) ou "data"; filtros de data da compra (AAAA-MM-DD), cartão e categoria.
+    Para a próxima página, envie o 'proximo_cursor' recebido com a mesma ordem.
+    """
+    if ordem not in busca.ORDENS:
+        raise HTTPException(status_code=400, detail="Ordem deve ser 'relevancia' ou 'data'")
+    if not 1 <= limit <= 200:
+        raise HTTPException(status_code=400, detail="'limit' deve estar entre 1 e 200")
+    data_fim = _parse_data(fim, "fim")
+    filtros = {"data_inicio": _parse_data(inicio, "inicio"), "data_fim": data_fim + timedelta(days=1) if data_fim else None,
+               "cartao_id": cartao_id, "categoria_id": categoria_id}
+    try:
+        return await sessao.executar(busca.buscar, q, ordem, limit, cursor, **filtros)
+    except ValueError as erro:
+        raise HTTPException(status_code=400, detail=str(erro) if not cursor else "Busca ou cursor inválido")
+
+@app.get("/gastos/stream")
+def stream_gastos(inicio: Optional[str] = None, fim: Optional[str] = None,
+                  cartao_id: Optional[int] = None, categoria_id: Optional[int] = None):
+    """
+    Exporta os gastos como NDJSON (um JSON por linha), lendo do banco em lotes
+    sem montar a lista inteira na memória.
+    """
+    if SessionLocal is None:
+        raise HTTPException(status_code=500, detail="A sessão com o banco de dados não foi inicializada.")
+    data_inicio = _parse_data(inicio, "inicio")
+    data_fim = _parse_data(fim, "fim")
+
+    def gerar_linhas():
+        # A sessão é aberta aqui porque o gerador continua rodando depois que o handler retorna
+        with SessionLocal() as db:
+            query = crud.query_gastos(
+                db, data_inicio=data_inicio,
+                data_fim=data_fim + timedelta(days=1) if data_fim else None,
+                cartao_id=cartao_id, categoria_id=categoria_id,
+            ).yield_per(TAMANHO_LOTE_STREAM)
+            for gasto in query:
+                yield schemas.Gasto.model_validate(gasto).model_dump_json() + "\n"
+
+    return StreamingResponse(gerar_linhas(), media_type="application/x-ndjson")
+
+def _get_parcelados_do_mes(db: Session, data_inicio_mes: datetime, data_fim_mes: datetime):
+    if motor_vetorial.HABILITADO:
+        return motor_vetorial.parcelados_do_periodo(db, data_inicio_mes, data_fim_mes)
+    parcelas_do_mes = db.query(models.Parcela.numero, *referencias.COLUNAS_GASTO).join(models.Parcela.gasto).filter(
+        models.Parcela.data_vencimento >= data_inicio_mes,
+        models.Parcela.data_vencimento < data_fim_mes
+    ).order_by(models.Gasto.data.desc(), models.Gasto.id.desc()).all()
+    resultados_ativos_no_mes = []
+    for gasto in referencias.como_dicts(db, parcelas_do_mes):
+        gasto["parcela_atual"] = gasto.pop("numero")
+        resultados_ativos_no_mes.append(schemas.Gasto.model_validate(gasto))
+    return resultados_ativos_no_mes
+
+def _parcelados_compactos(db: Session, data_inicio_mes: datetime, data_fim_mes: datetime) -> bytes:
+    return compacto.codificar(compacto.lista(db, compacto.linhas_parceladas(db, data_inicio_mes, data_fim_mes)))
 
 @app.get("/gastos/parcelados", response_model=List[schemas.Gasto])
-def read_gastos_parcelados(db: Session = Depends(get_db), ano: Optional[int] = None, mes: Optional[int] = None):
+async def read_gastos_parcelados(request: Request, sessao: database.SessaoBanco = Depends(get_sessao),
+                                 ano: Optional[int] = None, mes: Optional[int] = None, formato: str = "completo"):
     if not ano or not mes:
         hoje = datetime.utcnow()
         ano = hoje.year
         mes = hoje.month
     data_inicio_mes = datetime(ano, mes, 1)
     data_fim_mes = data_inicio_mes + relativedelta(months=+1)
-    compras_parceladas = db.query(models.Gasto).options(
-        joinedload(models.Gasto.categoria),
-        joinedload(models.Gasto.cartao)
-    ).filter(models.Gasto.is_parcelado == True).order_by(models.Gasto.data.desc()).all()
-    resultados_ativos_no_mes = []
-    for compra in compras_parceladas:
-        data_ultima_parcela = compra.data + relativedelta(months=+(compra.numero_parcelas - 1))
-        fim_validade_parcela = (data_ultima_parcela + relativedelta(months=1)).replace(day=1)
-        if datetime.utcnow() < fim_validade_parcela:
-            compra_inicio_mes = compra.data.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            hoje_inicio_mes = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            delta = relativedelta(hoje_inicio_mes, compra_inicio_mes)
-            parcela_atual = (delta.years * 12 + delta.months) + 1
-            if parcela_atual <= compra.numero_parcelas:
-                gasto_schema = schemas.Gasto.from_orm(compra)
-                gasto_schema.parcela_atual = parcela_atual
-                resultados_ativos_no_mes.append(gasto_schema)
-    return resultados_ativos_no_mes
+    if _validar_formato(formato):
+        return await _responder_com_cache(
+            request, ("parcelados_compacto", ano, mes), data_inicio_mes, data_fim_mes, None, None,
+            lambda: sessao.executar(_parcelados_compactos, data_inicio_mes, data_fim_mes))
+    return await _responder_com_cache(
+        request, ("parcelados", ano, mes), data_inicio_mes, data_fim_mes, None, _LISTA_GASTOS,
+        lambda: sessao.executar(_get_parcelados_do_mes, data_inicio_mes, data_fim_mes))
 
-@app.get("/faturas/{cartao_id}", response_model=schemas.Fatura)
-def read_fatura(cartao_id: int, ano: int, mes: int, db: Session = Depends(get_db)):
+def _montar_fatura(db: Session, cartao_id: int, ano: int, mes: int, compacta: bool = False):
     cartao = db.query(models.CartaoCredito).get(cartao_id)
     if not cartao:
         raise HTTPException(status_code=404, detail="Cartão não encontrado")
 
-    periodo_inicio, periodo_fim_real = _calcular_periodo_fatura(ano, mes, cartao.dia_fechamento)
+    periodo_inicio, periodo_fim_real = agregacoes.periodo_fatura(ano, mes, cartao.dia_fechamento)
     
     periodo_fim_query = periodo_fim_real + timedelta(days=1)
     
+    if compacta:
+        linhas = compacto.linhas_do_periodo(db, periodo_inicio, periodo_fim_query, cartao_id)
+        return compacto.codificar({"periodo_inicio": periodo_inicio.date(), "periodo_fim": periodo_fim_real.date(),
+                                   **compacto.lista(db, linhas)})
+
     gastos_do_periodo = _get_gastos_por_periodo(db, periodo_inicio, periodo_fim_query, cartao_id)
 
     return {
@@ -241,20 +634,371 @@ def read_fatura(cartao_id: int, ano: int, mes: int, db: Session = Depends(get_db
         "periodo_fim": periodo_fim_real.date()
     }
 
+# Gastos buscados por consulta ao detalhar as faturas do lote
+TAMANHO_LOTE_IDS = 500
+
+def _gastos_por_id(db: Session, ids) -> dict:
+    gastos = {}
+    ids = sorted(set(ids))
+    for inicio in range(0, len(ids), TAMANHO_LOTE_IDS):
+        consulta = db.query(*referencias.COLUNAS_GASTO).filter(models.Gasto.id.in_(ids[inicio:inicio + TAMANHO_LOTE_IDS]))
+        for gasto in referencias.como_dicts(db, consulta.all()):
+            gastos[gasto["id"]] = schemas.Gasto.model_validate(gasto)
+    return gastos
+
+def _faturas_em_lote(db: Session, cartao_ids: Optional[List[int]], meses: List[datetime], detalhar: bool,
+                     compacta: bool = False):
+    consulta = db.query(models.CartaoCredito)
+    if cartao_ids is not None:
+        consulta = consulta.filter(models.CartaoCredito.id.in_(cartao_ids))
+    cartoes = consulta.order_by(models.CartaoCredito.id).all()
+    if cartao_ids is not None and len(cartoes) != len(set(cartao_ids)):
+        raise HTTPException(status_code=404, detail="Cartão não encontrado")
+
+    # Janelas de cada cartão em ordem de mês: inícios e fins (exclusivos) crescem juntos
+    faturas, por_cartao = [], {}
+    for cartao in cartoes:
+        inicios, fins, do_cartao = [], [], []
+        for mes in meses:
+            periodo_inicio, periodo_fim_real = agregacoes.periodo_fatura(mes.year, mes.month, cartao.dia_fechamento)
+            fatura = {"cartao_id": cartao.id, "mes": mes.strftime("%Y-%m"), "periodo_inicio": periodo_inicio.date(),
+                      "periodo_fim": periodo_fim_real.date(), "total": 0.0, "quantidade": 0}
+            if detalhar:
+                fatura["linhas" if compacta else "gastos"] = []
+            inicios.append(periodo_inicio)
+            fins.append(periodo_fim_real + timedelta(days=1))
+            do_cartao.append(fatura)
+        por_cartao[cartao.id] = (inicios, fins, do_cartao)
+        faturas.extend(do_cartao)
+    if not cartoes:
+        return compacto.codificar({"faturas": faturas}) if compacta else {"faturas": faturas}
+
+    # Uma consulta sobre a união de todas as janelas; cada lançamento é atribuído às faturas numa só passada.
+    # Com dia_fechamento >= 29 janelas vizinhas podem se sobrepor, e o lançamento entra nas duas.
+    inicio_geral = min(inicios[0] for inicios, _, _ in por_cartao.values())
+    fim_geral = max(fins[-1] for _, fins, _ in por_cartao.values())
+    virtuais = {ocorrencia.id: ocorrencia for ocorrencia in recorrentes.ocorrencias(db, inicio_geral, fim_geral, por_cartao.keys())}
+    lancamentos_virtuais = [(ocorrencia.id, None, ocorrencia.cartao_id, ocorrencia.data, ocorrencia.valor)
+                            for ocorrencia in virtuais.values()]
+
+    if motor_vetorial.HABILITADO and not detalhar:
+        totais, quantidades = motor_vetorial.totais_faturas(
+            motor_vetorial.instantaneo(db), [(c.id, c.dia_fechamento) for c in cartoes], [m.strftime("%Y-%m") for m in meses])
+        for fatura, total, quantidade in zip(faturas, totais.ravel().tolist(), quantidades.ravel().tolist()):
+            fatura["total"], fatura["quantidade"] = total, quantidade
+        lancamentos = lancamentos_virtuais
+    else:
+        lancamentos = itertools.chain(agregacoes.lancamentos_de_cartoes(db, list(por_cartao), inicio_geral, fim_geral),
+                                      lancamentos_virtuais)
+    linhas_por_fatura = {}
+    for gasto_id, parcela, cartao_id, data, valor in lancamentos:
+        inicios, fins, do_cartao = por_cartao[cartao_id]
+        for i in range(bisect.bisect_right(fins, data), bisect.bisect_right(inicios, data)):
+            do_cartao[i]["total"] += valor
+            do_cartao[i]["quantidade"] += 1
+            if detalhar:
+                linhas_por_fatura.setdefault(id(do_cartao[i]), []).append((gasto_id, parcela, valor))
+    for fatura in faturas:
+        fatura["total"] = round(fatura["total"], 2)
+
+    ids = [linha[0] for linhas in linhas_por_fatura.values() for linha in linhas if linha[0] > 0]
+    if detalhar and compacta:
+        linhas = compacto.linhas_por_id(db, ids)
+        linhas.update((gasto_id, recorrentes.como_linha(ocorrencia)) for gasto_id, ocorrencia in virtuais.items())
+        for fatura in faturas:
+            for gasto_id, parcela, valor in linhas_por_fatura.get(id(fatura), []):
+                linha = linhas[gasto_id]
+                fatura["linhas"].append(linha if parcela is None else compacto.linha_da_parcela(linha, parcela, valor))
+            fatura["linhas"].sort(key=lambda linha: (linha[compacto.POSICAO_DATA], linha[0]), reverse=True)
+        return compacto.codificar({**compacto.referencias(db, linhas.values()), "faturas": faturas})
+    if compacta:
+        return compacto.codificar({"faturas": faturas})
+    if detalhar:
+        gastos = _gastos_por_id(db, ids)
+        gastos.update((gasto_id, recorrentes.como_gasto(ocorrencia)) for gasto_id, ocorrencia in virtuais.items())
+        for fatura in faturas:
+            for gasto_id, parcela, valor in linhas_por_fatura.get(id(fatura), []):
+                gasto = gastos[gasto_id]
+                if parcela is not None:
+                    gasto = gasto.model_copy(update={"valor": valor, "parcela_atual": parcela})
+                fatura["gastos"].append(gasto)
+            fatura["gastos"].sort(key=lambda g: (g.data, g.id), reverse=True)
+    return {"faturas": faturas}
+
+def _parse_cartoes(cartoes: Optional[str]) -> Optional[List[int]]:
+    if not cartoes:
+        return None
+    try:
+        return sorted({int(valor) for valor in cartoes.split(",") if valor.strip()})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="'cartoes' deve ser uma lista de ids separados por vírgula")
+
+@app.get("/faturas/batch", response_model=schemas.FaturasLote)
+async def read_faturas_lote(request: Request, inicio: str, fim: Optional[str] = None, cartoes: Optional[str] = None,
+                            detalhar: bool = False, formato: str = "completo",
+                            sessao: database.SessaoBanco = Depends(get_sessao)):
+    """
+    Faturas de vários cartões (padrão: todos) para cada mês de inicio até fim (AAAA-MM, inclusive).
+    Retorna período, total e quantidade de cada uma; com detalhar=true inclui os gastos, como em /faturas/{id}.
+    Com formato=compacto os gastos vêm em 'linhas' e categorias/cartões uma vez no topo da resposta.
+    """
+    compacta = _validar_formato(formato)
+    primeiro = _parse_mes(inicio, "inicio")
+    ultimo = _parse_mes(fim, "fim") if fim else primeiro
+    if ultimo < primeiro:
+        raise HTTPException(status_code=400, detail="'fim' deve ser igual ou posterior a 'inicio'")
+    meses = []
+    while primeiro <= ultimo:
+        meses.append(primeiro)
+        primeiro += relativedelta(months=+1)
+        if len(meses) > MAX_MESES_RELATORIO:
+            raise HTTPException(status_code=400, detail=f"O intervalo máximo é de {MAX_MESES_RELATORIO} meses")
+    cartao_ids = _parse_cartoes(cartoes)
+    abrangencia_inicio, _ = _meses_da_fatura(meses[0].year, meses[0].month)
+    _, abrangencia_fim = _meses_da_fatura(meses[-1].year, meses[-1].month)
+    chave = ("faturas_lote", tuple(cartao_ids or ()), meses[0], meses[-1], detalhar, compacta)
+    return await _responder_com_cache(request, chave, abrangencia_inicio, abrangencia_fim, None,
+                                      None if compacta else _FATURAS_LOTE,
+                                      lambda: sessao.executar(_faturas_em_lote, cartao_ids, meses, detalhar, compacta))
+
+@app.get("/faturas/{cartao_id}", response_model=schemas.Fatura)
+async def read_fatura(request: Request, cartao_id: int, ano: int, mes: int, formato: str = "completo",
+                      sessao: database.SessaoBanco = Depends(get_sessao)):
+    inicio, fim = _meses_da_fatura(ano, mes)
+    compacta = _validar_formato(formato)
+    return await _responder_com_cache(request, ("fatura", cartao_id, ano, mes, compacta), inicio, fim, cartao_id,
+                                      None if compacta else _FATURA,
+                                      lambda: sessao.executar(_montar_fatura, cartao_id, ano, mes, compacta))
+
+def _montar_resumo(db: Session, ano: int, mes: int, base: str, responsavel: Optional[str]):
+    # Débito (e, na base calendário, os cartões) pelo mês civil: lido do consolidado mensal.
+    # As janelas de fatura não coincidem com o mês civil, então os cartões da base fatura somam os lançamentos.
+    # As ocorrências dos gastos recorrentes não estão no consolidado e são somadas à parte.
+    mes_civil = f"{ano:04d}-{mes:02d}"
+    data_inicio = datetime(ano, mes, 1)
+    data_fim = data_inicio + relativedelta(months=+1)
+    if base == "calendario":
+        grupos = agregacoes.totais_consolidados(db, mes_civil, responsavel=responsavel)
+        grupos += recorrentes.totais_agrupados(recorrentes.ocorrencias(db, data_inicio, data_fim), responsavel)
+        return agregacoes.montar_resumo(db, grupos)
+    janelas = []
+    virtuais = recorrentes.ocorrencias(db, data_inicio, data_fim, [None])
+    for cartao in db.query(models.CartaoCredito).all():
+        periodo_inicio, periodo_fim_real = agregacoes.periodo_fatura(ano, mes, cartao.dia_fechamento)
+        janelas.append((cartao.id, periodo_inicio, periodo_fim_real + timedelta(days=1)))
+        virtuais += recorrentes.ocorrencias(db, periodo_inicio, periodo_fim_real + timedelta(days=1), [cartao.id])
+    grupos = agregacoes.totais_consolidados(db, mes_civil, somente_debito=True, responsavel=responsavel)
+    grupos += agregacoes.totais_agrupados(db, janelas, responsavel)
+    grupos += recorrentes.totais_agrupados(virtuais, responsavel)
+    return agregacoes.montar_resumo(db, grupos)
+
+@app.get("/resumo", response_model=schemas.Resumo)
+async def read_resumo(request: Request, ano: int, mes: int, base: str = "fatura", responsavel: Optional[str] = None,
+                      sessao: database.SessaoBanco = Depends(get_sessao)):
+    """
+    Totais do mês agrupados por categoria, responsável e cartão, somados no banco.
+    base="fatura" replica o Dashboard: débito pelo mês civil e cada cartão pela janela da sua fatura.
+    base="calendario" usa o mês civil também para os cartões.
+    """
+    if base not in ("fatura", "calendario"):
+        raise HTTPException(status_code=400, detail="Base deve ser 'fatura' ou 'calendario'")
+    inicio, fim = _meses_da_fatura(ano, mes)
+    return await _responder_com_cache(request, ("resumo", ano, mes, base, responsavel), inicio, fim, None, _RESUMO,
+                                      lambda: sessao.executar(_montar_resumo, ano, mes, base, responsavel))
+
+def _montar_resumo_fatura(db: Session, cartao_id: int, ano: int, mes: int):
+    cartao = db.query(models.CartaoCredito).get(cartao_id)
+    if not cartao:
+        raise HTTPException(status_code=404, detail="Cartão não encontrado")
+    periodo_inicio, periodo_fim_real = agregacoes.periodo_fatura(ano, mes, cartao.dia_fechamento)
+    periodo_fim_query = periodo_fim_real + timedelta(days=1)
+    grupos = agregacoes.totais_agrupados(db, [(cartao_id, periodo_inicio, periodo_fim_query)])
+    grupos += recorrentes.totais_agrupados(recorrentes.ocorrencias(db, periodo_inicio, periodo_fim_query, [cartao_id]))
+    return {
+        "cartao_id": cartao_id,
+        "total": round(sum(total or 0.0 for *_, total, _ in grupos), 2),
+        "quantidade": sum(qtd for *_, qtd in grupos),
+        "periodo_inicio": periodo_inicio.date(),
+        "periodo_fim": periodo_fim_real.date()
+    }
+
+@app.get("/resumo/fatura/{cartao_id}", response_model=schemas.ResumoFatura)
+async def read_resumo_fatura(request: Request, cartao_id: int, ano: int, mes: int,
+                             sessao: database.SessaoBanco = Depends(get_sessao)):
+    inicio, fim = _meses_da_fatura(ano, mes)
+    return await _responder_com_cache(request, ("resumo_fatura", cartao_id, ano, mes), inicio, fim, cartao_id,
+                                      _RESUMO_FATURA, lambda: sessao.executar(_montar_resumo_fatura, cartao_id, ano, mes))
+
+def _parse_mes(valor: str, campo: str) -> datetime:
+    try:
+        return datetime.strptime(valor, "%Y-%m")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Parâmetro '{campo}' deve estar no formato AAAA-MM")
+
+# Limite de meses por relatório (20 anos)
+MAX_MESES_RELATORIO = 240
+
+@app.get("/relatorios/mensal", response_model=schemas.RelatorioMensal)
+async def read_relatorio_mensal(inicio: str, fim: str, agrupar: Optional[str] = None, categoria_id: Optional[int] = None,
+                                cartao_id: Optional[int] = None, responsavel: Optional[str] = None,
+                                sessao: database.SessaoBanco = Depends(get_sessao)):
+    """Totais mês a mês (mês civil, parcelas no mês de vencimento) de inicio até fim, inclusive."""
+    data_inicio = _parse_mes(inicio, "inicio")
+    data_fim = _parse_mes(fim, "fim") + relativedelta(months=+1)
+    if data_fim <= data_inicio:
+        raise HTTPException(status_code=400, detail="'fim' deve ser igual ou posterior a 'inicio'")
+    if agrupar and agrupar not in agregacoes.DIMENSOES_RELATORIO:
+        raise HTTPException(status_code=400, detail="'agrupar' deve ser 'categoria', 'cartao' ou 'responsavel'")
+    meses = []
+    mes_atual = data_inicio
+    while mes_atual < data_fim:
+        meses.append(mes_atual.strftime("%Y-%m"))
+        mes_atual += relativedelta(months=+1)
+        if len(meses) > MAX_MESES_RELATORIO:
+            raise HTTPException(status_code=400, detail=f"O intervalo máximo é de {MAX_MESES_RELATORIO} meses")
+    return await sessao.executar(agregacoes.relatorio_mensal, meses, agrupar, categoria_id, cartao_id, responsavel)
+
+# --- PROJEÇÕES ---
+_PROJECOES = TypeAdapter(schemas.Projecoes)
+
+def _projecoes(db: Session, meses: int, cartao_ids: Optional[List[int]], historico_meses: int):
+    hoje = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    # Sem sincronização (fora do SQLite) não há versão para validar a entrada guardada: calcula sempre
+    versao = sincronizacao.versao_atual(db) if sincronizacao.disponivel(db) else None
+    chave = (hoje, meses, tuple(cartao_ids or ()), historico_meses)
+    if versao is not None:
+        guardada = projecao.cache.obter(chave, versao)
+        if guardada is not None:
+            return guardada
+    consulta = db.query(models.CartaoCredito)
+    if cartao_ids is None:
+        consulta = consulta.filter(models.CartaoCredito.is_active == True)
+    else:
+        consulta = consulta.filter(models.CartaoCredito.id.in_(cartao_ids))
+    cartoes = consulta.order_by(models.CartaoCredito.id).all()
+    if cartao_ids is not None and len(cartoes) != len(cartao_ids):
+        raise HTTPException(status_code=404, detail="Cartão não encontrado")
+    resultado = projecao.projetar(db, hoje, meses, cartoes, historico_meses)
+    with metricas.serializando():
+        corpo = _PROJECOES.dump_json(_PROJECOES.validate_python(resultado))
+    return corpo, projecao.cache.guardar(chave, versao, corpo)
+
+@app.get("/projecoes", response_model=schemas.Projecoes)
+async def read_projecoes(request: Request, meses: int = 12, cartoes: Optional[str] = None, historico_meses: int = 6,
+                         sessao: database.SessaoBanco = Depends(get_sessao)):
+    """
+    Total esperado das faturas de cada cartão (padrão: os ativos) do mês atual até 'meses' à frente, com
+    parcelas, compras à vista e recorrentes separados; e a data prevista de cada meta, pela média das
+    contribuições dos últimos 'historico_meses'. Séries alinhadas com 'meses'. Guardada até a próxima escrita.
+    """
+    if not 1 <= meses <= projecao.MAX_MESES:
+        raise HTTPException(status_code=400, detail=f"'meses' deve estar entre 1 e {projecao.MAX_MESES}")
+    if not 1 <= historico_meses <= projecao.MAX_HISTORICO_MESES:
+        raise HTTPException(status_code=400, detail=f"'historico_meses' deve estar entre 1 e {projecao.MAX_HISTORICO_MESES}")
+    corpo, etag = await sessao.executar(_projecoes, meses, _parse_cartoes(cartoes), historico_meses)
+    cabecalhos = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_confere(request, etag):
+        return Response(status_code=304, headers=cabecalhos)
+    return Response(corpo, media_type="application/json", headers=cabecalhos)
+
+# --- GASTOS RECORRENTES ---
+CAMPOS_OBRIGATORIOS_RECORRENTE = {"nome", "valor", "dia", "data_inicio", "categoria_id"}
+
+def _validar_recorrente(db: Session, dados: dict):
+    if dados.get("dia") is not None and not 1 <= dados["dia"] <= 31:
+        raise HTTPException(status_code=400, detail="'dia' deve estar entre 1 e 31")
+    if dados.get("data_fim") and dados.get("data_inicio") and dados["data_fim"] < dados["data_inicio"]:
+        raise HTTPException(status_code=400, detail="'data_fim' deve ser igual ou posterior a 'data_inicio'")
+    _validar_referencias(db, {dados.get("categoria_id")}, {dados.get("cartao_id")})
+    for campo in ("data_inicio", "data_fim"):
+        if dados.get(campo) is not None:
+            dados[campo] = parcelas.como_datetime(dados[campo])
+    return dados
+
+@app.get("/recorrentes/", response_model=List[schemas.GastoRecorrente])
+def read_recorrentes(db: Session = Depends(get_db)):
+    return db.query(models.GastoRecorrente).options(
+        joinedload(models.GastoRecorrente.categoria),
+        joinedload(models.GastoRecorrente.cartao)
+    ).order_by(models.GastoRecorrente.nome).all()
+
+@app.post("/recorrentes/", response_model=schemas.GastoRecorrente, status_code=201)
+def create_recorrente(recorrente: schemas.GastoRecorrenteCreate, db: Session = Depends(get_db)):
+    """Cria um gasto recorrente; as ocorrências aparecem em todos os meses de data_inicio a data_fim."""
+    novo = models.GastoRecorrente(**_validar_recorrente(db, recorrente.model_dump()))
+    db.add(novo)
+    db.commit()
+    cache.respostas.limpar()
+    db.refresh(novo)
+    return novo
+
+@app.put("/recorrentes/{recorrente_id}", response_model=schemas.GastoRecorrente)
+def update_recorrente(recorrente_id: int, recorrente: schemas.GastoRecorrenteUpdate, db: Session = Depends(get_db)):
+    """Altera o modelo: vale para todas as ocorrências ainda virtuais (as materializadas não mudam)."""
+    db_recorrente = db.query(models.GastoRecorrente).get(recorrente_id)
+    if not db_recorrente:
+        raise HTTPException(status_code=404, detail="Gasto recorrente não encontrado")
+    dados = recorrente.model_dump(exclude_unset=True)
+    nulos = sorted(campo for campo in CAMPOS_OBRIGATORIOS_RECORRENTE if campo in dados and dados[campo] is None)
+    if nulos:
+        raise HTTPException(status_code=400, detail=f"Campos que não aceitam nulo: {', '.join(nulos)}")
+    completos = {"data_inicio": db_recorrente.data_inicio, "data_fim": db_recorrente.data_fim, **dados}
+    _validar_recorrente(db, completos)
+    for campo in dados:
+        setattr(db_recorrente, campo, completos[campo])
+    db.commit()
+    cache.respostas.limpar()
+    db.refresh(db_recorrente)
+    return db_recorrente
+
+@app.delete("/recorrentes/{recorrente_id}", status_code=200)
+def delete_recorrente(recorrente_id: int, db: Session = Depends(get_db)):
+    """
+    Com ocorrências já passadas o modelo é encerrado (data_fim = ontem) e o histórico continua nos meses
+    anteriores; um modelo que ainda não começou é removido.
+    """
+    db_recorrente = db.query(models.GastoRecorrente).get(recorrente_id)
+    if not db_recorrente:
+        raise HTTPException(status_code=404, detail="Gasto recorrente não encontrado")
+    hoje = datetime.combine(date.today(), datetime.min.time())
+    if db_recorrente.data_inicio < hoje:
+        if db_recorrente.data_fim is None or db_recorrente.data_fim >= hoje:
+            db_recorrente.data_fim = hoje - timedelta(days=1)
+        db.commit()
+        cache.respostas.limpar()
+        return {"status": "encerrado", "message": "Gasto recorrente encerrado; as ocorrências passadas foram mantidas."}
+    db.query(models.OcorrenciaRecorrente).filter(models.OcorrenciaRecorrente.recorrente_id == recorrente_id).delete()
+    db.delete(db_recorrente)
+    db.commit()
+    cache.respostas.limpar()
+    return {"status": "removido", "message": "Gasto recorrente removido com sucesso."}
+
+@app.post("/recorrentes/{recorrente_id}/materializar", response_model=schemas.Gasto, status_code=201)
+def materializar_recorrente(recorrente_id: int, mes: str, db: Session = Depends(get_db)):
+    """Transforma a ocorrência do mês (AAAA-MM) em um gasto real, que pode ser editado como qualquer outro."""
+    data = _parse_mes(mes, "mes")
+    db_gasto = recorrentes.materializar(db, recorrentes.id_virtual(recorrente_id, data.year, data.month))
+    if not db_gasto:
+        raise HTTPException(status_code=404, detail="Ocorrência não encontrada ou já materializada")
+    resumo_mensal.registrar_gasto(db, db_gasto)
+    db.commit()
+    cache.respostas.invalidar(cache.abrangencia_gasto(db_gasto))
+    db.refresh(db_gasto)
+    return db_gasto
+
 @app.post("/cartoes/", response_model=schemas.CartaoCredito, status_code=201)
 def create_cartao(cartao: schemas.CartaoCreditoCreate, db: Session = Depends(get_db)):
     novo_cartao = models.CartaoCredito(**cartao.model_dump())
     db.add(novo_cartao)
     db.commit()
+    referencias.invalidar()
+    cache.respostas.limpar()
     db.refresh(novo_cartao)
     return novo_cartao
 
 @app.get("/cartoes/", response_model=List[schemas.CartaoCredito])
-def read_cartoes(db: Session = Depends(get_db), include_inactive: bool = False):
-    query = db.query(models.CartaoCredito)
-    if not include_inactive:
-        query = query.filter(models.CartaoCredito.is_active == True)
-    return query.order_by(models.CartaoCredito.nome).all()
+async def read_cartoes(sessao: database.SessaoBanco = Depends(get_sessao), include_inactive: bool = False):
+    return await sessao.executar(referencias.cartoes, include_inactive)
 
 @app.delete("/cartoes/{cartao_id}", response_model=schemas.CartaoCredito)
 def deactivate_cartao(cartao_id: int, db: Session = Depends(get_db)):
@@ -263,6 +1007,8 @@ def deactivate_cartao(cartao_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Cartão não encontrado")
     db_cartao.is_active = False
     db.commit()
+    referencias.invalidar()
+    cache.respostas.limpar()
     db.refresh(db_cartao)
     return db_cartao
 
@@ -273,6 +1019,8 @@ def reactivate_cartao(cartao_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Cartão não encontrado")
     db_cartao.is_active = True
     db.commit()
+    referencias.invalidar()
+    cache.respostas.limpar()
     db.refresh(db_cartao)
     return db_cartao
 
@@ -284,9 +1032,28 @@ def create_meta(meta: schemas.MetaCreate, db: Session = Depends(get_db)):
     db.refresh(nova_meta)
     return nova_meta
 
+_LISTA_METAS = TypeAdapter(List[schemas.Meta])
+_LISTA_METAS_RESUMO = TypeAdapter(List[schemas.MetaResumo])
+
+def _listar_metas(db: Session, incluir_contribuicoes: bool) -> bytes:
+    query = db.query(models.Meta).options(selectinload(models.Meta.subtotais))
+    tipo = _LISTA_METAS_RESUMO
+    if incluir_contribuicoes:
+        query = query.options(selectinload(models.Meta.contribuicoes))
+        tipo = _LISTA_METAS
+    metas_lidas = query.all()
+    # Serializa ainda com a sessão aberta: no modo resumo 'contribuicoes' nem chega a ser lido
+    with metricas.serializando():
+        return tipo.dump_json(tipo.validate_python(metas_lidas, from_attributes=True))
+
 @app.get("/metas/", response_model=List[schemas.Meta])
-def read_metas(db: Session = Depends(get_db)):
-    return db.query(models.Meta).options(selectinload(models.Meta.contribuicoes)).all()
+async def read_metas(sessao: database.SessaoBanco = Depends(get_sessao), incluir_contribuicoes: bool = True):
+    """
+    Metas com o total e os subtotais por responsável já armazenados.
+    Com incluir_contribuicoes=false a lista de contribuições é omitida; use GET /metas/{id}/contribuicoes/.
+    """
+    corpo = await sessao.executar(_listar_metas, incluir_contribuicoes)
+    return Response(corpo, media_type="application/json")
 
 @app.delete("/metas/{meta_id}", status_code=204)
 def delete_meta(meta_id: int, db: Session = Depends(get_db)):
@@ -304,15 +1071,148 @@ def create_contribuicao_para_meta(meta_id: int, contribuicao: schemas.Contribuic
         raise HTTPException(status_code=404, detail="Meta não encontrada")
     nova_contribuicao = models.Contribuicao(**contribuicao.model_dump(), meta_id=meta_id)
     db.add(nova_contribuicao)
+    metas.registrar_contribuicao(db, meta_id, nova_contribuicao.responsavel, nova_contribuicao.valor)
     db.commit()
     db.refresh(nova_contribuicao)
     return nova_contribuicao
 
+def _pagina_contribuicoes(db: Session, meta_id: int, limit: int, posicao, responsavel: Optional[str]):
+    if db.query(models.Meta.id).filter(models.Meta.id == meta_id).first() is None:
+        raise HTTPException(status_code=404, detail="Meta não encontrada")
+    contribuicoes = crud.get_contribuicoes(db, meta_id, limit=limit, cursor=posicao, responsavel=responsavel)
+    proximo_cursor = None
+    if len(contribuicoes) == limit:
+        proximo_cursor = crud.encode_cursor(contribuicoes[-1].data_contribuicao, contribuicoes[-1].id)
+    return {"itens": contribuicoes, "proximo_cursor": proximo_cursor}
+
+@app.get("/metas/{meta_id}/contribuicoes/", response_model=schemas.PaginaContribuicoes)
+async def read_contribuicoes(meta_id: int, sessao: database.SessaoBanco = Depends(get_sessao), limit: int = 100,
+                             cursor: Optional[str] = None, responsavel: Optional[str] = None):
+    """Contribuições de uma meta da mais recente para a mais antiga. Para a próxima página, envie o 'proximo_cursor'."""
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="'limit' deve estar entre 1 e 1000")
+    posicao = None
+    if cursor:
+        try:
+            posicao = crud.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+    return await sessao.executar(_pagina_contribuicoes, meta_id, limit, posicao, responsavel)
+
 @app.delete("/contribuicoes/{contribuicao_id}", status_code=204)
 def delete_contribuicao(contribuicao_id: int, db: Session = Depends(get_db)):
     db_contribuicao = db.query(models.Contribuicao).get(contribuicao_id)
     if not db_contribuicao:
         raise HTTPException(status_code=404, detail="Contribuição não encontrada")
+    if db_contribuicao.meta_id is not None:
+        metas.registrar_contribuicao(db, db_contribuicao.meta_id, db_contribuicao.responsavel, db_contribuicao.valor, sinal=-1)
     db.delete(db_contribuicao)
     db.commit()
-    return {"detail": "Contribuição deletada"}
\ No newline at end of file
+    return {"detail": "Contribuição deletada"}
+
+@app.get("/export/{entidade}")
+def export_entidade(entidade: str, formato: str = "csv"):
+    """
+    Exporta gastos (com as parcelas expandidas), metas ou contribuições em CSV ou Parquet.
+    As linhas são lidas do banco em lotes de tamanho fixo, então a memória não cresce com o histórico.
+    """
+    if entidade not in exportacao.EXPORTACOES:
+        raise HTTPException(status_code=404, detail="Exportação disponível para 'gastos', 'metas' e 'contribuicoes'")
+    if formato not in exportacao.FORMATOS:
+        raise HTTPException(status_code=400, detail="Formato deve ser 'csv' ou 'parquet'")
+    if SessionLocal is None:
+        raise HTTPException(status_code=500, detail="A sessão com o banco de dados não foi inicializada.")
+    nome_arquivo = f"{entidade}.{formato}"
+
+    if formato == "csv":
+        def gerar():
+            with SessionLocal() as db:
+                yield from exportacao.gerar_csv(*exportacao.ler_lotes(db, entidade))
+
+        return StreamingResponse(gerar(), media_type=exportacao.FORMATOS[formato],
+                                 headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}"'})
+
+    # O Parquet só é válido com o rodapé escrito no fim, então vai para um arquivo temporário antes de ser enviado
+    with tempfile.NamedTemporaryFile(suffix=".parquet", delete=False) as arquivo:
+        caminho = arquivo.name
+    try:
+        with SessionLocal() as db:
+            exportacao.escrever_parquet(entidade, *exportacao.ler_lotes(db, entidade), caminho)
+    except RuntimeError as e:
+        os.remove(caminho)
+        raise HTTPException(status_code=501, detail=str(e))
+    return FileResponse(caminho, media_type=exportacao.FORMATOS[formato], filename=nome_arquivo,
+                        background=BackgroundTask(os.remove, caminho))
+
+# --- SINCRONIZAÇÃO ---
+_SINCRONIZACAO = TypeAdapter(schemas.Sincronizacao)
+
+def _sincronizar(db: Session, desde: int, limit: int) -> bytes:
+    if not sincronizacao.disponivel(db):
+        raise HTTPException(status_code=501, detail="Sincronização disponível apenas com SQLite")
+    alteracoes = sincronizacao.alteracoes(db, desde, limit)
+    with metricas.serializando():
+        return _SINCRONIZACAO.dump_json(_SINCRONIZACAO.validate_python(alteracoes, from_attributes=True))
+
+@app.get("/sync", response_model=schemas.Sincronizacao)
+async def sync(sessao: database.SessaoBanco = Depends(get_sessao), since: int = 0, limit: int = 5000):
+    """
+    Linhas de gastos, categorias, cartões, metas, contribuições e recorrentes alteradas depois da versão
+    'since', e os ids removidos (aplique as remoções antes). since=0 traz tudo. Com 'tem_mais', peça de
+    novo com since=<versao>; senão guarde 'versao' para a próxima sincronização.
+    """
+    if since < 0:
+        raise HTTPException(status_code=400, detail="'since' não pode ser negativo")
+    if not 1 <= limit <= 50000:
+        raise HTTPException(status_code=400, detail="'limit' deve estar entre 1 e 50000")
+    corpo = await sessao.executar(_sincronizar, since, limit)
+    return Response(corpo, media_type="application/json")
+
+def _versao_sincronizacao(desde: Optional[int]):
+    with SessionLocal() as db:
+        if not sincronizacao.disponivel(db):
+            raise HTTPException(status_code=501, detail="Sincronização disponível apenas com SQLite")
+        tabelas = list(sincronizacao.TABELAS) if desde is None else sincronizacao.tabelas_alteradas(db, desde)
+        return sincronizacao.versao_atual(db), tabelas
+
+async def _consultar_sincronizacao(desde: Optional[int]):
+    return await run_in_threadpool(_versao_sincronizacao, desde)
+
+notificador = sincronizacao.Notificador(_consultar_sincronizacao)
+
+def _evento_sse(versao: int, tabelas: List[str]) -> str:
+    return f"id: {versao}\nevent: versao\ndata: {json.dumps({'versao': versao, 'tabelas': tabelas})}\n\n"
+
+@app.get("/sync/eventos")
+async def sync_eventos(request: Request, since: Optional[int] = None):
+    """
+    Server-Sent Events: um evento 'versao' ao conectar e outro a cada escrita nas tabelas sincronizadas,
+    com a versão atual e as tabelas que mudaram. Ao receber, chame GET /sync?since=<última versão>.
+    Na reconexão o EventSource manda o Last-Event-ID e o primeiro evento já diz o que mudou no intervalo.
+    """
+    if SessionLocal is None:
+        raise HTTPException(status_code=500, detail="A sessão com o banco de dados não foi inicializada.")
+    desde = since
+    ultimo_id = request.headers.get("last-event-id")
+    if ultimo_id and ultimo_id.isdigit():
+        desde = int(ultimo_id)
+    versao, tabelas = await _consultar_sincronizacao(desde)
+    fila = notificador.assinar(versao)
+
+    async def gerar():
+        loop = asyncio.get_running_loop()
+        fim = loop.time() + sincronizacao.DURACAO_MAXIMA
+        try:
+            yield "retry: 3000\n\n" + _evento_sse(versao, tabelas)
+            while (restante := fim - loop.time()) > 0:
+                try:
+                    evento = await asyncio.wait_for(fila.get(), timeout=min(sincronizacao.INTERVALO_PING, restante))
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield _evento_sse(evento["versao"], evento["tabelas"])
+        finally:
+            notificador.cancelar(fila)
+
+    return StreamingResponse(gerar(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
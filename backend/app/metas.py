@@ -0,0 +1,57 @@
+from sqlalchemy import Numeric, cast, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+def _centavos(expressao):
+    # O CAST para NUMERIC faz o ROUND(x, 2) valer também no PostgreSQL
+    return func.round(cast(expressao, Numeric), 2)
+
+
+def _somar_centavos(coluna, valor: float):
+    # Arredonda a cada passo para a soma incremental não acumular erro de ponto flutuante
+    return _centavos(coluna + valor)
+
+
+def registrar_contribuicao(db: Session, meta_id: int, responsavel: str, valor: float, sinal: int = 1):
+    """
+    Soma (sinal=1) ou subtrai (sinal=-1) uma contribuição do total da meta e do subtotal do responsável.
+    Usa UPDATE relativo (valor_atual = valor_atual + x) para não depender do valor lido; não faz commit.
+    """
+    db.execute(
+        update(models.Meta)
+        .where(models.Meta.id == meta_id)
+        .values(valor_atual=_somar_centavos(models.Meta.valor_atual, sinal * valor))
+        .execution_options(synchronize_session=False)
+    )
+    filtro = (models.MetaSubtotal.meta_id == meta_id, models.MetaSubtotal.responsavel == responsavel)
+    atualizado = db.execute(
+        update(models.MetaSubtotal)
+        .where(*filtro)
+        .values(total=_somar_centavos(models.MetaSubtotal.total, sinal * valor),
+                quantidade=models.MetaSubtotal.quantidade + sinal)
+        .execution_options(synchronize_session=False)
+    )
+    if sinal > 0 and atualizado.rowcount == 0:
+        db.execute(insert(models.MetaSubtotal).values(meta_id=meta_id, responsavel=responsavel, total=valor, quantidade=1))
+    elif sinal < 0:
+        db.execute(delete(models.MetaSubtotal).where(*filtro, models.MetaSubtotal.quantidade <= 0)
+                   .execution_options(synchronize_session=False))
+
+
+def recalcular_totais(conexao):
+    """Reconstrói valor_atual e os subtotais de todas as metas a partir das contribuições."""
+    contribuicao = models.Contribuicao.__table__
+    subtotal = models.MetaSubtotal.__table__
+    conexao.execute(delete(subtotal))
+    conexao.execute(insert(subtotal).from_select(
+        ["meta_id", "responsavel", "total", "quantidade"],
+        select(contribuicao.c.meta_id, contribuicao.c.responsavel, _centavos(func.sum(contribuicao.c.valor)), func.count())
+        .where(contribuicao.c.meta_id.is_not(None))
+        .group_by(contribuicao.c.meta_id, contribuicao.c.responsavel)
+    ))
+    meta = models.Meta.__table__
+    total = (select(_centavos(func.coalesce(func.sum(contribuicao.c.valor), 0.0)))
+             .where(contribuicao.c.meta_id == meta.c.id).scalar_subquery())
+    conexao.execute(update(meta).values(valor_atual=total))
@@ -0,0 +1,237 @@
+"""
+Instrumentação opcional (METRICS_ENABLED=1): latência por rota, quantidade e tempo de SQL
+por requisição, tempo de validação/serialização (fora do handler e, com serializando(), dentro dele)
+e log de consultas lentas.
+Tudo é exposto em texto no formato do Prometheus pelo endpoint /metrics.
+"""
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from starlette.exceptions import HTTPException
+
+HABILITADO = os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "sim")
+LIMITE_CONSULTA_LENTA_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+# Limites (em segundos) dos buckets dos histogramas
+BUCKETS_REQUISICAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BUCKETS_SQL = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+logger = logging.getLogger("calculadora.sql_lento")
+
+
+class _Contexto:
+    """Acumuladores da requisição corrente. O objeto é compartilhado com a thread do threadpool."""
+    __slots__ = ("consultas", "tempo_sql", "tempo_handler", "tempo_serializacao")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tempo_sql = 0.0
+        self.tempo_handler = 0.0
+        self.tempo_serializacao = 0.0 # Medido dentro do handler, com serializando()
+
+
+_contexto: ContextVar[Optional[_Contexto]] = ContextVar("metricas_contexto", default=None)
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.soma += valor
+        self.total += 1
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[i] += 1
+
+    def linhas(self, nome: str, rotulos: str):
+        separador = "," if rotulos else ""
+        for limite, contagem in zip(self.buckets, self.contagens):
+            yield f'{nome}_bucket{{{rotulos}{separador}le="{limite}"}} {contagem}'
+        yield f'{nome}_bucket{{{rotulos}{separador}le="+Inf"}} {self.total}'
+        yield f"{nome}_sum{{{rotulos}}} {self.soma:.6f}"
+        yield f"{nome}_count{{{rotulos}}} {self.total}"
+
+
+class Registro:
+    """Guarda as séries por (método, rota, status). Protegido por lock: o threadpool escreve em paralelo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.duracao: Dict[Tuple[str, str, int], Histograma] = {}
+        self.serializacao: Dict[Tuple[str, str], Histograma] = {}
+        self.sql_por_requisicao: Dict[Tuple[str, str], Histograma] = {}
+        self.tempo_sql: Dict[Tuple[str, str], float] = {}
+        self.consultas_lentas = 0
+        self.contadores_extras: Dict[str, float] = {}
+
+    def registrar(self, metodo: str, rota: str, status: int, duracao: float, contexto: _Contexto):
+        serializacao = max(duracao - contexto.tempo_handler, 0.0) + contexto.tempo_serializacao
+        with self._lock:
+            self.duracao.setdefault((metodo, rota, status), Histograma(BUCKETS_REQUISICAO)).observar(duracao)
+            if contexto.tempo_handler or contexto.tempo_serializacao:
+                self.serializacao.setdefault((metodo, rota), Histograma(BUCKETS_REQUISICAO)).observar(serializacao)
+            self.sql_por_requisicao.setdefault((metodo, rota), Histograma(BUCKETS_SQL)).observar(contexto.consultas)
+            self.tempo_sql[(metodo, rota)] = self.tempo_sql.get((metodo, rota), 0.0) + contexto.tempo_sql
+
+    def consulta_lenta(self):
+        with self._lock:
+            self.consultas_lentas += 1
+
+    def incrementar(self, nome: str, valor: float = 1.0):
+        """Contador livre para outros módulos. O nome já deve vir com o prefixo da métrica."""
+        with self._lock:
+            self.contadores_extras[nome] = self.contadores_extras.get(nome, 0.0) + valor
+
+    def exportar(self) -> str:
+        with self._lock:
+            linhas = [
+                "# HELP http_request_duration_seconds Latência das requisições por rota.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for (metodo, rota, status), histograma in sorted(self.duracao.items()):
+                linhas.extend(histograma.linhas("http_request_duration_seconds",
+                                                f'method="{metodo}",route="{rota}",status="{status}"'))
+            linhas += [
+                "# HELP http_response_serialization_seconds Validação e serialização: fora do handler e em serializando().",
+                "# TYPE http_response_serialization_seconds histogram",
+            ]
+            for (metodo, rota), histograma in sorted(self.serializacao.items()):
+                linhas.extend(histograma.linhas("http_response_serialization_seconds", f'method="{metodo}",route="{rota}"'))
+            linhas += [
+                "# HELP db_statements_per_request Comandos SQL executados por requisição.",
+                "# TYPE db_statements_per_request histogram",
+            ]
+            for (metodo, rota), histograma in sorted(self.sql_por_requisicao.items()):
+                linhas.extend(histograma.linhas("db_statements_per_request", f'method="{metodo}",route="{rota}"'))
+            linhas += [
+                "# HELP db_time_seconds_total Tempo total gasto no banco por rota.",
+                "# TYPE db_time_seconds_total counter",
+            ]
+            for (metodo, rota), total in sorted(self.tempo_sql.items()):
+                linhas.append(f'db_time_seconds_total{{method="{metodo}",route="{rota}"}} {total:.6f}')
+            linhas += [
+                "# HELP db_slow_statements_total Comandos SQL acima de SLOW_QUERY_MS.",
+                "# TYPE db_slow_statements_total counter",
+                f"db_slow_statements_total {self.consultas_lentas}",
+            ]
+            for nome, valor in sorted(self.contadores_extras.items()):
+                linhas.append(f"{nome} {valor:g}")
+        return "\n".join(linhas) + "\n"
+
+
+registro = Registro()
+
+
+# --- EVENTOS DO SQLALCHEMY ---
+def instrumentar_engine(engine):
+    """Conta e cronometra cada comando SQL, atribuindo-o à requisição corrente."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conexao, cursor, sql, parametros, contexto_sql, executemany):
+        conexao.info.setdefault("metricas_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _depois(conexao, cursor, sql, parametros, contexto_sql, executemany):
+        duracao = time.perf_counter() - conexao.info["metricas_inicio"].pop()
+        contexto = _contexto.get()
+        if contexto is not None:
+            contexto.consultas += 1
+            contexto.tempo_sql += duracao
+        if duracao * 1000 >= LIMITE_CONSULTA_LENTA_MS:
+            registro.consulta_lenta()
+            logger.warning("SQL lento (%.1f ms): %s", duracao * 1000, " ".join(sql.split())[:500])
+
+
+# --- SERIALIZAÇÃO DENTRO DO HANDLER ---
+@contextmanager
+def serializando():
+    """
+    Cronometra uma serialização feita pelo próprio handler: as rotas que respondem com bytes prontos
+    (cache de respostas, metas, /sync, formato compacto) fazem o dump_json antes de devolver, e a
+    diferença entre a requisição e o handler não as enxergaria. Sem requisição instrumentada, não faz nada.
+    """
+    contexto = _contexto.get()
+    if contexto is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        contexto.tempo_serializacao += time.perf_counter() - inicio
+
+
+# --- ROTA INSTRUMENTADA ---
+def _cronometrar_handler(endpoint: Callable) -> Callable:
+    # functools.wraps mantém a assinatura, então o FastAPI continua resolvendo as dependências
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def envolvido(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _somar_handler(time.perf_counter() - inicio)
+    else:
+        @functools.wraps(endpoint)
+        def envolvido(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                _somar_handler(time.perf_counter() - inicio)
+    return envolvido
+
+
+def _somar_handler(duracao: float):
+    contexto = _contexto.get()
+    if contexto is not None:
+        contexto.tempo_handler += duracao
+
+
+class RotaInstrumentada(APIRoute):
+    """
+    APIRoute que mede a requisição inteira e, separadamente, o tempo dentro do handler.
+    A diferença é o que o FastAPI gasta validando parâmetros e serializando a resposta.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if HABILITADO:
+            endpoint = _cronometrar_handler(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if not HABILITADO:
+            return handler
+
+        async def handler_instrumentado(request):
+            contexto = _Contexto()
+            token = _contexto.set(contexto)
+            inicio = time.perf_counter()
+            status = 500
+            try:
+                resposta = await handler(request)
+                status = resposta.status_code
+                return resposta
+            except HTTPException as e:
+                status = e.status_code
+                raise
+            finally:
+                registro.registrar(request.method, self.path, status, time.perf_counter() - inicio, contexto)
+                _contexto.reset(token)
+
+        return handler_instrumentado
@@ -0,0 +1,113 @@
+from sqlalchemy import Column, Integer, MetaData, Table, inspect, select, text
+
+from . import busca, metas, models, resumo_mensal, sincronizacao
+
+# Tabela com uma única linha guardando a versão do esquema já aplicada ao banco
+_metadata = MetaData()
+versao_esquema = Table("versao_esquema", _metadata, Column("versao", Integer, nullable=False))
+
+
+def _indices_compostos(conexao):
+    # Índices que seguem os filtros reais das consultas de período, fatura e categoria
+    conexao.execute(text("CREATE INDEX IF NOT EXISTS ix_gastos_is_parcelado_data ON gastos (is_parcelado, data)"))
+    conexao.execute(text("CREATE INDEX IF NOT EXISTS ix_gastos_cartao_id_data ON gastos (cartao_id, data)"))
+    conexao.execute(text("CREATE INDEX IF NOT EXISTS ix_gastos_categoria_id ON gastos (categoria_id)"))
+    conexao.execute(text("CREATE INDEX IF NOT EXISTS ix_contribuicoes_meta_id ON contribuicoes (meta_id)"))
+    conexao.execute(text("ANALYZE"))
+
+
+def _totais_metas(conexao):
+    # Bancos antigos não têm a coluna; o create_all já criou 'metas_subtotais'
+    if "valor_atual" not in {coluna["name"] for coluna in inspect(conexao).get_columns("metas")}:
+        conexao.execute(text("ALTER TABLE metas ADD COLUMN valor_atual FLOAT NOT NULL DEFAULT 0"))
+    conexao.execute(text("CREATE INDEX IF NOT EXISTS ix_contribuicoes_meta_id_data ON contribuicoes (meta_id, data_contribuicao)"))
+    metas.recalcular_totais(conexao)
+
+
+def _busca_textual(conexao):
+    # Índice FTS5 + gatilhos; bancos sem FTS5 seguem sem ele e a busca usa LIKE
+    busca.criar_indice(conexao)
+
+
+def _resumo_mensal(conexao):
+    # O create_all já criou a tabela; preenche o consolidado com os gastos existentes
+    resumo_mensal.reconstruir(conexao)
+
+
+def _gastos_recorrentes(conexao):
+    # Só tabelas novas ('gastos_recorrentes' e 'ocorrencias_recorrentes'), criadas pelo create_all
+    pass
+
+
+def _versoes_de_alteracao(conexao):
+    # Bancos antigos não têm a coluna; o create_all já criou 'versao_alteracoes' e 'remocoes'
+    for modelo in sincronizacao.TABELAS.values():
+        tabela = modelo.__tablename__
+        if "versao" not in {coluna["name"] for coluna in inspect(conexao).get_columns(tabela)}:
+            conexao.execute(text(f"ALTER TABLE {tabela} ADD COLUMN versao INTEGER NOT NULL DEFAULT 0"))
+        conexao.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{tabela}_versao ON {tabela} (versao)"))
+    sincronizacao.criar_gatilhos(conexao)
+
+
+def _ocorrencias_versionadas(conexao):
+    # Ocorrências puladas ou materializadas passam a dar versão nova ao modelo recorrente (cache das projeções)
+    sincronizacao.criar_gatilhos_ocorrencias(conexao)
+
+
+# Lista ordenada de (versão, descrição, função). Novas migrações entram sempre no fim.
+# Tabelas novas nos modelos também pedem uma versão nova (mesmo sem nada a migrar): é o que faz o
+# create_all rodar de novo nos bancos que já estão marcados com a versão anterior.
+MIGRACOES = [
+    (1, "Índices compostos de gastos e contribuições", _indices_compostos),
+    (2, "Totais armazenados das metas", _totais_metas),
+    (3, "Índice de busca textual dos gastos", _busca_textual),
+    (4, "Consolidado mensal dos gastos", _resumo_mensal),
+    (5, "Gastos recorrentes", _gastos_recorrentes),
+    (6, "Versões de alteração para sincronização", _versoes_de_alteracao),
+    (7, "Versão dos recorrentes nas ocorrências tratadas", _ocorrencias_versionadas),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+
+def versao_do_banco(conexao) -> int:
+    _metadata.create_all(conexao)
+    return conexao.execute(select(versao_esquema.c.versao)).scalar() or 0
+
+
+def aplicar_migracoes(engine) -> list:
+    """
+    Aplica, em ordem, as migrações ainda não aplicadas; cada uma na sua transação.
+    Roda depois do create_all, que já cria as tabelas novas. Retorna as descrições aplicadas.
+    """
+    aplicadas = []
+    with engine.begin() as conexao:
+        versao = versao_do_banco(conexao)
+    for numero, descricao, migrar in MIGRACOES:
+        if numero <= versao:
+            continue
+        with engine.begin() as conexao:
+            migrar(conexao)
+            conexao.execute(versao_esquema.delete())
+            conexao.execute(versao_esquema.insert().values(versao=numero))
+        aplicadas.append(descricao)
+    return aplicadas
+
+
+def esquema_atualizado(engine) -> bool:
+    """True quando o marcador de versão já está em VERSAO_ATUAL; não cria nada no banco."""
+    with engine.connect() as conexao:
+        if not inspect(conexao).has_table(versao_esquema.name):
+            return False
+        return (conexao.execute(select(versao_esquema.c.versao)).scalar() or 0) >= VERSAO_ATUAL
+
+
+def preparar_banco(engine) -> list:
+    """
+    create_all seguido das migrações pendentes. Quando o marcador já está na versão atual os dois são
+    pulados: a inicialização faz uma única consulta em vez de inspecionar todas as tabelas.
+    """
+    if esquema_atualizado(engine):
+        return []
+    models.Base.metadata.create_all(bind=engine)
+    return aplicar_migracoes(engine)
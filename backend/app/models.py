@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Boolean, Column, Integer, String, Float, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship, Mapped
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -10,6 +10,7 @@ class Categoria(Base):
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String, unique=True, index=True, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
+    versao = Column(Integer, nullable=False, default=0, server_default="0", index=True) # Ver sincronizacao.py
     gastos = relationship("Gasto", back_populates="categoria")
 
 class CartaoCredito(Base):
@@ -19,6 +20,7 @@ class CartaoCredito(Base):
     nome = Column(String, unique=True, index=True, nullable=False)
     dia_fechamento = Column(Integer, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
+    versao = Column(Integer, nullable=False, default=0, server_default="0", index=True) # Ver sincronizacao.py
     
     gastos = relationship("Gasto", back_populates="cartao")
 
@@ -29,25 +31,42 @@ class Meta(Base):
     valor_objetivo = Column(Float, nullable=False)
     data_objetivo = Column(DateTime, nullable=False)
     data_criacao = Column(DateTime, default=datetime.utcnow)
+    # Soma das contribuições, mantida por metas.registrar_contribuicao na mesma transação
+    valor_atual = Column(Float, nullable=False, default=0.0, server_default="0")
+    versao = Column(Integer, nullable=False, default=0, server_default="0", index=True) # Ver sincronizacao.py
     contribuicoes = relationship("Contribuicao", back_populates="meta", cascade="all, delete-orphan")
-
-    @property
-    def valor_atual(self):
-        return sum(c.valor for c in self.contribuicoes)
+    subtotais = relationship("MetaSubtotal", cascade="all, delete-orphan", order_by="MetaSubtotal.responsavel")
 
 # Contribuição DEPOIS de Meta
 class Contribuicao(Base):
     __tablename__ = "contribuicoes"
+    __table_args__ = (
+        # Listagem paginada das contribuições de uma meta, da mais recente para a mais antiga
+        Index("ix_contribuicoes_meta_id_data", "meta_id", "data_contribuicao"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     valor = Column(Float, nullable=False)
     responsavel = Column(String, index=True, nullable=False)
     data_contribuicao = Column(DateTime, default=datetime.utcnow)
-    meta_id = Column(Integer, ForeignKey("metas.id"))
+    meta_id = Column(Integer, ForeignKey("metas.id"), index=True)
+    versao = Column(Integer, nullable=False, default=0, server_default="0", index=True) # Ver sincronizacao.py
     meta = relationship("Meta", back_populates="contribuicoes")
 
+# Total e quantidade de contribuições por responsável em cada meta
+class MetaSubtotal(Base):
+    __tablename__ = "metas_subtotais"
+    meta_id = Column(Integer, ForeignKey("metas.id", ondelete="CASCADE"), primary_key=True)
+    responsavel = Column(String, primary_key=True)
+    total = Column(Float, nullable=False, default=0.0)
+    quantidade = Column(Integer, nullable=False, default=0)
+
 # Gasto por último
 class Gasto(Base):
     __tablename__ = "gastos"
+    __table_args__ = (
+        Index("ix_gastos_is_parcelado_data", "is_parcelado", "data"),
+        Index("ix_gastos_cartao_id_data", "cartao_id", "data"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     nome = Column(String, index=True) # <-- RENOMEADO
@@ -59,8 +78,82 @@ class Gasto(Base):
     is_parcelado = Column(Boolean, default=False)
     numero_parcelas = Column(Integer, default=1)
     valor_parcela = Column(Float, nullable=True)
+    versao = Column(Integer, nullable=False, default=0, server_default="0", index=True) # Ver sincronizacao.py
     
-    categoria_id = Column(Integer, ForeignKey("categorias.id"))
+    categoria_id = Column(Integer, ForeignKey("categorias.id"), index=True)
     categoria = relationship("Categoria", back_populates="gastos")
     cartao_id = Column(Integer, ForeignKey("cartoes_credito.id"), nullable=True)
-    cartao = relationship("CartaoCredito", back_populates="gastos")
\ No newline at end of file
+    cartao = relationship("CartaoCredito", back_populates="gastos")
+    parcelas = relationship("Parcela", back_populates="gasto", cascade="all, delete-orphan", order_by="Parcela.numero")
+
+# Cronograma materializado das parcelas: uma linha por parcela de cada compra parcelada
+class Parcela(Base):
+    __tablename__ = "parcelas"
+    __table_args__ = (
+        Index("ix_parcelas_data_vencimento_cartao_id", "data_vencimento", "cartao_id"),
+        Index("ix_parcelas_cartao_id_data_vencimento", "cartao_id", "data_vencimento"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    gasto_id = Column(Integer, ForeignKey("gastos.id", ondelete="CASCADE"), nullable=False, index=True)
+    numero = Column(Integer, nullable=False) # 1..numero_parcelas
+    data_vencimento = Column(DateTime, nullable=False)
+    valor = Column(Float, nullable=False)
+    cartao_id = Column(Integer, ForeignKey("cartoes_credito.id"), nullable=True) # Copiado do gasto para filtrar sem join
+
+    gasto = relationship("Gasto", back_populates="parcelas")
+# Consolidado mensal: total e quantidade de lançamentos (compras à vista e parcelas no mês do vencimento)
+# por mês, categoria, cartão e responsável. Mantido por resumo_mensal na mesma transação de cada escrita.
+class ResumoMensal(Base):
+    __tablename__ = "resumo_mensal"
+    __table_args__ = (
+        Index("ix_resumo_mensal_chave", "mes", "categoria_id", "cartao_id", "responsavel"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    mes = Column(String(7), nullable=False) # 'AAAA-MM'
+    categoria_id = Column(Integer, nullable=True)
+    cartao_id = Column(Integer, nullable=True)
+    responsavel = Column(String, nullable=True)
+    total = Column(Float, nullable=False, default=0.0)
+    quantidade = Column(Integer, nullable=False, default=0)
+
+# Modelo de gasto que se repete todo mês (aluguel, assinaturas). As ocorrências não viram linhas em
+# 'gastos': são montadas na leitura por recorrentes.ocorrencias, como as parcelas de uma compra.
+class GastoRecorrente(Base):
+    __tablename__ = "gastos_recorrentes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    nome = Column(String, nullable=False)
+    anotacao = Column(String, nullable=True)
+    valor = Column(Float, nullable=False)
+    responsavel = Column(String, default="Eu")
+    dia = Column(Integer, nullable=False) # Dia do mês; nos meses mais curtos vale o último dia
+    data_inicio = Column(DateTime, nullable=False)
+    data_fim = Column(DateTime, nullable=True) # Última data possível (inclusive); None = sem fim
+    versao = Column(Integer, nullable=False, default=0, server_default="0", index=True) # Ver sincronizacao.py
+
+    categoria_id = Column(Integer, ForeignKey("categorias.id"), nullable=False)
+    categoria = relationship("Categoria")
+    cartao_id = Column(Integer, ForeignKey("cartoes_credito.id"), nullable=True)
+    cartao = relationship("CartaoCredito")
+
+# Ocorrências que deixaram de ser virtuais: viraram um gasto real ao serem editadas, ou foram excluídas
+class OcorrenciaRecorrente(Base):
+    __tablename__ = "ocorrencias_recorrentes"
+    recorrente_id = Column(Integer, ForeignKey("gastos_recorrentes.id", ondelete="CASCADE"), primary_key=True)
+    mes = Column(String(7), primary_key=True) # 'AAAA-MM'
+    gasto_id = Column(Integer, nullable=True) # Gasto criado na materialização; None se a ocorrência foi excluída
+
+# Contador global das escritas nas tabelas sincronizadas (uma única linha, id = 1)
+class VersaoAlteracoes(Base):
+    __tablename__ = "versao_alteracoes"
+    id = Column(Integer, primary_key=True)
+    valor = Column(Integer, nullable=False, default=0)
+
+# Linhas excluídas das tabelas sincronizadas, para que GET /sync informe as remoções
+class Remocao(Base):
+    __tablename__ = "remocoes"
+    versao = Column(Integer, primary_key=True)
+    tabela = Column(String, nullable=False)
+    linha_id = Column(Integer, nullable=False)
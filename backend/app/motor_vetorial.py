@@ -0,0 +1,239 @@
+"""
+Motor de cálculo vetorizado, alternativo às consultas por período (MOTOR_CALCULO=vetorial, requer numpy).
+
+Os gastos são carregados uma vez em arrays colunares e as parcelas são expandidas com operações
+vetoriais (repeat/cumsum e aritmética de datetime64). Filtros de período, janelas de fatura de vários
+cartões e meses e totais mensais saem de máscaras, searchsorted e bincount; só as linhas finais de uma
+listagem viram schemas.Gasto. O instantâneo é recarregado quando cache.respostas.geracao muda, o que
+acontece em toda escrita de gastos, categorias e cartões.
+"""
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import String, func, select, type_coerce
+from sqlalchemy.orm import Session
+
+from . import cache, models, referencias, schemas
+
+MOTOR = os.getenv("MOTOR_CALCULO", "sql")
+
+# numpy só é importado quando o motor é pedido: a importação custa dezenas de ms na inicialização
+np = None
+if MOTOR == "vetorial":
+    try:
+        import numpy as np
+    except ImportError: # numpy é opcional; sem ele o motor SQL continua sendo usado
+        np = None
+
+HABILITADO = MOTOR == "vetorial" and np is not None
+
+# Ids por consulta ao buscar os gastos das linhas finais
+TAMANHO_LOTE_IDS = 500
+
+# Valor usado no lugar de cartao_id/categoria_id nulos
+SEM_ID = -1
+
+
+class Lancamentos:
+    """
+    Uma linha por aparição nas telas: a compra à vista na data dela e cada parcela no seu vencimento.
+    Compras parceladas sem número de parcelas não aparecem em nenhum período, como no motor SQL.
+    """
+
+    def __init__(self, gasto_id, data_compra, vencimento, valor, cartao_id, categoria_id, parcela, geracao=0):
+        self.gasto_id = gasto_id
+        self.data_compra = data_compra
+        self.vencimento = vencimento
+        self.valor = valor
+        self.cartao_id = cartao_id
+        self.categoria_id = categoria_id
+        self.parcela = parcela # 0 = compra à vista
+        self.geracao = geracao
+        self._por_cartao: Dict[int, Tuple["np.ndarray", "np.ndarray"]] = {}
+
+    def __len__(self):
+        return len(self.gasto_id)
+
+    def ordenado_por_cartao(self, cartao_id: int):
+        """Vencimentos ordenados e a soma acumulada dos valores de um cartão (calculado uma vez por instantâneo)."""
+        if cartao_id not in self._por_cartao:
+            indices = np.flatnonzero(self.cartao_id == cartao_id)
+            ordem = indices[np.argsort(self.vencimento[indices], kind="stable")]
+            acumulado = np.concatenate(([0.0], np.cumsum(self.valor[ordem])))
+            self._por_cartao[cartao_id] = (self.vencimento[ordem], acumulado)
+        return self._por_cartao[cartao_id]
+
+
+# --- DATAS ---
+def _dias_no_mes(meses):
+    return ((meses + 1).astype("datetime64[D]") - meses.astype("datetime64[D]")).astype(np.int64)
+
+
+def somar_meses(datas, meses):
+    """datas + N meses com o dia limitado ao último dia do mês, como relativedelta(months=N)."""
+    mes_base = datas.astype("datetime64[M]")
+    dia = (datas - mes_base.astype("datetime64[D]")).astype(np.int64)
+    mes_alvo = mes_base + meses
+    return mes_alvo.astype("datetime64[D]") + np.minimum(dia, _dias_no_mes(mes_alvo) - 1)
+
+
+def como_dia(valor) -> "np.datetime64":
+    return np.datetime64(valor, "D") if not isinstance(valor, datetime) else np.datetime64(valor.date(), "D")
+
+
+def janelas_fatura(dias_fechamento: Sequence[int], meses: Sequence[str]):
+    """
+    Janelas [inicio, fim) das faturas de cada cartão (linhas) em cada mês 'AAAA-MM' (colunas),
+    com a mesma regra de agregacoes.periodo_fatura: fecha no dia_fechamento (ou no último dia do mês
+    quando ele não existe) e começa no fechamento do mês anterior.
+    """
+    dias = np.asarray(dias_fechamento, dtype=np.int64)[:, None]
+    meses = np.asarray(meses, dtype="datetime64[M]")[None, :]
+    ultimo = _dias_no_mes(meses)
+    dia = np.where((dias >= 1) & (dias <= ultimo), dias, ultimo)
+    fechamento = meses.astype("datetime64[D]") + (dia - 1)
+    return somar_meses(fechamento, -1), fechamento
+
+
+# --- CARGA ---
+def _colunas_de_carga(db: Session):
+    """
+    Colunas do gasto já no formato dos arrays. No SQLite a data sai como texto 'AAAA-MM-DD' de date(), que o
+    numpy converte de uma vez, e os nulos já vêm trocados no SQL: nada é convertido linha a linha em Python.
+    """
+    sqlite = db.get_bind().dialect.name == "sqlite"
+    data = type_coerce(func.date(models.Gasto.data), String) if sqlite else models.Gasto.data
+    return (models.Gasto.id, data, models.Gasto.valor, models.Gasto.valor_parcela,
+            func.coalesce(models.Gasto.numero_parcelas, 0), func.coalesce(models.Gasto.is_parcelado, False),
+            func.coalesce(models.Gasto.cartao_id, SEM_ID), func.coalesce(models.Gasto.categoria_id, SEM_ID)), sqlite
+
+
+def carregar(db: Session, geracao: int = 0) -> Lancamentos:
+    colunas_sql, datas_em_texto = _colunas_de_carga(db)
+    linhas = db.execute(select(*colunas_sql)).all()
+    total = len(linhas)
+    colunas = list(zip(*linhas)) if linhas else [()] * 8
+    gasto_id = np.fromiter(colunas[0], np.int64, total)
+    if datas_em_texto:
+        data = np.array(colunas[1], dtype="datetime64[D]")
+    else:
+        data = np.array([como_dia(d) for d in colunas[1]], dtype="datetime64[D]")
+    valor = np.fromiter(colunas[2], np.float64, total)
+    valor_parcela = np.array(colunas[3], dtype=np.float64) # None vira nan
+    numero = np.fromiter(colunas[4], np.int64, total)
+    parcelado = np.array(colunas[5], dtype=bool)
+    cartao_id = np.fromiter(colunas[6], np.int64, total)
+    categoria_id = np.fromiter(colunas[7], np.int64, total)
+
+    # Expande cada compra em 'quantidade' linhas: 1 à vista, N parceladas
+    quantidade = np.where(parcelado, numero, 1)
+    origem = np.repeat(np.arange(total), quantidade)
+    deslocamento = np.arange(origem.size) - np.repeat(np.cumsum(quantidade) - quantidade, quantidade)
+    a_vista = ~parcelado[origem]
+    valor_da_parcela = np.where(np.isnan(valor_parcela), valor / np.maximum(numero, 1), valor_parcela)
+    return Lancamentos(
+        gasto_id=gasto_id[origem],
+        data_compra=data[origem],
+        vencimento=somar_meses(data[origem], deslocamento),
+        valor=np.where(a_vista, valor[origem], valor_da_parcela[origem]),
+        cartao_id=cartao_id[origem],
+        categoria_id=categoria_id[origem],
+        parcela=np.where(a_vista, 0, deslocamento + 1),
+        geracao=geracao,
+    )
+
+
+_instantaneo: Optional[Lancamentos] = None
+_lock = threading.Lock()
+
+
+def instantaneo(db: Session) -> Lancamentos:
+    global _instantaneo
+    atual = _instantaneo
+    if atual is not None and atual.geracao == cache.respostas.geracao:
+        return atual
+    with _lock:
+        geracao = cache.respostas.geracao
+        if _instantaneo is None or _instantaneo.geracao != geracao:
+            _instantaneo = carregar(db, geracao)
+        return _instantaneo
+
+
+# --- CONSULTAS ---
+def linhas_do_periodo(lancamentos: Lancamentos, inicio: datetime, fim: datetime, cartao_id: Optional[int] = None,
+                      somente_parcelas: bool = False):
+    mascara = (lancamentos.vencimento >= como_dia(inicio)) & (lancamentos.vencimento < como_dia(fim))
+    if cartao_id:
+        mascara &= lancamentos.cartao_id == cartao_id
+    if somente_parcelas:
+        mascara &= lancamentos.parcela > 0
+    indices = np.flatnonzero(mascara)
+    # Mais recentes primeiro, desempate pelo id: mesma ordem do motor SQL
+    ordem = np.lexsort((lancamentos.gasto_id[indices], lancamentos.data_compra[indices]))[::-1]
+    return indices[ordem]
+
+
+def _buscar_gastos(db: Session, ids) -> Dict[int, dict]:
+    # Colunas escalares em vez do ORM: categoria e cartão vêm de referencias.py
+    gastos = {}
+    ids = np.unique(ids).tolist()
+    for inicio in range(0, len(ids), TAMANHO_LOTE_IDS):
+        consulta = select(*referencias.COLUNAS_GASTO).where(models.Gasto.id.in_(ids[inicio:inicio + TAMANHO_LOTE_IDS]))
+        for gasto in referencias.como_dicts(db, db.execute(consulta).all()):
+            gastos[gasto["id"]] = gasto
+    return gastos
+
+
+def montar_gastos(db: Session, lancamentos: Lancamentos, indices, valor_da_parcela: bool = True) -> List[schemas.Gasto]:
+    """Converte as linhas selecionadas em schemas.Gasto; as parcelas ganham parcela_atual (e o valor da parcela)."""
+    gastos = _buscar_gastos(db, lancamentos.gasto_id[indices])
+    resultado = []
+    for gasto_id, valor, parcela in zip(lancamentos.gasto_id[indices].tolist(), lancamentos.valor[indices].tolist(),
+                                        lancamentos.parcela[indices].tolist()):
+        gasto = gastos[gasto_id]
+        if parcela:
+            gasto = {**gasto, "parcela_atual": parcela, "valor": valor if valor_da_parcela else gasto["valor"]}
+        resultado.append(schemas.Gasto.model_validate(gasto))
+    return resultado
+
+
+def gastos_do_periodo(db: Session, data_inicio: datetime, data_fim: datetime, cartao_id: Optional[int] = None):
+    """Equivalente vetorizado de main._get_gastos_por_periodo."""
+    lancamentos = instantaneo(db)
+    return montar_gastos(db, lancamentos, linhas_do_periodo(lancamentos, data_inicio, data_fim, cartao_id))
+
+
+def parcelados_do_periodo(db: Session, data_inicio: datetime, data_fim: datetime):
+    """Equivalente vetorizado de main._get_parcelados_do_mes: valor total da compra e a parcela do mês."""
+    lancamentos = instantaneo(db)
+    indices = linhas_do_periodo(lancamentos, data_inicio, data_fim, somente_parcelas=True)
+    return montar_gastos(db, lancamentos, indices, valor_da_parcela=False)
+
+
+def totais_faturas(lancamentos: Lancamentos, cartoes: Sequence[Tuple[int, int]], meses: Sequence[str]):
+    """
+    Total e quantidade de cada fatura para todos os pares (cartão, mês) de uma vez.
+    'cartoes' é uma lista de (cartao_id, dia_fechamento); retorna duas matrizes [cartão, mês].
+    """
+    inicios, fins = janelas_fatura([dia for _, dia in cartoes], meses)
+    totais = np.zeros(inicios.shape)
+    quantidades = np.zeros(inicios.shape, dtype=np.int64)
+    for linha, (cartao_id, _) in enumerate(cartoes):
+        vencimentos, acumulado = lancamentos.ordenado_por_cartao(cartao_id)
+        a = np.searchsorted(vencimentos, inicios[linha], side="left")
+        b = np.searchsorted(vencimentos, fins[linha], side="left")
+        totais[linha] = acumulado[b] - acumulado[a]
+        quantidades[linha] = b - a
+    return np.round(totais, 2), quantidades
+
+
+def totais_mensais(lancamentos: Lancamentos, inicio: str, quantidade_meses: int, cartao_id: Optional[int] = None):
+    """Total por mês civil de vencimento a partir de 'AAAA-MM', para 'quantidade_meses' meses."""
+    deslocamento = (lancamentos.vencimento.astype("datetime64[M]") - np.datetime64(inicio, "M")).astype(np.int64)
+    mascara = (deslocamento >= 0) & (deslocamento < quantidade_meses)
+    if cartao_id:
+        mascara &= lancamentos.cartao_id == cartao_id
+    totais = np.bincount(deslocamento[mascara], weights=lancamentos.valor[mascara], minlength=quantidade_meses)
+    return np.round(totais, 2)
@@ -0,0 +1,75 @@
+from datetime import datetime
+from typing import List
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Campos do gasto que, se alterados, mudam o cronograma de parcelas
+CAMPOS_PARCELAMENTO = {"data", "is_parcelado", "numero_parcelas", "valor_parcela", "valor", "cartao_id"}
+
+# Quantidade de linhas inseridas por comando no backfill
+TAMANHO_LOTE = 1000
+
+
+def como_datetime(valor):
+    # O GastoCreate recebe 'date', mas a coluna guarda 'datetime'
+    if isinstance(valor, datetime):
+        return valor
+    return datetime(valor.year, valor.month, valor.day)
+
+
+def calcular_parcelas(gasto) -> List[dict]:
+    """
+    Gera o cronograma (numero, data_vencimento, valor, cartao_id) de uma compra.
+    A parcela N vence N-1 meses depois da data da compra. Compras à vista não têm parcelas.
+    """
+    if not gasto.is_parcelado or not gasto.numero_parcelas:
+        return []
+    data_compra = como_datetime(gasto.data)
+    valor = gasto.valor_parcela
+    if valor is None:
+        valor = gasto.valor / gasto.numero_parcelas
+    return [
+        {
+            "numero": i + 1,
+            "data_vencimento": data_compra + relativedelta(months=+i),
+            "valor": valor,
+            "cartao_id": gasto.cartao_id,
+        }
+        for i in range(gasto.numero_parcelas)
+    ]
+
+
+def sincronizar_parcelas(gasto: models.Gasto):
+    # Substitui a coleção inteira; o delete-orphan remove as parcelas antigas no commit
+    gasto.parcelas = [models.Parcela(**dados) for dados in calcular_parcelas(gasto)]
+
+
+def precisa_backfill(db: Session) -> bool:
+    # Bancos criados antes da tabela 'parcelas' têm compras parceladas sem cronograma
+    tem_parcelados = db.query(models.Gasto.id).filter(models.Gasto.is_parcelado == True).first() is not None
+    tem_parcelas = db.query(models.Parcela.id).first() is not None
+    return tem_parcelados and not tem_parcelas
+
+
+def backfill_parcelas(db: Session) -> int:
+    """Reconstrói toda a tabela 'parcelas' a partir dos gastos. Retorna quantas parcelas foram geradas."""
+    db.execute(delete(models.Parcela))
+    compras = db.query(models.Gasto).filter(models.Gasto.is_parcelado == True).yield_per(TAMANHO_LOTE)
+    lote = []
+    total = 0
+    for compra in compras:
+        for dados in calcular_parcelas(compra):
+            lote.append({**dados, "gasto_id": compra.id})
+        if len(lote) >= TAMANHO_LOTE:
+            db.execute(insert(models.Parcela), lote)
+            total += len(lote)
+            lote = []
+    if lote:
+        db.execute(insert(models.Parcela), lote)
+        total += len(lote)
+    db.commit()
+    return total
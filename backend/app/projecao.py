@@ -0,0 +1,157 @@
+"""
+Projeções (GET /projecoes): o total esperado das próximas faturas de cada cartão e a data prevista para
+cada meta ser atingida.
+
+Faturas: as janelas de todos os cartões em todos os meses do horizonte (até MAX_MESES) são montadas de uma
+vez, e os lançamentos que caem nelas (parcelas a vencer, compras à vista já feitas e ocorrências dos gastos
+recorrentes) vêm de uma única consulta, atribuídos às janelas numa só passada, como em GET /faturas/batch.
+
+Metas: a média mensal das contribuições nos últimos 'historico_meses' (ou desde a criação da meta, se for
+mais recente) projeta quando o que falta será coberto, e quanto seria preciso por mês para chegar na data
+objetivo. Uma única consulta agrupada atende todas as metas.
+
+As respostas ficam em memória associadas à versão de sincronização (sincronizacao.versao_atual): qualquer
+escrita nas tabelas envolvidas muda a versão, inclusive vinda de outro processo, e o dia também faz parte
+da chave.
+"""
+import bisect
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Hashable, List, Optional, Tuple
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from . import agregacoes, models, recorrentes
+
+MAX_MESES = 120
+MAX_HISTORICO_MESES = 60
+DIAS_POR_MES = 365.2425 / 12
+# Além disso (100 anos) a meta fica sem data prevista
+MAX_MESES_PREVISAO = 1200
+
+SERIES = ("parcelas", "a_vista", "recorrentes")
+
+
+# --- FATURAS ---
+def meses_do_horizonte(hoje: datetime, quantidade: int) -> List[datetime]:
+    primeiro = datetime(hoje.year, hoje.month, 1)
+    return [primeiro + relativedelta(months=+i) for i in range(quantidade)]
+
+
+def faturas(db: Session, cartoes, meses: List[datetime]) -> List[dict]:
+    """
+    Séries alinhadas com 'meses' para cada cartão: parcelas, compras à vista, ocorrências recorrentes e o
+    total da fatura de cada mês. 'cartoes' são modelos (ou objetos com id, nome e dia_fechamento).
+    """
+    if not cartoes or not meses:
+        return []
+    por_cartao = {}
+    for cartao in cartoes:
+        inicios, fins = [], []
+        for mes in meses:
+            periodo_inicio, periodo_fim = agregacoes.periodo_fatura(mes.year, mes.month, cartao.dia_fechamento)
+            inicios.append(periodo_inicio)
+            fins.append(periodo_fim + timedelta(days=1))
+        por_cartao[cartao.id] = (inicios, fins, {serie: [0.0] * len(meses) for serie in SERIES})
+
+    inicio_geral = min(inicios[0] for inicios, _, _ in por_cartao.values())
+    fim_geral = max(fins[-1] for _, fins, _ in por_cartao.values())
+    lancamentos = [("a_vista" if parcela is None else "parcelas", cartao_id, data, valor) for _, parcela, cartao_id, data, valor
+                   in agregacoes.lancamentos_de_cartoes(db, list(por_cartao), inicio_geral, fim_geral)]
+    lancamentos.extend(("recorrentes", ocorrencia.cartao_id, ocorrencia.data, ocorrencia.valor)
+                       for ocorrencia in recorrentes.ocorrencias(db, inicio_geral, fim_geral, list(por_cartao)))
+    for serie, cartao_id, data, valor in lancamentos:
+        inicios, fins, series = por_cartao[cartao_id]
+        # Com dia_fechamento >= 29 janelas vizinhas podem se sobrepor, e o lançamento entra nas duas
+        for i in range(bisect.bisect_right(fins, data), bisect.bisect_right(inicios, data)):
+            series[serie][i] += valor
+
+    resultado = []
+    for cartao in cartoes:
+        series = por_cartao[cartao.id][2]
+        resultado.append({
+            "cartao_id": cartao.id, "nome": cartao.nome,
+            **{serie: [round(valor, 2) for valor in valores] for serie, valores in series.items()},
+            "total": [round(sum(valores), 2) for valores in zip(*series.values())],
+        })
+    return resultado
+
+
+# --- METAS ---
+def metas(db: Session, hoje: datetime, historico_meses: int) -> List[dict]:
+    inicio_historico = hoje - relativedelta(months=+historico_meses)
+    contribuicoes = {meta_id: (soma, primeira) for meta_id, soma, primeira in db.execute(
+        select(models.Contribuicao.meta_id, func.sum(models.Contribuicao.valor), func.min(models.Contribuicao.data_contribuicao))
+        .where(models.Contribuicao.data_contribuicao >= inicio_historico)
+        .group_by(models.Contribuicao.meta_id)
+    )}
+    resultado = []
+    for meta in db.query(models.Meta).order_by(models.Meta.data_objetivo, models.Meta.id):
+        soma, primeira = contribuicoes.get(meta.id, (0.0, None))
+        # Meta mais nova que o histórico: a média conta só desde que ela existe (no mínimo um mês)
+        inicio = max(inicio_historico, min(data for data in (meta.data_criacao, primeira, hoje) if data is not None))
+        media = (soma or 0.0) / max(1.0, (hoje - inicio).days / DIAS_POR_MES)
+        restante = max(0.0, meta.valor_objetivo - meta.valor_atual)
+        data_prevista = None
+        if restante == 0:
+            data_prevista = hoje.date()
+        elif media > 0 and restante / media <= MAX_MESES_PREVISAO:
+            data_prevista = (hoje + timedelta(days=restante / media * DIAS_POR_MES)).date()
+        meses_ate_objetivo = (meta.data_objetivo - hoje).days / DIAS_POR_MES
+        resultado.append({
+            "meta_id": meta.id, "nome": meta.nome, "valor_objetivo": meta.valor_objetivo,
+            "valor_atual": round(meta.valor_atual, 2), "media_mensal": round(media, 2),
+            "data_objetivo": meta.data_objetivo.date(), "data_prevista": data_prevista, "atingida": restante == 0,
+            "no_prazo": data_prevista is not None and data_prevista <= meta.data_objetivo.date(),
+            "necessario_por_mes": round(restante / meses_ate_objetivo, 2) if restante and meses_ate_objetivo >= 1 else None,
+        })
+    return resultado
+
+
+def projetar(db: Session, hoje: datetime, quantidade_meses: int, cartoes, historico_meses: int) -> dict:
+    meses = meses_do_horizonte(hoje, quantidade_meses)
+    lista_faturas = faturas(db, cartoes, meses)
+    return {
+        "meses": [mes.strftime("%Y-%m") for mes in meses],
+        "total": [round(sum(valores), 2) for valores in zip(*(fatura["total"] for fatura in lista_faturas))]
+                 if lista_faturas else [0.0] * len(meses),
+        "faturas": lista_faturas,
+        "metas": metas(db, hoje, historico_meses),
+    }
+
+
+# --- CACHE ---
+class CacheProjecoes:
+    """LRU pequeno de respostas prontas; uma entrada só vale para a versão em que foi calculada."""
+
+    def __init__(self, max_entradas: int = int(os.getenv("PROJECOES_MAX_ENTRADAS", "32"))):
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[Hashable, Tuple[int, bytes, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave: Hashable, versao: int) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None or entrada[0] != versao:
+                return None
+            self._entradas.move_to_end(chave)
+            return entrada[1], entrada[2]
+
+    def guardar(self, chave: Hashable, versao: Optional[int], corpo: bytes) -> str:
+        """Guarda e devolve o ETag do corpo. Sem versão (banco sem sincronização) só calcula o ETag."""
+        etag = '"' + hashlib.blake2b(corpo, digest_size=16).hexdigest() + '"'
+        with self._lock:
+            if self.max_entradas > 0 and versao is not None:
+                self._entradas[chave] = (versao, corpo, etag)
+                self._entradas.move_to_end(chave)
+                while len(self._entradas) > self.max_entradas:
+                    self._entradas.popitem(last=False)
+        return etag
+
+
+cache = CacheProjecoes()
@@ -0,0 +1,187 @@
+"""
+Gastos recorrentes: um modelo (valor, categoria, cartão, dia do mês, início e fim) no lugar de um gasto
+digitado todo mês.
+
+As ocorrências não são gravadas em 'gastos'. Como as parcelas de uma compra, elas viram linhas virtuais
+nas leituras por período (listas do mês, faturas, resumo e relatório), com id negativo que codifica o
+modelo e o mês (id_virtual). Os modelos cabem na memória: são lidos uma vez por geração do cache de
+respostas, então as telas do mês continuam com uma única consulta aos gastos.
+
+Editar uma ocorrência (PUT /gastos/{id negativo}) a materializa: vira um gasto real e o mês fica marcado
+em 'ocorrencias_recorrentes', assim como excluir (o mês é pulado). Alterar o modelo muda todas as
+ocorrências ainda virtuais; para mudar só daqui em diante, encerre o modelo (data_fim) e crie outro.
+"""
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Collection, Optional, Tuple
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy.orm import Session
+
+from . import cache, models, referencias, schemas
+
+# id virtual = -(recorrente_id * FATOR_ID + ano * 12 + mes - 1)
+FATOR_ID = 100_000
+
+
+def id_virtual(recorrente_id: int, ano: int, mes: int) -> int:
+    return -(recorrente_id * FATOR_ID + ano * 12 + mes - 1)
+
+
+def decodificar_id(gasto_id: int) -> Tuple[int, int, int]:
+    """(recorrente_id, ano, mes) de um id virtual."""
+    recorrente_id, indice = divmod(-gasto_id, FATOR_ID)
+    ano, mes = divmod(indice, 12)
+    return recorrente_id, ano, mes + 1
+
+
+def data_no_mes(dia: int, ano: int, mes: int) -> datetime:
+    # Dia 31 em fevereiro vira o último dia do mês, como o fechamento dos cartões
+    inicio = datetime(ano, mes, 1)
+    ultimo = (inicio + relativedelta(months=+1) - timedelta(days=1)).day
+    return inicio.replace(day=min(dia, ultimo))
+
+
+# --- MODELOS EM MEMÓRIA ---
+class Instantaneo:
+    """Modelos com categoria/cartão já serializados e os meses tratados, válidos para uma geração do cache."""
+
+    def __init__(self, modelos, tratadas, geracao: int):
+        self.modelos = modelos
+        self.tratadas = tratadas
+        self.geracao = geracao
+
+
+_instantaneo: Optional[Instantaneo] = None
+_lock = threading.Lock()
+
+
+def _carregar(db: Session, geracao: int) -> Instantaneo:
+    modelos = []
+    lidos = db.query(models.GastoRecorrente).order_by(models.GastoRecorrente.id).all()
+    # Categoria e cartão já em schemas, da memória (ver referencias.py)
+    atual = referencias.cobrindo(db, {modelo.categoria_id for modelo in lidos}, {modelo.cartao_id for modelo in lidos})
+    for modelo in lidos:
+        modelos.append(SimpleNamespace(
+            id=modelo.id, nome=modelo.nome, anotacao=modelo.anotacao, valor=modelo.valor, responsavel=modelo.responsavel,
+            dia=modelo.dia, data_inicio=modelo.data_inicio, data_fim=modelo.data_fim,
+            categoria_id=modelo.categoria_id, cartao_id=modelo.cartao_id,
+            categoria=atual.categorias.get(modelo.categoria_id), cartao=atual.cartoes.get(modelo.cartao_id),
+        ))
+    tratadas = set(db.query(models.OcorrenciaRecorrente.recorrente_id, models.OcorrenciaRecorrente.mes).all())
+    return Instantaneo(modelos, tratadas, geracao)
+
+
+def instantaneo(db: Session) -> Instantaneo:
+    # Toda escrita invalida o cache de respostas e aumenta a geração: o próximo acesso relê os modelos
+    global _instantaneo
+    if not cache.respostas.ativo:
+        # Sem cache (vários workers) a geração não acompanha as escritas: os modelos são lidos a cada vez
+        return _carregar(db, cache.respostas.geracao)
+    atual = _instantaneo
+    if atual is not None and atual.geracao == cache.respostas.geracao:
+        return atual
+    with _lock:
+        geracao = cache.respostas.geracao
+        if _instantaneo is None or _instantaneo.geracao != geracao:
+            _instantaneo = _carregar(db, geracao)
+        return _instantaneo
+
+
+# --- OCORRÊNCIAS ---
+def _ocorrencia(modelo, data: datetime):
+    return SimpleNamespace(
+        id=id_virtual(modelo.id, data.year, data.month), recorrente_id=modelo.id,
+        nome=modelo.nome, anotacao=modelo.anotacao, valor=modelo.valor, responsavel=modelo.responsavel, data=data,
+        categoria_id=modelo.categoria_id, cartao_id=modelo.cartao_id, categoria=modelo.categoria, cartao=modelo.cartao,
+        is_parcelado=False, numero_parcelas=1, valor_parcela=None, parcela_atual=None,
+    )
+
+
+def ocorrencias(db: Session, inicio: datetime, fim: datetime, cartoes: Optional[Collection[Optional[int]]] = None) -> list:
+    """
+    Ocorrências virtuais com data entre inicio (inclusive) e fim (exclusivo), com os atributos de um gasto
+    à vista. 'cartoes' restringe aos cartões listados (None na lista = débito); sem ele vêm todas.
+    """
+    atual = instantaneo(db)
+    resultado = []
+    for modelo in atual.modelos:
+        if cartoes is not None and modelo.cartao_id not in cartoes:
+            continue
+        mes = datetime(max(inicio, modelo.data_inicio).year, max(inicio, modelo.data_inicio).month, 1)
+        while mes < fim:
+            data = data_no_mes(modelo.dia, mes.year, mes.month)
+            if modelo.data_fim is not None and data > modelo.data_fim:
+                break
+            if (inicio <= data < fim and data >= modelo.data_inicio
+                    and (modelo.id, data.strftime("%Y-%m")) not in atual.tratadas):
+                resultado.append(_ocorrencia(modelo, data))
+            mes += relativedelta(months=+1)
+    return resultado
+
+
+def como_gasto(ocorrencia) -> schemas.Gasto:
+    return schemas.Gasto.from_orm(ocorrencia)
+
+
+def como_linha(ocorrencia) -> list:
+    """Linha no formato compacto (compacto.CAMPOS)."""
+    return [ocorrencia.id, ocorrencia.nome, ocorrencia.anotacao, ocorrencia.valor, ocorrencia.responsavel,
+            ocorrencia.data, ocorrencia.categoria_id, ocorrencia.cartao_id, False, 1, None, None]
+
+
+def totais_agrupados(lista_ocorrencias, responsavel: Optional[str] = None) -> list:
+    """Linhas (categoria_id, cartao_id, responsavel, total, quantidade), como agregacoes.totais_agrupados."""
+    grupos = defaultdict(lambda: [0.0, 0])
+    for ocorrencia in lista_ocorrencias:
+        if responsavel and ocorrencia.responsavel != responsavel:
+            continue
+        grupo = grupos[(ocorrencia.categoria_id, ocorrencia.cartao_id, ocorrencia.responsavel)]
+        grupo[0] += ocorrencia.valor
+        grupo[1] += 1
+    return [(*chave, total, quantidade) for chave, (total, quantidade) in grupos.items()]
+
+
+# --- ESCRITAS ---
+def _ocorrencia_pelo_id(db: Session, gasto_id: int):
+    """A ocorrência virtual do id, ou None se o modelo não existe, o mês está fora do período ou já foi tratado."""
+    recorrente_id, ano, mes = decodificar_id(gasto_id)
+    modelo = db.query(models.GastoRecorrente).get(recorrente_id)
+    if modelo is None or not 1 <= ano <= 9999 or id_virtual(recorrente_id, ano, mes) != gasto_id:
+        return None
+    data = data_no_mes(modelo.dia, ano, mes)
+    if data < modelo.data_inicio or (modelo.data_fim is not None and data > modelo.data_fim):
+        return None
+    if db.query(models.OcorrenciaRecorrente).get((recorrente_id, data.strftime("%Y-%m"))) is not None:
+        return None
+    return modelo, data
+
+
+def materializar(db: Session, gasto_id: int) -> Optional[models.Gasto]:
+    """
+    Grava a ocorrência do id virtual como um gasto real e marca o mês como tratado. Não faz commit e não
+    mexe no consolidado mensal (quem chama registra o gasto). None se a ocorrência não existe.
+    """
+    encontrada = _ocorrencia_pelo_id(db, gasto_id)
+    if encontrada is None:
+        return None
+    modelo, data = encontrada
+    gasto = models.Gasto(nome=modelo.nome, anotacao=modelo.anotacao, valor=modelo.valor, responsavel=modelo.responsavel,
+                         data=data, categoria_id=modelo.categoria_id, cartao_id=modelo.cartao_id,
+                         is_parcelado=False, numero_parcelas=1)
+    db.add(gasto)
+    db.flush()
+    db.add(models.OcorrenciaRecorrente(recorrente_id=modelo.id, mes=data.strftime("%Y-%m"), gasto_id=gasto.id))
+    return gasto
+
+
+def pular(db: Session, gasto_id: int):
+    """Exclui uma ocorrência virtual (o mês deixa de aparecer). Retorna a ocorrência, ou None se não existe."""
+    encontrada = _ocorrencia_pelo_id(db, gasto_id)
+    if encontrada is None:
+        return None
+    modelo, data = encontrada
+    db.add(models.OcorrenciaRecorrente(recorrente_id=modelo.id, mes=data.strftime("%Y-%m")))
+    return _ocorrencia(modelo, data)
@@ -0,0 +1,118 @@
+"""
+Categorias e cartões em memória.
+
+São poucas linhas que quase nunca mudam, mas aparecem em todo gasto listado. Em vez de um JOIN com as duas
+tabelas (e um objeto do ORM por linha), as consultas de gastos leem só as colunas escalares e pegam categoria
+e cartão daqui pelo id, já convertidos em schemas; GET /categorias/ e GET /cartoes/ também saem daqui.
+
+O instantâneo vale para uma versão do processo, que as rotas de escrita de categorias e cartões incrementam
+com invalidar() depois do commit; ele não depende do cache de respostas (CACHE_RESPOSTAS=0 não o desliga).
+Com vários workers as escritas acontecem no processo escritor e invalidar() roda lá, não aqui: o instantâneo
+guarda também o contador de sincronização do banco (sincronizacao.py) e, quando ele anda, confere se foi em
+categorias ou cartões antes de reler. Sem o contador (fora do SQLite), as referências são lidas a cada uso.
+"""
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from . import escritor, models, schemas, sincronizacao
+
+# Tabelas do instantâneo, com os nomes de sincronizacao.TABELAS
+TABELAS = ("categorias", "cartoes")
+
+
+class Referencias:
+    def __init__(self, categorias: Dict[int, schemas.Categoria], cartoes: Dict[int, schemas.CartaoCredito], versao: int,
+                 versao_banco: Optional[int] = None):
+        self.categorias = categorias
+        self.cartoes = cartoes
+        self.versao = versao
+        self.versao_banco = versao_banco # Contador de sincronização na carga; só quando as escritas são delegadas
+
+
+versao = 0
+_instantaneo: Optional[Referencias] = None
+_lock = threading.Lock()
+
+
+def invalidar():
+    """Chamada depois de gravar em categorias ou cartões: o próximo acesso relê as duas tabelas."""
+    global versao
+    with _lock:
+        versao += 1
+
+
+def _carregar(db: Session, versao_lida: int, versao_banco: Optional[int] = None) -> Referencias:
+    categorias = {c.id: schemas.Categoria.from_orm(c) for c in db.query(models.Categoria).order_by(models.Categoria.nome)}
+    cartoes = {c.id: schemas.CartaoCredito.from_orm(c) for c in db.query(models.CartaoCredito).order_by(models.CartaoCredito.nome)}
+    return Referencias(categorias, cartoes, versao_lida, versao_banco)
+
+
+def _em_dia(db: Session, atual: Referencias) -> bool:
+    if atual.versao != versao:
+        return False
+    if atual.versao_banco is None:
+        return True
+    versao_banco = sincronizacao.versao_atual(db)
+    if versao_banco == atual.versao_banco:
+        return True
+    if sincronizacao.tabelas_alteradas(db, atual.versao_banco, TABELAS):
+        return False
+    # O contador andou por escritas em outras tabelas: o instantâneo continua valendo até a versão lida
+    atual.versao_banco = versao_banco
+    return True
+
+
+def instantaneo(db: Session) -> Referencias:
+    global _instantaneo
+    delegadas = escritor.delegar_escritas()
+    if delegadas and not sincronizacao.disponivel(db):
+        return _carregar(db, versao)
+    atual = _instantaneo
+    if atual is not None and _em_dia(db, atual):
+        return atual
+    with _lock:
+        if _instantaneo is not atual and _em_dia(db, _instantaneo):
+            return _instantaneo
+        # As versões são lidas antes das tabelas: uma escrita no meio da leitura deixa o instantâneo já vencido
+        _instantaneo = _carregar(db, versao, sincronizacao.versao_atual(db) if delegadas else None)
+        return _instantaneo
+
+
+def categorias_ativas(db: Session) -> List[schemas.Categoria]:
+    """Em ordem de nome, como GET /categorias/."""
+    return [categoria for categoria in instantaneo(db).categorias.values() if categoria.is_active]
+
+
+def cartoes(db: Session, include_inactive: bool = False) -> List[schemas.CartaoCredito]:
+    """Em ordem de nome, como GET /cartoes/."""
+    return [cartao for cartao in instantaneo(db).cartoes.values() if include_inactive or cartao.is_active]
+
+
+# --- GASTOS SEM JOIN ---
+COLUNAS_GASTO = (models.Gasto.id, models.Gasto.nome, models.Gasto.anotacao, models.Gasto.valor, models.Gasto.responsavel,
+                 models.Gasto.data, models.Gasto.is_parcelado, models.Gasto.numero_parcelas, models.Gasto.valor_parcela,
+                 models.Gasto.categoria_id, models.Gasto.cartao_id)
+
+
+def cobrindo(db: Session, categoria_ids, cartao_ids) -> Referencias:
+    """
+    Instantâneo que conhece os ids pedidos. Um id desconhecido (gravado por fora da API, ex.: seed.py com a
+    aplicação aberta) força uma releitura; se nem assim ele existir, fica de fora.
+    """
+    atual = instantaneo(db)
+    if not (set(categoria_ids) <= atual.categorias.keys() and set(cartao_ids) - {None} <= atual.cartoes.keys()):
+        invalidar()
+        atual = instantaneo(db)
+    return atual
+
+
+def como_dicts(db: Session, linhas) -> List[dict]:
+    """Linhas de COLUNAS_GASTO no formato de schemas.Gasto, com categoria e cartão do instantâneo."""
+    gastos = [linha._asdict() for linha in linhas]
+    atual = cobrindo(db, {gasto["categoria_id"] for gasto in gastos}, {gasto["cartao_id"] for gasto in gastos})
+    for gasto in gastos:
+        gasto["categoria"] = atual.categorias.get(gasto.pop("categoria_id"))
+        gasto["cartao"] = atual.cartoes.get(gasto.pop("cartao_id"))
+    return gastos
@@ -0,0 +1,155 @@
+"""
+Consolidado mensal dos gastos: tabela 'resumo_mensal' com total e quantidade de lançamentos por
+(mês, categoria, cartão, responsável). Compras à vista contam no mês da compra e cada parcela no mês do
+seu vencimento, as mesmas regras de agregacoes._lancamentos.
+
+As escritas de gastos aplicam a diferença (registrar_gasto / atualizar_gasto) na mesma transação, antes
+do commit; importações em lote somam as variações do lote inteiro. reconstruir e verificar refazem a
+conta a partir dos gastos e parcelas (comando backend/consolidar_resumo.py). As leituras ficam em
+agregacoes (relatorio_mensal e totais_consolidados).
+"""
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from . import agregacoes, models, parcelas
+
+# (mes 'AAAA-MM', categoria_id, cartao_id, responsavel)
+Chave = Tuple[str, Optional[int], Optional[int], Optional[str]]
+
+# Diferenças de total menores que isso (meio centavo) são resíduo de ponto flutuante
+TOLERANCIA = 0.005
+
+
+def lancamentos_do_gasto(gasto) -> Dict[Chave, List]:
+    """[total, quantidade] por chave de um gasto (modelo, GastoCreate ou SimpleNamespace com os mesmos campos)."""
+    if gasto.is_parcelado:
+        itens = [(dados["data_vencimento"], dados["cartao_id"], dados["valor"]) for dados in parcelas.calcular_parcelas(gasto)]
+    else:
+        itens = [(gasto.data, gasto.cartao_id, gasto.valor)]
+    variacoes = defaultdict(lambda: [0.0, 0])
+    for data, cartao_id, valor in itens:
+        item = variacoes[(data.strftime("%Y-%m"), gasto.categoria_id, cartao_id, gasto.responsavel)]
+        item[0] += valor
+        item[1] += 1
+    return variacoes
+
+
+def aplicar(db: Session, variacoes: Dict[Chave, List], sinal: int = 1):
+    """
+    Soma (sinal=1) ou subtrai (sinal=-1) as variações no consolidado: um SELECT das linhas dos meses
+    envolvidos, um UPDATE relativo (total = total + x) em lote para as chaves existentes, um INSERT para
+    as novas e a remoção das que ficaram sem lançamentos. Não faz commit.
+    """
+    variacoes = {chave: (sinal * total, sinal * quantidade) for chave, (total, quantidade) in variacoes.items()
+                 if quantidade != 0 or abs(total) >= TOLERANCIA}
+    if not variacoes:
+        return
+    tabela = models.ResumoMensal.__table__
+    existentes = {tuple(linha[1:]): linha[0] for linha in db.execute(
+        select(tabela.c.id, tabela.c.mes, tabela.c.categoria_id, tabela.c.cartao_id, tabela.c.responsavel)
+        .where(tabela.c.mes.in_(sorted({chave[0] for chave in variacoes})))
+    )}
+    atualizacoes, novas, reduzidas = [], [], []
+    for chave, (total, quantidade) in variacoes.items():
+        if chave in existentes:
+            atualizacoes.append({"id_linha": existentes[chave], "variacao_total": total, "variacao_quantidade": quantidade})
+            if quantidade < 0:
+                reduzidas.append(existentes[chave])
+        elif quantidade > 0:
+            mes, categoria_id, cartao_id, responsavel = chave
+            novas.append({"mes": mes, "categoria_id": categoria_id, "cartao_id": cartao_id, "responsavel": responsavel,
+                          "total": total, "quantidade": quantidade})
+    if atualizacoes:
+        db.execute(update(tabela).where(tabela.c.id == bindparam("id_linha")).values(
+            total=tabela.c.total + bindparam("variacao_total"),
+            quantidade=tabela.c.quantidade + bindparam("variacao_quantidade"),
+        ), atualizacoes)
+    if novas:
+        db.execute(insert(tabela), novas)
+    if reduzidas:
+        db.execute(delete(tabela).where(tabela.c.id.in_(reduzidas), tabela.c.quantidade <= 0))
+
+
+def registrar_gasto(db: Session, gasto, sinal: int = 1):
+    """Inclui (sinal=1) ou retira (sinal=-1) todos os lançamentos de um gasto."""
+    aplicar(db, lancamentos_do_gasto(gasto), sinal)
+
+
+def atualizar_gasto(db: Session, antes: Dict[Chave, List], gasto):
+    """
+    Aplica só a diferença entre os lançamentos de antes da alteração e os atuais: mudar data, parcelas
+    ou cartão move o valor entre chaves; as chaves que não mudaram não são tocadas.
+    """
+    aplicar_diferenca(db, antes, lancamentos_do_gasto(gasto))
+
+
+def aplicar_diferenca(db: Session, antes: Dict[Chave, List], depois: Dict[Chave, List]):
+    aplicar(db, diferenca(antes, depois))
+
+
+def diferenca(antes: Dict[Chave, List], depois: Dict[Chave, List]) -> Dict[Chave, List]:
+    return somar([depois, {chave: [-total, -quantidade] for chave, (total, quantidade) in antes.items()}])
+
+
+def somar(lista_variacoes) -> Dict[Chave, List]:
+    """Soma várias variações (ex.: de todos os gastos de um lote) para aplicar de uma vez só."""
+    soma = defaultdict(lambda: [0.0, 0])
+    for variacoes in lista_variacoes:
+        for chave, (total, quantidade) in variacoes.items():
+            soma[chave][0] += total
+            soma[chave][1] += quantidade
+    return soma
+
+
+def somar_gastos(gastos) -> Dict[Chave, List]:
+    return somar(lancamentos_do_gasto(gasto) for gasto in gastos)
+
+
+def lancamentos_dos_gastos(db: Session, ids: List[int]) -> Dict[Chave, List]:
+    """Como lancamentos_do_gasto, somado para vários gastos já gravados e calculado no banco."""
+    return {tuple(linha[:4]): [linha[4] or 0.0, linha[5]]
+            for linha in db.execute(_consulta_calculada(agregacoes.lancamentos_de_gastos(ids)))}
+
+
+def _consulta_calculada(lancamentos=None):
+    if lancamentos is None:
+        lancamentos = agregacoes.todos_lancamentos()
+    colunas = (agregacoes.mes_ano(lancamentos.c.data), lancamentos.c.categoria_id,
+               lancamentos.c.cartao_id, lancamentos.c.responsavel)
+    return select(*colunas, func.sum(lancamentos.c.valor), func.count()).group_by(*colunas)
+
+
+def reconstruir(conexao) -> int:
+    """Refaz todo o consolidado a partir dos gastos e parcelas. Retorna quantas linhas foram gravadas."""
+    tabela = models.ResumoMensal.__table__
+    conexao.execute(delete(tabela))
+    conexao.execute(insert(tabela).from_select(
+        ["mes", "categoria_id", "cartao_id", "responsavel", "total", "quantidade"], _consulta_calculada()
+    ))
+    return conexao.execute(select(func.count()).select_from(tabela)).scalar()
+
+
+def verificar(conexao) -> List[dict]:
+    """Compara o consolidado com a soma dos gastos; retorna uma divergência por chave (vazia se estiver em dia)."""
+    tabela = models.ResumoMensal.__table__
+    calculado = {tuple(linha[:4]): (linha[4] or 0.0, linha[5]) for linha in conexao.execute(_consulta_calculada())}
+    chave = (tabela.c.mes, tabela.c.categoria_id, tabela.c.cartao_id, tabela.c.responsavel)
+    armazenado = {tuple(linha[:4]): (linha[4], linha[5]) for linha in conexao.execute(
+        select(*chave, func.sum(tabela.c.total), func.sum(tabela.c.quantidade)).group_by(*chave)
+    )}
+    divergencias = []
+    for chave in sorted(calculado.keys() | armazenado.keys(), key=repr):
+        esperado = calculado.get(chave, (0.0, 0))
+        encontrado = armazenado.get(chave, (0.0, 0))
+        if esperado[1] != encontrado[1] or abs(esperado[0] - encontrado[0]) >= TOLERANCIA:
+            mes, categoria_id, cartao_id, responsavel = chave
+            divergencias.append({
+                "mes": mes, "categoria_id": categoria_id, "cartao_id": cartao_id, "responsavel": responsavel,
+                "total_armazenado": encontrado[0], "total_calculado": round(esperado[0], 2),
+                "quantidade_armazenada": encontrado[1], "quantidade_calculada": esperado[1],
+            })
+    return divergencias
+
@@ -102,17 +102,247 @@ class MetaBase(BaseModel):
 class MetaCreate(MetaBase):
     pass
 
-class Meta(MetaBase):
+class SubtotalMeta(BaseModel):
+    responsavel: str
+    total: float
+    quantidade: int
+
+    class Config:
+        from_attributes = True
+
+# Meta sem a lista de contribuições (GET /metas/?incluir_contribuicoes=false)
+class MetaResumo(MetaBase):
     id: int
-    valor_atual: float # O Pydantic vai pegar o valor da propriedade que criamos
+    valor_atual: float # Total armazenado, atualizado a cada contribuição
     data_criacao: datetime
-    contribuicoes: List[Contribuicao] = []
+    subtotais: List[SubtotalMeta] = []
 
     class Config:
         from_attributes = True
 
+class Meta(MetaResumo):
+    contribuicoes: List[Contribuicao] = []
+
+class PaginaContribuicoes(BaseModel):
+    itens: List[Contribuicao]
+    proximo_cursor: Optional[str] = None
+
 # NOVO SCHEMA PARA A RESPOSTA DA FATURA
 class Fatura(BaseModel):
     gastos: List[Gasto]
     periodo_inicio: date
-    periodo_fim: date
\ No newline at end of file
+    periodo_fim: date
+
+# Uma fatura de GET /faturas/batch; 'gastos' só vem com detalhar=true
+class FaturaDoLote(BaseModel):
+    cartao_id: int
+    mes: str
+    periodo_inicio: date
+    periodo_fim: date
+    total: float
+    quantidade: int
+    gastos: Optional[List[Gasto]] = None
+
+class FaturasLote(BaseModel):
+    faturas: List[FaturaDoLote]
+
+# --- SCHEMAS DE RESUMO (totais calculados no banco) ---
+class TotalAgrupado(BaseModel):
+    id: Optional[int] = None
+    nome: str
+    total: float
+    quantidade: int
+
+class Resumo(BaseModel):
+    total: float
+    total_debito: float
+    total_cartoes: float
+    quantidade: int
+    por_categoria: List[TotalAgrupado]
+    por_responsavel: List[TotalAgrupado]
+    por_cartao: List[TotalAgrupado]
+
+class ResumoFatura(BaseModel):
+    cartao_id: int
+    total: float
+    quantidade: int
+    periodo_inicio: date
+    periodo_fim: date
+
+class SerieMensal(BaseModel):
+    id: Optional[int] = None
+    nome: str
+    valores: List[float]
+
+# Série temporal compacta: cada lista é alinhada com 'meses'
+class RelatorioMensal(BaseModel):
+    meses: List[str]
+    total: List[float]
+    quantidade: List[int]
+    series: List[SerieMensal] = []
+
+# Página de gastos com paginação por cursor
+class PaginaGastos(BaseModel):
+    itens: List[Gasto]
+    proximo_cursor: Optional[str] = None
+
+# --- SCHEMAS DE GASTOS RECORRENTES ---
+class GastoRecorrenteCreate(BaseModel):
+    nome: str
+    anotacao: Optional[str] = None
+    valor: float
+    responsavel: Optional[str] = "Eu"
+    categoria_id: int
+    cartao_id: Optional[int] = None
+    dia: int # 1 a 31; nos meses mais curtos vale o último dia
+    data_inicio: date
+    data_fim: Optional[date] = None
+
+class GastoRecorrenteUpdate(BaseModel):
+    nome: Optional[str] = None
+    anotacao: Optional[str] = None
+    valor: Optional[float] = None
+    responsavel: Optional[str] = None
+    categoria_id: Optional[int] = None
+    cartao_id: Optional[int] = None
+    dia: Optional[int] = None
+    data_inicio: Optional[date] = None
+    data_fim: Optional[date] = None
+
+class GastoRecorrente(BaseModel):
+    id: int
+    nome: str
+    anotacao: Optional[str] = None
+    valor: float
+    responsavel: Optional[str] = None
+    categoria: Categoria
+    cartao: Optional[CartaoCredito] = None
+    dia: int
+    data_inicio: datetime
+    data_fim: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+# --- SCHEMAS DE ESCRITA EM LOTE ---
+class FiltroGastos(BaseModel):
+    # Todos os critérios informados precisam casar; datas da compra com 'fim' inclusive
+    ids: Optional[List[int]] = None
+    categoria_id: Optional[int] = None
+    cartao_id: Optional[int] = None
+    responsavel: Optional[str] = None
+    inicio: Optional[date] = None
+    fim: Optional[date] = None
+
+class GastosLoteCreate(BaseModel):
+    gastos: List[GastoCreate]
+
+class GastosLoteUpdate(BaseModel):
+    filtro: FiltroGastos
+    valores: GastoUpdate
+
+class GastosLoteDelete(BaseModel):
+    filtro: FiltroGastos
+
+class ResultadoLote(BaseModel):
+    afetados: int
+    dry_run: bool
+    ids: Optional[List[int]] = None # Ids criados pelo POST /gastos/lote
+
+# --- SCHEMAS DE IMPORTAÇÃO ---
+class ErroImportacao(BaseModel):
+    linha: int
+    erro: str
+
+class ResultadoImportacao(BaseModel):
+    inseridos: int
+    erros: List[ErroImportacao]
+    lotes: int
+    duracao_segundos: float
+    linhas_por_segundo: float
+
+# --- SCHEMAS DE SINCRONIZAÇÃO (GET /sync) ---
+# Linhas como estão no banco: referências pelo id, sem os objetos aninhados das outras rotas
+class GastoSync(BaseModel):
+    id: int
+    nome: Optional[str] = None
+    anotacao: Optional[str] = None
+    valor: float
+    responsavel: Optional[str] = None
+    data: datetime
+    categoria_id: Optional[int] = None
+    cartao_id: Optional[int] = None
+    is_parcelado: Optional[bool] = None
+    numero_parcelas: Optional[int] = None
+    valor_parcela: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+class ContribuicaoSync(Contribuicao):
+    meta_id: Optional[int] = None
+
+class GastoRecorrenteSync(BaseModel):
+    id: int
+    nome: str
+    anotacao: Optional[str] = None
+    valor: float
+    responsavel: Optional[str] = None
+    categoria_id: int
+    cartao_id: Optional[int] = None
+    dia: int
+    data_inicio: datetime
+    data_fim: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class AlteracoesSync(BaseModel):
+    gastos: List[GastoSync] = []
+    categorias: List[Categoria] = []
+    cartoes: List[CartaoCredito] = []
+    metas: List[MetaResumo] = []
+    contribuicoes: List[ContribuicaoSync] = []
+    recorrentes: List[GastoRecorrenteSync] = []
+
+class RemocoesSync(BaseModel):
+    gastos: List[int] = []
+    categorias: List[int] = []
+    cartoes: List[int] = []
+    metas: List[int] = []
+    contribuicoes: List[int] = []
+    recorrentes: List[int] = []
+
+class Sincronizacao(BaseModel):
+    versao: int # Próximo 'since'
+    tem_mais: bool
+    alteracoes: AlteracoesSync
+    remocoes: RemocoesSync
+
+# --- SCHEMAS DE PROJEÇÃO (GET /projecoes) ---
+# Séries alinhadas com 'meses'; o total de cada mês soma parcelas, compras à vista e recorrentes
+class FaturaProjetada(BaseModel):
+    cartao_id: int
+    nome: str
+    parcelas: List[float]
+    a_vista: List[float]
+    recorrentes: List[float]
+    total: List[float]
+
+class MetaProjetada(BaseModel):
+    meta_id: int
+    nome: str
+    valor_objetivo: float
+    valor_atual: float
+    media_mensal: float # Média das contribuições no histórico considerado
+    data_objetivo: date
+    data_prevista: Optional[date] = None # None quando a média não cobre o que falta
+    atingida: bool
+    no_prazo: bool
+    necessario_por_mes: Optional[float] = None # Para chegar no valor até a data objetivo
+
+class Projecoes(BaseModel):
+    meses: List[str]
+    total: List[float] # Soma das faturas de todos os cartões
+    faturas: List[FaturaProjetada]
+    metas: List[MetaProjetada]
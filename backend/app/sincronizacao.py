@@ -0,0 +1,221 @@
+"""
+Sincronização incremental (GET /sync e GET /sync/eventos).
+
+Toda linha de gastos, categorias, cartões, metas, contribuições e gastos recorrentes tem a coluna 'versao':
+o valor do contador global 'versao_alteracoes' na última escrita da linha. Como o índice de busca, quem
+mantém isso são gatilhos no banco, então as importações, os lotes e o processo escritor ficam cobertos
+sem mudar nenhuma rota. Exclusões deixam uma linha em 'remocoes' com a versão em que aconteceram.
+
+O cliente guarda a maior versão que já recebeu e pede /sync?since=<versao>: vêm as linhas com versão maior
+(o estado atual, não o histórico) e os ids removidos depois dela. since=0 traz tudo. As remoções devem ser
+aplicadas antes das alterações: um id removido e depois reaproveitado pelo SQLite aparece só nas alterações.
+
+Em vez de consultar /sync de tempos em tempos, o cliente pode manter aberto GET /sync/eventos (Server-Sent
+Events): um evento 'versao' a cada mudança do contador, com as tabelas que mudaram.
+"""
+import asyncio
+import os
+import weakref
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+from . import models
+
+# Nome na resposta -> modelo. 'cartoes' e 'recorrentes' seguem os nomes das rotas, não os das tabelas
+TABELAS = {
+    "gastos": models.Gasto,
+    "categorias": models.Categoria,
+    "cartoes": models.CartaoCredito,
+    "metas": models.Meta,
+    "contribuicoes": models.Contribuicao,
+    "recorrentes": models.GastoRecorrente,
+}
+_NOME_DA_TABELA = {modelo.__tablename__: nome for nome, modelo in TABELAS.items()}
+
+# Intervalo entre as consultas ao contador enquanto há conexões em GET /sync/eventos
+INTERVALO = float(os.getenv("SYNC_INTERVALO_MS", "1000")) / 1000
+# Comentário enviado quando nada muda, para proxies não derrubarem a conexão parada
+INTERVALO_PING = 15.0
+# Cada conexão de eventos é encerrada depois disso; o EventSource reconecta sozinho (com Last-Event-ID)
+# e o desligamento do servidor não fica esperando conexões que nunca terminam
+DURACAO_MAXIMA = float(os.getenv("SYNC_DURACAO_MAXIMA_S", "120"))
+
+# Engines em que os gatilhos já foram encontrados (ou não)
+_disponivel = weakref.WeakKeyDictionary()
+
+
+# --- ESQUEMA (usado pela migração) ---
+_INCREMENTAR = "UPDATE versao_alteracoes SET valor = valor + 1 WHERE id = 1;"
+
+
+def _gatilhos(tabela: str) -> dict:
+    versao = "(SELECT valor FROM versao_alteracoes WHERE id = 1)"
+    marcar = f"UPDATE {tabela} SET versao = {versao} WHERE id = new.id;"
+    return {
+        f"{tabela}_versao_ai": f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_versao_ai AFTER INSERT ON {tabela} BEGIN
+                {_INCREMENTAR}
+                {marcar}
+            END""",
+        # O UPDATE do próprio gatilho muda a versão; a condição impede que ele conte como outra escrita
+        f"{tabela}_versao_au": f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_versao_au AFTER UPDATE ON {tabela} WHEN new.versao IS old.versao BEGIN
+                {_INCREMENTAR}
+                {marcar}
+            END""",
+        f"{tabela}_versao_ad": f"""
+            CREATE TRIGGER IF NOT EXISTS {tabela}_versao_ad AFTER DELETE ON {tabela} BEGIN
+                {_INCREMENTAR}
+                INSERT INTO remocoes (versao, tabela, linha_id) VALUES ({versao}, '{tabela}', old.id);
+            END""",
+    }
+
+
+GATILHOS = {nome: comando for modelo in TABELAS.values() for nome, comando in _gatilhos(modelo.__tablename__).items()}
+
+# Pular ou materializar uma ocorrência só grava em 'ocorrencias_recorrentes': o modelo é "tocado" (UPDATE
+# sem mudança, que o gatilho acima transforma em versão nova) para a mudança aparecer como alteração dele
+GATILHOS_OCORRENCIAS = {
+    f"ocorrencias_recorrentes_versao_{sufixo}": f"""
+        CREATE TRIGGER IF NOT EXISTS ocorrencias_recorrentes_versao_{sufixo} AFTER {evento} ON ocorrencias_recorrentes BEGIN
+            UPDATE gastos_recorrentes SET versao = versao WHERE id = {linha}.recorrente_id;
+        END"""
+    for sufixo, evento, linha in (("ai", "INSERT", "new"), ("ad", "DELETE", "old"))
+}
+GATILHOS.update(GATILHOS_OCORRENCIAS)
+
+
+def criar_gatilhos(conexao) -> bool:
+    """
+    Cria a linha do contador e os gatilhos, e numera as linhas que já existem (versões distintas, na ordem
+    dos ids). False fora do SQLite: lá as versões ficam em 0 e GET /sync responde 501.
+    """
+    if conexao.dialect.name != "sqlite":
+        return False
+    conexao.exec_driver_sql("INSERT OR IGNORE INTO versao_alteracoes (id, valor) VALUES (1, 0)")
+    for modelo in TABELAS.values():
+        tabela = modelo.__tablename__
+        # Uma faixa de versões por tabela: base + id nunca repete entre tabelas
+        conexao.exec_driver_sql(f"UPDATE {tabela} SET versao = (SELECT valor FROM versao_alteracoes WHERE id = 1) + id")
+        conexao.exec_driver_sql(f"UPDATE versao_alteracoes SET valor = valor + (SELECT COALESCE(MAX(id), 0) FROM {tabela}) "
+                                f"WHERE id = 1")
+    for comando in GATILHOS.values():
+        conexao.exec_driver_sql(comando)
+    return True
+
+
+def criar_gatilhos_ocorrencias(conexao) -> bool:
+    if conexao.dialect.name != "sqlite":
+        return False
+    for comando in GATILHOS_OCORRENCIAS.values():
+        conexao.exec_driver_sql(comando)
+    return True
+
+
+def disponivel(db: Session) -> bool:
+    engine = db.get_bind()
+    if engine not in _disponivel:
+        _disponivel[engine] = engine.dialect.name == "sqlite" and db.execute(
+            select(models.VersaoAlteracoes.id).where(models.VersaoAlteracoes.id == 1)
+        ).first() is not None
+    return _disponivel[engine]
+
+
+# --- CONSULTA ---
+def versao_atual(db: Session) -> int:
+    return db.execute(select(models.VersaoAlteracoes.valor).where(models.VersaoAlteracoes.id == 1)).scalar() or 0
+
+
+def tabelas_alteradas(db: Session, desde: int, nomes: Iterable[str] = TABELAS) -> List[str]:
+    """Nomes (como em TABELAS, só os de 'nomes') das tabelas com alguma linha alterada ou removida depois da versão 'desde'."""
+    removidas = {_NOME_DA_TABELA.get(tabela) for tabela, in db.execute(
+        select(models.Remocao.tabela).where(models.Remocao.versao > desde).distinct()
+    )}
+    return [nome for nome in nomes
+            if nome in removidas or db.execute(select(TABELAS[nome].id).where(TABELAS[nome].versao > desde).limit(1)).first()]
+
+
+def alteracoes(db: Session, desde: int, limite: int) -> dict:
+    """
+    Linhas alteradas e ids removidos depois da versão 'desde', no máximo 'limite' itens no total (os de
+    versão menor primeiro). Com 'tem_mais', a 'versao' devolvida é a do último item incluído: basta pedir
+    de novo a partir dela.
+    """
+    # O contador é lido antes das linhas: tudo o que foi gravado até ele já está visível nas consultas seguintes
+    versao = versao_atual(db)
+    itens = []
+    for nome, modelo in TABELAS.items():
+        consulta = db.query(modelo).filter(modelo.versao > desde).order_by(modelo.versao).limit(limite + 1)
+        if modelo is models.Meta:
+            consulta = consulta.options(selectinload(models.Meta.subtotais))
+        itens.extend((linha.versao, nome, linha, False) for linha in consulta)
+    for remocao in db.query(models.Remocao).filter(models.Remocao.versao > desde).order_by(models.Remocao.versao).limit(limite + 1):
+        if remocao.tabela in _NOME_DA_TABELA:
+            itens.append((remocao.versao, _NOME_DA_TABELA[remocao.tabela], remocao.linha_id, True))
+    itens.sort(key=lambda item: item[0])
+    tem_mais = len(itens) > limite
+    if tem_mais:
+        itens = itens[:limite]
+        versao = itens[-1][0]
+    resultado = {"versao": max(versao, desde), "tem_mais": tem_mais,
+                 "alteracoes": {nome: [] for nome in TABELAS}, "remocoes": {nome: [] for nome in TABELAS}}
+    for _, nome, item, removido in itens:
+        resultado["remocoes" if removido else "alteracoes"][nome].append(item)
+    for nome in TABELAS:
+        alteradas = {linha.id for linha in resultado["alteracoes"][nome]}
+        resultado["remocoes"][nome] = [linha_id for linha_id in resultado["remocoes"][nome] if linha_id not in alteradas]
+    return resultado
+
+
+# --- EVENTOS ---
+class Notificador:
+    """
+    Acompanha o contador e avisa as conexões de GET /sync/eventos. Uma única tarefa por processo consulta
+    o banco a cada INTERVALO, e só enquanto há alguém ouvindo. Como a fonte é o banco, os avisos valem
+    também para escritas feitas por outros processos (workers, processo escritor, scripts).
+
+    'consultar(desde)' devolve (versão atual, tabelas alteradas depois de 'desde'; todas com desde=None).
+    """
+
+    def __init__(self, consultar: Callable[[Optional[int]], Awaitable[Tuple[int, List[str]]]], intervalo: float = INTERVALO):
+        self._consultar = consultar
+        self._intervalo = intervalo
+        # Fila de cada conexão -> última versão que ela recebeu
+        self._assinantes = {}
+        self._tarefa = None
+
+    def assinar(self, versao: int) -> asyncio.Queue:
+        """Fila de avisos de uma conexão que já conhece 'versao'."""
+        # Um item só: um cliente lento recebe um aviso, com as tabelas acumuladas e a última versão
+        fila = asyncio.Queue(maxsize=1)
+        self._assinantes[fila] = versao
+        if self._tarefa is None or self._tarefa.done():
+            self._tarefa = asyncio.get_running_loop().create_task(self._acompanhar())
+        return fila
+
+    def cancelar(self, fila: asyncio.Queue):
+        self._assinantes.pop(fila, None)
+
+    @staticmethod
+    def _entregar(fila: asyncio.Queue, evento: dict):
+        if fila.full():
+            anterior = fila.get_nowait()
+            evento = {"versao": evento["versao"],
+                      "tabelas": [nome for nome in TABELAS if nome in anterior["tabelas"] or nome in evento["tabelas"]]}
+        fila.put_nowait(evento)
+
+    async def _acompanhar(self):
+        while self._assinantes:
+            try:
+                # Normalmente todas as conexões estão na mesma versão; senão as tabelas valem para a mais atrasada
+                versao, tabelas = await self._consultar(min(self._assinantes.values()))
+            except Exception as erro:
+                print(f"Falha ao consultar a versão de sincronização: {erro}")
+            else:
+                for fila, conhecida in list(self._assinantes.items()):
+                    if versao != conhecida:
+                        self._entregar(fila, {"versao": versao, "tabelas": tabelas})
+                        self._assinantes[fila] = versao
+            await asyncio.sleep(self._intervalo)
@@ -0,0 +1,37 @@
+import os
+import sys
+from sqlalchemy.orm import sessionmaker
+
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import database, migracoes, parcelas, resumo_mensal
+
+# --- CONFIGURAÇÃO ---
+# Uso: python backend/backfill_parcelas.py [caminho/para/app.db]
+# Sem argumento, usa DATABASE_URL ou o app.db ao lado deste script.
+if len(sys.argv) > 1:
+    DATABASE_URL = f"sqlite:///{os.path.abspath(sys.argv[1])}"
+else:
+    DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(os.path.dirname(__file__), 'app.db')}")
+
+engine = database.criar_engine(DATABASE_URL)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Garante que a tabela 'parcelas' exista em bancos antigos
+migracoes.preparar_banco(engine)
+
+db = SessionLocal()
+
+try:
+    print(f"Gerando o cronograma de parcelas em {DATABASE_URL}...")
+    total = parcelas.backfill_parcelas(db)
+    print(f"{total} parcelas geradas com sucesso.")
+    # O consolidado mensal conta as parcelas: refaz com o cronograma novo
+    resumo_mensal.reconstruir(db.connection())
+    db.commit()
+except Exception as e:
+    print(f"\nOcorreu um erro: {e}")
+    db.rollback()
+finally:
+    db.close()
@@ -0,0 +1,68 @@
+import argparse
+import json
+import os
+import sys
+
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import backup
+
+parser = argparse.ArgumentParser(description="Backups comprimidos do banco SQLite (pode rodar com a aplicação aberta).")
+parser.add_argument("--banco", help="Caminho do app.db (padrão: DATABASE_URL ou backend/app.db)")
+parser.add_argument("--pasta", help="Pasta dos backups (padrão: BACKUP_PASTA ou 'backups' ao lado do banco)")
+comandos = parser.add_subparsers(dest="comando", required=True)
+
+criar = comandos.add_parser("criar", help="Grava um backup agora")
+criar.add_argument("--compressao", choices=sorted(backup.COMPRESSOES), default=backup.COMPRESSAO)
+criar.add_argument("--paginas", type=int, default=backup.PAGINAS, help="Páginas copiadas por passo")
+criar.add_argument("--pausa-ms", type=float, default=backup.PAUSA_MS, help="Pausa entre os passos")
+criar.add_argument("--manter", type=int, help="Depois do backup, apaga os mais antigos além destes")
+
+comandos.add_parser("listar", help="Lista os backups da pasta")
+
+verificar = comandos.add_parser("verificar", help="Confere o SHA-256 de um backup (padrão: todos)")
+verificar.add_argument("arquivos", nargs="*")
+
+restaurar = comandos.add_parser("restaurar", help="Substitui o banco por um backup")
+restaurar.add_argument("arquivo", help="Backup (.db.gz, .db.xz ou .db) com o manifesto ao lado")
+restaurar.add_argument("--sem-copia", action="store_true", help="Não salva o banco atual antes de restaurar")
+args = parser.parse_args()
+
+if args.banco:
+    caminho_banco = os.path.abspath(args.banco)
+else:
+    caminho_banco = backup.caminho_do_banco(
+        os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(os.path.dirname(__file__), 'app.db')}"))
+    if caminho_banco is None:
+        parser.error("Backups só funcionam com banco SQLite em arquivo")
+pasta = args.pasta or backup.pasta_padrao(caminho_banco)
+
+if args.comando == "criar":
+    manifesto = backup.fazer_backup(caminho_banco, pasta, args.compressao, args.paginas, args.pausa_ms)
+    print(json.dumps(manifesto, indent=2, ensure_ascii=False))
+    if args.manter is not None:
+        for caminho in backup.aplicar_retencao(pasta, args.manter):
+            print(f"Apagado: {caminho}")
+
+elif args.comando == "listar":
+    for manifesto in backup.listar(pasta):
+        print(f"{manifesto['arquivo']}  {manifesto['criado_em']}  {manifesto['tamanho'] / 1e6:8.2f} MB  "
+              f"esquema v{manifesto['versao_esquema']}  sync {manifesto['versao_alteracoes']}")
+
+elif args.comando == "verificar":
+    arquivos = args.arquivos or [manifesto["caminho"] for manifesto in backup.listar(pasta)]
+    falhas = 0
+    for arquivo in arquivos:
+        try:
+            backup.verificar(arquivo)
+            print(f"OK     {arquivo}")
+        except (OSError, ValueError) as erro:
+            falhas += 1
+            print(f"FALHOU {arquivo}: {erro}")
+    sys.exit(1 if falhas else 0)
+
+elif args.comando == "restaurar":
+    manifesto = backup.restaurar(args.arquivo, caminho_banco, None if args.sem_copia else pasta)
+    print(f"Banco {caminho_banco} restaurado de {manifesto['arquivo']} ({manifesto['criado_em']}).")
+    print("Reinicie a aplicação se ela estiver aberta.")
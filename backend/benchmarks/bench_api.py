@@ -0,0 +1,138 @@
+"""
+Mede a API em processo (ASGI, sem rede) sobre um banco sintético grande.
+
+Uso: python backend/benchmarks/bench_api.py [--banco existente.db | --gastos 100000 ...]
+     [--requisicoes 50] [--escritas 200] [--saida resultado.json]
+
+Para cada cenário reporta p50/p95/p99, requisições por segundo e o pico de memória (RSS)
+do processo até o fim do cenário. Requer o pacote 'httpx' (usado pelo TestClient).
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date
+
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+# Módulos desta mesma pasta
+import gerar_dados
+from medicao import estatisticas
+
+
+def pico_rss_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def executar(cliente, nome: str, requisicoes, resultados: dict):
+    tempos = []
+    inicio = time.perf_counter()
+    for metodo, caminho, kwargs, status_esperado in requisicoes:
+        antes = time.perf_counter()
+        resposta = cliente.request(metodo, caminho, **kwargs)
+        tempos.append((time.perf_counter() - antes) * 1000)
+        if resposta.status_code != status_esperado:
+            raise RuntimeError(f"{nome}: {metodo} {caminho} retornou {resposta.status_code}: {resposta.text[:200]}")
+    duracao = time.perf_counter() - inicio
+    resultados[nome] = {**estatisticas(tempos, duracao), "pico_rss_mb": pico_rss_mb()}
+    print(f"{nome}: {resultados[nome]}", file=sys.stderr)
+
+
+def meses_recentes(quantidade: int):
+    hoje = date.today()
+    return [((hoje.year * 12 + hoje.month - 1 - i) // 12, (hoje.year * 12 + hoje.month - 1 - i) % 12 + 1)
+            for i in range(quantidade)]
+
+
+def rodar(caminho_banco: str, n: int, escritas: int, seed: int = 7) -> dict:
+    os.environ["DATABASE_URL"] = f"sqlite:///{caminho_banco}"
+    from fastapi.testclient import TestClient
+    from backend.app.main import app
+
+    rnd = random.Random(seed)
+    meses = meses_recentes(24)
+    resultados = {}
+    with TestClient(app) as cliente:
+        cartoes = [c["id"] for c in cliente.get("/cartoes/", params={"include_inactive": True}).json()]
+        categorias = [c["id"] for c in cliente.get("/categorias/").json()]
+
+        def mes():
+            ano, m = rnd.choice(meses)
+            return {"ano": ano, "mes": m}
+
+        executar(cliente, "read_gastos", [("GET", "/gastos/", {"params": mes()}, 200) for _ in range(n)], resultados)
+        executar(cliente, "read_fatura", [("GET", f"/faturas/{rnd.choice(cartoes)}", {"params": mes()}, 200)
+                                          for _ in range(n)], resultados)
+
+        def doze_meses():
+            ano, m = rnd.choice(meses)
+            return {"inicio": f"{ano - 1}-{m:02d}", "fim": f"{ano}-{m:02d}"}
+
+        executar(cliente, "read_faturas_lote", [("GET", "/faturas/batch", {"params": doze_meses()}, 200)
+                                                for _ in range(n)], resultados)
+        executar(cliente, "read_gastos_parcelados", [("GET", "/gastos/parcelados", {"params": mes()}, 200)
+                                                     for _ in range(n)], resultados)
+        executar(cliente, "read_metas", [("GET", "/metas/", {}, 200) for _ in range(n)], resultados)
+        executar(cliente, "read_metas_resumo", [("GET", "/metas/", {"params": {"incluir_contribuicoes": False}}, 200)
+                                                for _ in range(n)], resultados)
+        executar(cliente, "read_resumo", [("GET", "/resumo", {"params": mes()}, 200) for _ in range(n)], resultados)
+        termos = ["merc", "farmácia presente", "viag", "uber", "luh casa", "conserto carro"]
+        executar(cliente, "read_busca", [("GET", "/gastos/busca", {"params": {"q": rnd.choice(termos)}}, 200)
+                                         for _ in range(n)], resultados)
+
+        hoje = date.today().isoformat()
+        novos = [{
+            "nome": f"Bench {i}", "valor": 90.0, "categoria_id": rnd.choice(categorias), "data": hoje,
+            "cartao_id": rnd.choice(cartoes), "is_parcelado": i % 3 == 0,
+            "numero_parcelas": 3 if i % 3 == 0 else 1, "valor_parcela": 30.0 if i % 3 == 0 else None,
+        } for i in range(escritas)]
+        tempos_inicio = time.perf_counter()
+        executar(cliente, "create_gasto", [("POST", "/gastos/", {"json": gasto}, 201) for gasto in novos], resultados)
+        # Os ids criados são os maiores da tabela
+        pagina = cliente.get("/gastos/paginado", params={"limit": escritas, "inicio": hoje, "fim": hoje}).json()
+        ids = [g["id"] for g in pagina["itens"] if g["nome"].startswith("Bench ")]
+        executar(cliente, "update_gasto", [("PUT", f"/gastos/{gasto_id}", {"json": {"valor": 120.0, "numero_parcelas": 4}}, 200)
+                                           for gasto_id in ids], resultados)
+        executar(cliente, "delete_gasto", [("DELETE", f"/gastos/{gasto_id}", {}, 204) for gasto_id in ids], resultados)
+        resultados["escrita_total_segundos"] = round(time.perf_counter() - tempos_inicio, 2)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", help="Usa uma cópia deste banco em vez de gerar um")
+    gerar_dados.adicionar_argumentos(parser)
+    parser.add_argument("--requisicoes", type=int, default=50, help="Requisições por cenário de leitura")
+    parser.add_argument("--escritas", type=int, default=200, help="Gastos criados, alterados e removidos")
+    parser.add_argument("--saida", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "bench.db")
+        if args.banco:
+            shutil.copy(args.banco, caminho)
+            banco = {"origem": args.banco}
+        else:
+            print(f"Gerando banco com {args.gastos} gastos...", file=sys.stderr)
+            banco = gerar_dados.gerar_a_partir_de(args, caminho)
+        resultado = {"banco": banco, "cenarios": rodar(caminho, args.requisicoes, args.escritas)}
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
@@ -0,0 +1,174 @@
+"""
+Mede quanto tempo leva um backup online (app/backup.py) e quanto ele atrapalha as requisições: a mesma carga
+de leituras e escritas roda sem backup e com backups seguidos numa thread do mesmo processo, como faz o
+agendador da aplicação, para cada combinação de --paginas e --pausa-ms. Antes da carga, cada formato de
+backup.COMPRESSOES passa por criar -> restaurar, e o banco restaurado tem de bater com o SHA-256 do manifesto.
+
+Uso: python backend/benchmarks/bench_backup.py [--banco existente.db | --gastos 100000 ...]
+     [--paginas 64 256 -1] [--pausa-ms 0 10] [--compressao gzip] [--duracao 20] [--concorrencia 8]
+     [--escritas 0.1] [--saida resultado.json]
+
+A carga é a lista de gastos de um mês e, numa fração --escritas das requisições, POST /gastos/, em processo
+(ASGI, sem rede). --paginas -1 copia tudo num passo só. Para cada cenário saem as latências, a duração média
+dos backups (cópia e total, com a compressão) e quantas vezes a cópia recomeçou por causa de uma escrita.
+Requer 'httpx'.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+# Módulos desta mesma pasta
+import gerar_dados
+from medicao import estatisticas
+
+
+def meses_recentes(quantidade: int):
+    hoje = date.today()
+    return [((hoje.year * 12 + hoje.month - 1 - i) // 12, (hoje.year * 12 + hoje.month - 1 - i) % 12 + 1)
+            for i in range(quantidade)]
+
+
+def backups_seguidos(origem: str, pasta: str, compressao: str, paginas: int, pausa_ms: float, parar, manifestos):
+    from backend.app import backup
+
+    while not parar.is_set():
+        manifestos.append(backup.fazer_backup(origem, pasta, compressao, paginas, pausa_ms))
+        backup.aplicar_retencao(pasta, 1)
+
+
+def conferir_formatos(origem: str, pasta: str) -> dict:
+    """Cria e restaura um backup em cada formato; levanta erro se algum não volta igual ao original."""
+    from backend.app import backup
+
+    resultado = {}
+    for compressao in backup.COMPRESSOES:
+        pasta_formato = os.path.join(pasta, compressao)
+        antes = time.perf_counter()
+        manifesto = backup.fazer_backup(origem, pasta_formato, compressao)
+        criacao = time.perf_counter() - antes
+        destino = os.path.join(pasta_formato, "restaurado.db")
+        antes = time.perf_counter()
+        backup.restaurar(manifesto["caminho"], destino)
+        restauracao = time.perf_counter() - antes
+        if backup._sha256(destino) != manifesto["sha256_banco"]:
+            raise RuntimeError(f"O backup '{compressao}' não voltou igual ao banco copiado")
+        resultado[compressao] = {"tamanho_mb": round(manifesto["tamanho"] / 1e6, 2), "criacao_s": round(criacao, 3),
+                                 "restauracao_s": round(restauracao, 3)}
+        shutil.rmtree(pasta_formato)
+        print(f"formato {compressao}: {resultado[compressao]}", file=sys.stderr)
+    return resultado
+
+
+async def carga(cliente, duracao: float, concorrencia: int, escritas: float, rnd: random.Random,
+                categorias, meses) -> dict:
+    tempos = {"leitura": [], "escrita": []}
+    fim = time.perf_counter() + duracao
+
+    async def trabalhador():
+        while time.perf_counter() < fim:
+            antes = time.perf_counter()
+            if rnd.random() < escritas:
+                tipo = "escrita"
+                resposta = await cliente.post("/gastos/", json={
+                    "nome": "Bench backup", "valor": round(rnd.uniform(5, 500), 2), "responsavel": "Eu",
+                    "data": (date.today() - timedelta(days=rnd.randrange(365))).isoformat(),
+                    "categoria_id": rnd.choice(categorias)})
+            else:
+                tipo = "leitura"
+                ano, mes = rnd.choice(meses)
+                resposta = await cliente.get("/gastos/", params={"ano": ano, "mes": mes})
+            if resposta.status_code not in (200, 201):
+                raise RuntimeError(f"{tipo} retornou {resposta.status_code}: {resposta.text[:200]}")
+            tempos[tipo].append((time.perf_counter() - antes) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    total = time.perf_counter() - inicio
+    return {tipo: estatisticas(valores, total) for tipo, valores in tempos.items()}
+
+
+async def rodar(caminho: str, pasta_backups: str, args) -> dict:
+    import httpx
+    from backend.app.main import app
+
+    rnd = random.Random(args.seed)
+    meses = meses_recentes(24)
+    cenarios = {"sem_backup": None}
+    cenarios.update({f"paginas={paginas},pausa_ms={pausa:g}": (paginas, pausa)
+                     for paginas in args.paginas for pausa in args.pausa_ms})
+    resultados = {}
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+            categorias = [c["id"] for c in (await cliente.get("/categorias/")).json()]
+            # Aquecimento (caches da aplicação e do SQLite) fora da medição, para o primeiro cenário não sair em desvantagem
+            await carga(cliente, args.duracao / 2, args.concorrencia, args.escritas, rnd, categorias, meses)
+            for nome, parametros in cenarios.items():
+                manifestos, parar, thread = [], threading.Event(), None
+                if parametros is not None:
+                    thread = threading.Thread(target=backups_seguidos, args=(
+                        caminho, pasta_backups, args.compressao, *parametros, parar, manifestos))
+                    thread.start()
+                resultado = await carga(cliente, args.duracao, args.concorrencia, args.escritas, rnd, categorias, meses)
+                parar.set()
+                if thread is not None:
+                    thread.join()
+                    resultado["backups"] = {
+                        "quantidade": len(manifestos),
+                        "copia_media_s": round(statistics.fmean(m["duracao_copia_segundos"] for m in manifestos), 3),
+                        "total_medio_s": round(statistics.fmean(m["duracao_segundos"] for m in manifestos), 3),
+                        "passos_medio": round(statistics.fmean(m["passos"] for m in manifestos), 1),
+                        "reinicios": sum(m["reinicios"] for m in manifestos),
+                        "tamanho_mb": round(manifestos[-1]["tamanho"] / 1e6, 2),
+                    }
+                resultados[nome] = resultado
+                print(f"{nome}: {resultado}", file=sys.stderr)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", help="Usa uma cópia deste banco em vez de gerar um")
+    gerar_dados.adicionar_argumentos(parser)
+    parser.add_argument("--paginas", type=int, nargs="+", default=[64, 256, -1], help="Páginas por passo da cópia")
+    parser.add_argument("--pausa-ms", type=float, nargs="+", default=[0, 10], help="Pausa entre os passos")
+    parser.add_argument("--compressao", default="gzip", help="gzip, xz ou nenhuma")
+    parser.add_argument("--duracao", type=float, default=20, help="Segundos de carga por cenário")
+    parser.add_argument("--concorrencia", type=int, default=8, help="Requisições em voo")
+    parser.add_argument("--escritas", type=float, default=0.1, help="Fração das requisições que são POST /gastos/")
+    parser.add_argument("--saida", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "bench.db")
+        if args.banco:
+            shutil.copy(args.banco, caminho)
+            banco = {"origem": args.banco}
+        else:
+            print(f"Gerando banco com {args.gastos} gastos...", file=sys.stderr)
+            banco = gerar_dados.gerar_a_partir_de(args, caminho)
+        os.environ["DATABASE_URL"] = f"sqlite:///{caminho}"
+        # O agendador da aplicação ficaria disputando com os backups do benchmark
+        os.environ["BACKUP_INTERVALO_MIN"] = "0"
+        formatos = conferir_formatos(caminho, os.path.join(pasta, "formatos"))
+        cenarios = asyncio.run(rodar(caminho, os.path.join(pasta, "backups"), args))
+        resultado = {"banco": banco, "formatos": formatos, "compressao": args.compressao, "duracao_por_cenario_s": args.duracao,
+                     "concorrencia": args.concorrencia, "fracao_escritas": args.escritas, "cenarios": cenarios}
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
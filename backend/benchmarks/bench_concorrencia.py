@@ -0,0 +1,118 @@
+"""
+Compara a vazão sob requisições concorrentes entre o modo síncrono (Session no threadpool) e o
+modo assíncrono (DB_ASYNC=1, aiosqlite) da API, em processo (ASGI, sem rede).
+
+Uso: python backend/benchmarks/bench_concorrencia.py [--banco existente.db | --gastos 100000 ...]
+     [--concorrencia 1 16 64] [--requisicoes 400] [--threads 40] [--saida resultado.json]
+
+Cada cenário dispara 'requisicoes' chamadas com no máximo 'concorrencia' em voo ao mesmo tempo.
+--threads limita o threadpool do anyio (padrão 40) para simular o gargalo do modo síncrono.
+Requer 'httpx', 'greenlet' e 'aiosqlite'.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date
+
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+# Módulos desta mesma pasta
+import gerar_dados
+from medicao import estatisticas
+
+MODOS = {"sync": "", "async": "1"}
+
+
+def meses_recentes(quantidade: int):
+    hoje = date.today()
+    return [((hoje.year * 12 + hoje.month - 1 - i) // 12, (hoje.year * 12 + hoje.month - 1 - i) % 12 + 1)
+            for i in range(quantidade)]
+
+
+async def disparar(cliente, caminhos, concorrencia: int) -> dict:
+    fila = iter(caminhos)
+    tempos = []
+
+    async def trabalhador():
+        for caminho, params in fila:
+            antes = time.perf_counter()
+            resposta = await cliente.get(caminho, params=params)
+            tempos.append((time.perf_counter() - antes) * 1000)
+            if resposta.status_code != 200:
+                raise RuntimeError(f"GET {caminho} retornou {resposta.status_code}: {resposta.text[:200]}")
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    return estatisticas(tempos, time.perf_counter() - inicio)
+
+
+async def rodar_modo(modo: str, niveis, n: int, threads: int, seed: int) -> dict:
+    import anyio.to_thread
+    import httpx
+    from backend.app.main import app
+
+    os.environ["DB_ASYNC"] = MODOS[modo]
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+    rnd = random.Random(seed)
+    meses = meses_recentes(24)
+    resultados = {}
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+            cartoes = [c["id"] for c in (await cliente.get("/cartoes/", params={"include_inactive": True})).json()]
+
+            def mes():
+                ano, m = rnd.choice(meses)
+                return {"ano": ano, "mes": m}
+
+            # Carga parecida com a do Dashboard: lista do mês, faturas e resumo misturados
+            cenarios = {
+                "read_gastos": lambda: ("/gastos/", mes()),
+                "read_fatura": lambda: (f"/faturas/{rnd.choice(cartoes)}", mes()),
+                "dashboard": lambda: rnd.choice([("/gastos/", mes()), (f"/faturas/{rnd.choice(cartoes)}", mes()),
+                                                 ("/resumo", mes()), ("/gastos/parcelados", mes())]),
+            }
+            for nome, gerar in cenarios.items():
+                for concorrencia in niveis:
+                    caminhos = [gerar() for _ in range(n)]
+                    resultado = await disparar(cliente, caminhos, concorrencia)
+                    resultados[f"{nome}@{concorrencia}"] = resultado
+                    print(f"{modo} {nome} concorrência={concorrencia}: {resultado}", file=sys.stderr)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", help="Usa uma cópia deste banco em vez de gerar um")
+    gerar_dados.adicionar_argumentos(parser)
+    parser.add_argument("--concorrencia", type=int, nargs="+", default=[1, 16, 64], help="Requisições simultâneas")
+    parser.add_argument("--requisicoes", type=int, default=400, help="Requisições por cenário e nível")
+    parser.add_argument("--threads", type=int, default=40, help="Tamanho do threadpool do anyio")
+    parser.add_argument("--saida", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "bench.db")
+        if args.banco:
+            shutil.copy(args.banco, caminho)
+            banco = {"origem": args.banco}
+        else:
+            print(f"Gerando banco com {args.gastos} gastos...", file=sys.stderr)
+            banco = gerar_dados.gerar_a_partir_de(args, caminho)
+        os.environ["DATABASE_URL"] = f"sqlite:///{caminho}"
+        modos = {modo: asyncio.run(rodar_modo(modo, args.concorrencia, args.requisicoes, args.threads, args.seed))
+                 for modo in MODOS}
+        resultado = {"banco": banco, "threads": args.threads, "modos": modos}
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
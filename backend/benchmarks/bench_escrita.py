@@ -0,0 +1,159 @@
+"""
+Compara a vazão de escritas concorrentes (POST /gastos/) entre o caminho atual, em que cada processo grava
+direto no SQLite, e o processo escritor com group commit (app/escritor.py, usado por servidor_producao.py).
+
+Uso: python backend/benchmarks/bench_escrita.py [--banco existente.db | --gastos 100000 ...]
+     [--processos 1 4] [--concorrencia 16] [--requisicoes 300] [--synchronous NORMAL FULL] [--saida resultado.json]
+
+Cada processo cliente sobe a aplicação em processo (ASGI, sem rede) e dispara 'requisicoes' escritas com no
+máximo 'concorrencia' em voo. No modo "direto" os processos disputam o lock do banco, como aconteceria com
+vários workers uvicorn; no modo "fila" todos repassam as escritas a um único processo escritor. Erros
+(ex.: "database is locked") são contados à parte. Cada cenário começa de uma cópia do mesmo banco.
+Requer 'httpx'.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import secrets
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+# Módulos desta mesma pasta
+import gerar_dados
+from medicao import estatisticas
+
+MODOS = ("direto", "fila")
+
+
+def gasto_aleatorio(rnd: random.Random, categorias, cartoes) -> dict:
+    data = date.today() - timedelta(days=rnd.randrange(365))
+    cartao_id = rnd.choice(cartoes) if cartoes and rnd.random() < 0.7 else None
+    parcelado = cartao_id is not None and rnd.random() < 0.3
+    return {"nome": "Bench escrita", "valor": round(rnd.uniform(5, 500), 2), "data": data.isoformat(),
+            "categoria_id": rnd.choice(categorias), "cartao_id": cartao_id, "responsavel": "Eu",
+            "is_parcelado": parcelado, "numero_parcelas": rnd.choice((2, 3, 6, 12)) if parcelado else 1}
+
+
+async def disparar(requisicoes: int, concorrencia: int, seed: int, barreira) -> dict:
+    import httpx
+    from backend.app.main import app
+
+    rnd = random.Random(seed)
+    async with app.router.lifespan_context(app):
+        transporte = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as cliente:
+            categorias = [c["id"] for c in (await cliente.get("/categorias/")).json()]
+            cartoes = [c["id"] for c in (await cliente.get("/cartoes/")).json()]
+            corpos = iter([gasto_aleatorio(rnd, categorias, cartoes) for _ in range(requisicoes)])
+            tempos, erros = [], {}
+
+            async def trabalhador():
+                for corpo in corpos:
+                    antes = time.perf_counter()
+                    resposta = await cliente.post("/gastos/", json=corpo)
+                    if resposta.status_code == 201:
+                        tempos.append((time.perf_counter() - antes) * 1000)
+                    else:
+                        erros[resposta.status_code] = erros.get(resposta.status_code, 0) + 1
+
+            # Todos os processos começam juntos, depois de subir a aplicação
+            await asyncio.get_running_loop().run_in_executor(None, barreira.wait)
+            inicio = time.perf_counter()
+            await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+            duracao = time.perf_counter() - inicio
+    return {"tempos": tempos, "erros": erros, "duracao": duracao}
+
+
+def processo_cliente(requisicoes: int, concorrencia: int, seed: int, barreira, resultados):
+    resultados.put(asyncio.run(disparar(requisicoes, concorrencia, seed, barreira)))
+
+
+def rodar_cenario(modo: str, caminho: str, processos: int, concorrencia: int, requisicoes: int, seed: int) -> dict:
+    from backend.app import escritor
+
+    contexto = multiprocessing.get_context("spawn")
+    os.environ["DATABASE_URL"] = f"sqlite:///{caminho}"
+    os.environ.pop("ESCRITOR_ENDERECO", None)
+    processo_escritor = None
+    if modo == "fila":
+        os.environ["ESCRITOR_ENDERECO"] = os.path.join(os.path.dirname(caminho), "escritor.sock")
+        os.environ["ESCRITOR_CHAVE"] = secrets.token_hex(16)
+        processo_escritor = contexto.Process(target=escritor.servir, daemon=True)
+        processo_escritor.start()
+        if not escritor.aguardar(escritor.endereco(), escritor.chave(), timeout=120):
+            raise RuntimeError("O processo escritor não ficou pronto")
+    try:
+        barreira = contexto.Barrier(processos)
+        resultados = contexto.Queue()
+        clientes = [contexto.Process(target=processo_cliente, args=(requisicoes, concorrencia, seed + i, barreira, resultados))
+                    for i in range(processos)]
+        for cliente in clientes:
+            cliente.start()
+        parciais = [resultados.get() for _ in clientes]
+        for cliente in clientes:
+            cliente.join()
+    finally:
+        if processo_escritor is not None:
+            processo_escritor.terminate()
+            processo_escritor.join()
+        os.environ.pop("ESCRITOR_ENDERECO", None)
+
+    tempos = [tempo for parcial in parciais for tempo in parcial["tempos"]]
+    erros = {}
+    for parcial in parciais:
+        for status, quantidade in parcial["erros"].items():
+            erros[str(status)] = erros.get(str(status), 0) + quantidade
+    resultado = estatisticas(tempos, max(parcial["duracao"] for parcial in parciais))
+    resultado["erros"] = erros
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", help="Usa uma cópia deste banco em vez de gerar um")
+    gerar_dados.adicionar_argumentos(parser)
+    parser.add_argument("--processos", type=int, nargs="+", default=[1, 4], help="Processos gravando ao mesmo tempo")
+    parser.add_argument("--concorrencia", type=int, default=16, help="Escritas em voo por processo")
+    parser.add_argument("--requisicoes", type=int, default=300, help="Escritas por processo")
+    parser.add_argument("--synchronous", nargs="+", default=["NORMAL", "FULL"],
+                        help="Valores de PRAGMA synchronous (FULL faz fsync a cada commit)")
+    parser.add_argument("--saida", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        base = os.path.join(pasta, "base.db")
+        if args.banco:
+            shutil.copy(args.banco, base)
+            banco = {"origem": args.banco}
+        else:
+            print(f"Gerando banco com {args.gastos} gastos...", file=sys.stderr)
+            banco = gerar_dados.gerar_a_partir_de(args, base)
+
+        cenarios = {}
+        for synchronous in args.synchronous:
+            os.environ["SQLITE_SYNCHRONOUS"] = synchronous
+            for processos in args.processos:
+                for modo in MODOS:
+                    caminho = os.path.join(pasta, f"{modo}-{synchronous}-{processos}.db")
+                    shutil.copy(base, caminho)
+                    resultado = rodar_cenario(modo, caminho, processos, args.concorrencia, args.requisicoes, args.seed)
+                    cenarios[f"{modo}@synchronous={synchronous},processos={processos}"] = resultado
+                    print(f"{modo} synchronous={synchronous} processos={processos}: {resultado}", file=sys.stderr)
+                    os.remove(caminho)
+        resultado = {"banco": banco, "concorrencia_por_processo": args.concorrencia,
+                     "requisicoes_por_processo": args.requisicoes, "cenarios": cenarios}
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
@@ -0,0 +1,114 @@
+"""
+Compara o formato completo com o compacto (formato=compacto) nas listas grandes: tempo de resposta
+sem cache, bytes no corpo e o tamanho/tempo de compressão com gzip e brotli.
+
+Uso: python backend/benchmarks/bench_formato.py [--banco existente.db | --gastos 200000 ...] [--meses 12]
+     [--saida resultado.json]
+
+Cenários (um por mês dos últimos N meses):
+  gastos   GET /gastos/ do mês
+  faturas  GET /faturas/{id} de cada cartão
+  lote     GET /faturas/batch?detalhar=true com os N meses de todos os cartões (uma chamada)
+O cache de respostas é desligado (CACHE_MAX_ENTRADAS=0) para medir o cálculo. Requer 'httpx';
+brotli só é medido se o pacote opcional estiver instalado.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from datetime import date
+
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+# Módulos desta mesma pasta
+import gerar_dados
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FORMATOS = ("completo", "compacto")
+
+
+def meses_recentes(quantidade: int):
+    hoje = date.today()
+    return [((hoje.year * 12 + hoje.month - 1 - i) // 12, (hoje.year * 12 + hoje.month - 1 - i) % 12 + 1)
+            for i in range(quantidade)][::-1]
+
+
+def comprimir(corpos) -> dict:
+    resultado = {}
+    compressores = {"gzip": lambda corpo: zlib.compress(corpo, 6)}
+    if brotli is not None:
+        compressores["brotli"] = lambda corpo: brotli.compress(corpo, quality=5)
+    for nome, compressor in compressores.items():
+        inicio = time.perf_counter()
+        tamanho = sum(len(compressor(corpo)) for corpo in corpos)
+        resultado[nome] = {"bytes": tamanho, "ms": round((time.perf_counter() - inicio) * 1000, 1)}
+    return resultado
+
+
+def medir(cliente, requisicoes) -> dict:
+    corpos = []
+    inicio = time.perf_counter()
+    for caminho, params in requisicoes:
+        resposta = cliente.get(caminho, params=params)
+        if resposta.status_code != 200:
+            raise RuntimeError(f"GET {caminho} retornou {resposta.status_code}: {resposta.text[:200]}")
+        corpos.append(resposta.content)
+    return {"ms": round((time.perf_counter() - inicio) * 1000, 1), "bytes": sum(len(corpo) for corpo in corpos),
+            **comprimir(corpos)}
+
+
+def rodar(caminho_banco: str, quantidade_meses: int) -> dict:
+    os.environ["DATABASE_URL"] = f"sqlite:///{caminho_banco}"
+    os.environ["CACHE_MAX_ENTRADAS"] = "0"
+    from fastapi.testclient import TestClient
+    from backend.app.main import app
+
+    meses = meses_recentes(quantidade_meses)
+    resultados = {}
+    with TestClient(app) as cliente:
+        cartoes = [c["id"] for c in cliente.get("/cartoes/", params={"include_inactive": True}).json()]
+        cenarios = {
+            "gastos": lambda formato: [("/gastos/", {"ano": ano, "mes": mes, "formato": formato}) for ano, mes in meses],
+            "faturas": lambda formato: [(f"/faturas/{cartao_id}", {"ano": ano, "mes": mes, "formato": formato})
+                                        for ano, mes in meses for cartao_id in cartoes],
+            "lote": lambda formato: [("/faturas/batch", {"inicio": "%d-%02d" % meses[0], "fim": "%d-%02d" % meses[-1],
+                                                          "detalhar": True, "formato": formato})],
+        }
+        for nome, requisicoes in cenarios.items():
+            resultados[nome] = {formato: medir(cliente, requisicoes(formato)) for formato in FORMATOS}
+            print(f"{nome}: {resultados[nome]}", file=sys.stderr)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", help="Usa uma cópia deste banco em vez de gerar um")
+    gerar_dados.adicionar_argumentos(parser)
+    parser.add_argument("--meses", type=int, default=12, help="Meses consultados até o mês atual")
+    parser.add_argument("--saida", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "bench.db")
+        if args.banco:
+            shutil.copy(args.banco, caminho)
+            banco = {"origem": args.banco}
+        else:
+            print(f"Gerando banco com {args.gastos} gastos...", file=sys.stderr)
+            banco = gerar_dados.gerar_a_partir_de(args, caminho)
+        resultado = {"banco": banco, "cenarios": rodar(caminho, args.meses)}
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
@@ -0,0 +1,125 @@
+"""
+Mede a inicialização do aplicativo desktop sem a janela: cada rodada é um processo Python novo que
+sobe o servidor pelo mesmo caminho do run_desktop_app.py e marca os tempos desde o início do processo.
+
+Uso: python backend/benchmarks/bench_inicializacao.py [--banco existente.db | --gastos 20000 ...]
+     [--rodadas 5] [--saida resultado.json]
+
+Marcos (ms desde o início do processo filho, medianas das rodadas):
+  lancador          import do run_desktop_app (não deve carregar uvicorn nem o backend)
+  importacao        import do uvicorn e do backend (FastAPI, SQLAlchemy, modelos)
+  banco_aberto      fim do lifespan: engine criada, esquema conferido/migrado, porta aberta
+  primeira_resposta primeira resposta 200 de GET /gastos/ do mês atual
+Modos: 'rapido' é o caminho atual (create_all pulado quando o marcador de versão está em dia);
+'create_all' força o create_all a cada inicialização, como antes. Requer 'uvicorn'.
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(RAIZ)
+
+# Módulos desta mesma pasta
+import gerar_dados
+
+MODOS = ("rapido", "create_all")
+
+# Roda no processo filho; imprime os marcos em JSON na última linha
+CODIGO_FILHO = r"""
+import time
+inicio = time.perf_counter()
+import http.client, json, os, sys, threading
+from datetime import date
+
+def marco():
+    return round((time.perf_counter() - inicio) * 1000, 1)
+
+sys.path.insert(0, os.environ["RAIZ"])
+import run_desktop_app
+marcos = {"lancador": marco()}
+
+pronto = threading.Event()
+servidor = run_desktop_app.criar_servidor("127.0.0.1", int(os.environ["PORTA"]), pronto)
+marcos["importacao"] = marco()
+if os.environ["MODO"] == "create_all":
+    from backend.app import migracoes
+    migracoes.esquema_atualizado = lambda engine: False
+servidor.config.log_level = "warning"
+thread = threading.Thread(target=servidor.run, daemon=True)
+thread.start()
+if not pronto.wait(120):
+    sys.exit("O servidor não sinalizou que está pronto")
+marcos["banco_aberto"] = marco()
+
+hoje = date.today()
+conexao = http.client.HTTPConnection("127.0.0.1", int(os.environ["PORTA"]))
+conexao.request("GET", f"/gastos/?ano={hoje.year}&mes={hoje.month}")
+resposta = conexao.getresponse()
+resposta.read()
+if resposta.status != 200:
+    sys.exit(f"GET /gastos/ retornou {resposta.status}")
+marcos["primeira_resposta"] = marco()
+
+servidor.should_exit = True
+thread.join()
+print(json.dumps(marcos))
+"""
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rodar_processo(caminho_banco: str, modo: str) -> dict:
+    ambiente = {**os.environ, "RAIZ": RAIZ, "PORTA": str(porta_livre()), "MODO": modo,
+                "DATABASE_URL": f"sqlite:///{caminho_banco}"}
+    processo = subprocess.run([sys.executable, "-c", CODIGO_FILHO], env=ambiente, capture_output=True, text=True)
+    if processo.returncode != 0:
+        raise RuntimeError(f"Inicialização falhou ({modo}):\n{processo.stderr[-2000:]}")
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def rodar(caminho_banco: str, rodadas: int) -> dict:
+    resultados = {}
+    # Primeira inicialização descartada: aplica migrações pendentes e aquece o cache de disco
+    rodar_processo(caminho_banco, "rapido")
+    for modo in MODOS:
+        medidas = [rodar_processo(caminho_banco, modo) for _ in range(rodadas)]
+        resultados[modo] = {marco: round(statistics.median(m[marco] for m in medidas), 1) for marco in medidas[0]}
+        print(f"{modo}: {resultados[modo]}", file=sys.stderr)
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", help="Usa uma cópia deste banco em vez de gerar um")
+    gerar_dados.adicionar_argumentos(parser)
+    parser.add_argument("--rodadas", type=int, default=5, help="Inicializações medidas por modo")
+    parser.add_argument("--saida", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "bench.db")
+        if args.banco:
+            shutil.copy(args.banco, caminho)
+            banco = {"origem": args.banco}
+        else:
+            print(f"Gerando banco com {args.gastos} gastos...", file=sys.stderr)
+            banco = gerar_dados.gerar_a_partir_de(args, caminho)
+        resultado = {"banco": banco, "rodadas": args.rodadas, "modos": rodar(caminho, args.rodadas)}
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
@@ -0,0 +1,134 @@
+"""
+Compara o motor vetorizado (numpy) com o laço atual de _get_gastos_por_periodo e confere que os
+dois devolvem as mesmas linhas e os mesmos totais.
+
+Uso: python backend/benchmarks/bench_motor.py [--banco existente.db | --gastos 200000 ...] [--meses 24]
+     [--saida resultado.json]
+
+Cenários:
+  visao_mes      lista do mês civil (gastos + parcelas virtuais) para cada um dos últimos N meses
+  totais_fatura  total da fatura de todos os cartões em todos os N meses
+  totais_mensais total por mês civil de vencimento nos N meses
+A carga do instantâneo do motor vetorizado é medida à parte. Requer 'numpy'.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+# Módulos desta mesma pasta
+import gerar_dados
+
+
+def cronometrar(funcao):
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return resultado, round((time.perf_counter() - inicio) * 1000, 1)
+
+
+def proximos(a, b) -> bool:
+    # Somas em ordens diferentes podem divergir no último centavo depois do arredondamento
+    return len(a) == len(b) and all(abs(x - y) <= 0.011 for x, y in zip(a, b))
+
+
+def chave(gastos):
+    # O laço devolve modelos do ORM (sem parcela_atual) para as compras à vista
+    return [(g.id, round(g.valor, 2), getattr(g, "parcela_atual", None)) for g in gastos]
+
+
+def rodar(caminho_banco: str, quantidade_meses: int) -> dict:
+    # O motor só importa numpy quando MOTOR_CALCULO=vetorial
+    os.environ["MOTOR_CALCULO"] = "vetorial"
+    from sqlalchemy.orm import sessionmaker
+    from backend.app import database, main, models, motor_vetorial
+
+    if motor_vetorial.np is None:
+        sys.exit("Este benchmark requer o pacote 'numpy'.")
+    engine = database.criar_engine(f"sqlite:///{caminho_banco}")
+    db = sessionmaker(bind=engine)()
+    hoje = date.today()
+    primeiro = datetime(hoje.year, hoje.month, 1) - relativedelta(months=quantidade_meses - 1)
+    meses = [primeiro + relativedelta(months=i) for i in range(quantidade_meses)]
+    cartoes = [(c.id, c.dia_fechamento) for c in db.query(models.CartaoCredito).order_by(models.CartaoCredito.id)]
+    resultados = {}
+
+    def laco(funcao):
+        motor_vetorial.HABILITADO = False
+        return cronometrar(funcao)
+
+    def vetorial(funcao):
+        motor_vetorial.HABILITADO = True
+        return cronometrar(funcao)
+
+    lancamentos, ms = cronometrar(lambda: motor_vetorial.carregar(db))
+    motor_vetorial._instantaneo = lancamentos
+    resultados["carga_instantaneo"] = {"ms": ms, "linhas": len(lancamentos)}
+
+    # Visão do mês: mesmas linhas, mesma ordem
+    visao = lambda: [main._get_gastos_por_periodo(db, m, m + relativedelta(months=1)) for m in meses]
+    esperado, ms_laco = laco(visao)
+    obtido, ms_vetorial = vetorial(visao)
+    assert [chave(g) for g in esperado] == [chave(g) for g in obtido], "visao_mes divergente"
+    resultados["visao_mes"] = {"laco_ms": ms_laco, "vetorial_ms": ms_vetorial,
+                               "linhas": sum(len(g) for g in obtido)}
+
+    # Totais de fatura de todos os cartões em todos os meses
+    def faturas_no_laco():
+        totais = []
+        for cartao_id, dia in cartoes:
+            for m in meses:
+                inicio, fim_real = main._calcular_periodo_fatura(m.year, m.month, dia)
+                gastos = main._get_gastos_por_periodo(db, inicio, fim_real + timedelta(days=1), cartao_id)
+                totais.append(round(sum(g.valor for g in gastos), 2))
+        return totais
+
+    esperado, ms_laco = laco(faturas_no_laco)
+    rotulos = [m.strftime("%Y-%m") for m in meses]
+    (totais, _), ms_vetorial = vetorial(lambda: motor_vetorial.totais_faturas(lancamentos, cartoes, rotulos))
+    assert proximos(esperado, totais.ravel().tolist()), "totais_fatura divergentes"
+    resultados["totais_fatura"] = {"laco_ms": ms_laco, "vetorial_ms": ms_vetorial, "faturas": len(esperado)}
+
+    # Totais por mês civil
+    esperado, ms_laco = laco(lambda: [round(sum(g.valor for g in main._get_gastos_por_periodo(
+        db, m, m + relativedelta(months=1))), 2) for m in meses])
+    totais, ms_vetorial = vetorial(lambda: motor_vetorial.totais_mensais(lancamentos, rotulos[0], quantidade_meses))
+    assert proximos(esperado, totais.tolist()), "totais_mensais divergentes"
+    resultados["totais_mensais"] = {"laco_ms": ms_laco, "vetorial_ms": ms_vetorial}
+
+    db.close()
+    engine.dispose()
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", help="Usa uma cópia deste banco em vez de gerar um")
+    gerar_dados.adicionar_argumentos(parser)
+    parser.add_argument("--meses", type=int, default=24, help="Meses consultados até o mês atual")
+    parser.add_argument("--saida", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "bench.db")
+        if args.banco:
+            shutil.copy(args.banco, caminho)
+            banco = {"origem": args.banco}
+        else:
+            print(f"Gerando banco com {args.gastos} gastos...", file=sys.stderr)
+            banco = gerar_dados.gerar_a_partir_de(args, caminho)
+        resultado = {"banco": banco, "cenarios": rodar(caminho, args.meses)}
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
@@ -0,0 +1,116 @@
+"""
+Compara o SQLite no perfil original (journal DELETE, synchronous FULL, só índices simples)
+com o perfil "desempenho" (WAL + pragmas) e os índices compostos da migração 1.
+
+Uso: python backend/benchmarks/bench_sqlite.py [--gastos 200000 ...] [--saida resultado.json]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+from dateutil.relativedelta import relativedelta
+from sqlalchemy.orm import sessionmaker
+
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.app import agregacoes, database, main, migracoes, models, parcelas, schemas
+
+# Módulos desta mesma pasta
+import gerar_dados
+from medicao import estatisticas
+
+INDICES_COMPOSTOS = ("ix_gastos_is_parcelado_data", "ix_gastos_cartao_id_data", "ix_gastos_categoria_id")
+
+
+def cronometrar(funcao, repeticoes: int) -> dict:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return estatisticas(tempos)
+
+
+def medir(caminho: str, perfil: str, repeticoes: int, escritas: int) -> dict:
+    engine = database.criar_engine(f"sqlite:///{caminho}", perfil=perfil)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    hoje = date.today()
+    meses = [datetime(hoje.year, hoje.month, 1) - relativedelta(months=i) for i in range(24)]
+    rnd = random.Random(7)
+    resultado = {}
+    with SessionLocal() as db:
+        def mes_aleatorio():
+            inicio = rnd.choice(meses)
+            return inicio, inicio + relativedelta(months=1)
+
+        resultado["mes (_get_gastos_por_periodo)"] = cronometrar(
+            lambda: main._get_gastos_por_periodo(db, *mes_aleatorio()), repeticoes)
+        resultado["fatura (_get_gastos_por_periodo com cartão)"] = cronometrar(
+            lambda: main._get_gastos_por_periodo(db, *mes_aleatorio(), cartao_id=rnd.randint(1, 3)), repeticoes)
+        resultado["resumo (totais_agrupados)"] = cronometrar(
+            lambda: agregacoes.totais_agrupados(db, [(None, *mes_aleatorio()), (1, *mes_aleatorio())]), repeticoes)
+        resultado["gastos por categoria (count)"] = cronometrar(
+            lambda: db.query(models.Gasto).filter(models.Gasto.categoria_id == rnd.randint(1, 10)).count(), repeticoes)
+
+        def escrever():
+            gasto = schemas.GastoCreate(nome="bench", valor=120.0, categoria_id=1, data=hoje, cartao_id=1,
+                                        is_parcelado=True, numero_parcelas=3, valor_parcela=40.0)
+            novo = models.Gasto(**gasto.model_dump())
+            parcelas.sincronizar_parcelas(novo)
+            db.add(novo)
+            db.commit()
+
+        inicio = time.perf_counter()
+        for _ in range(escritas):
+            escrever()
+        duracao = time.perf_counter() - inicio
+        resultado["escrita (create_gasto, 1 commit por gasto)"] = {"gastos_por_segundo": round(escritas / duracao, 1)}
+    engine.dispose()
+    return resultado
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    gerar_dados.adicionar_argumentos(parser)
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--escritas", type=int, default=300)
+    parser.add_argument("--saida", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        base = os.path.join(pasta, "base.db")
+        print(f"Gerando banco com {args.gastos} gastos...", file=sys.stderr)
+        gerar_dados.gerar_a_partir_de(args, base)
+
+        antes = os.path.join(pasta, "antes.db")
+        shutil.copy(base, antes)
+        con = sqlite3.connect(antes)
+        for indice in INDICES_COMPOSTOS:
+            con.execute(f"DROP INDEX IF EXISTS {indice}")
+        con.close()
+
+        depois = os.path.join(pasta, "depois.db")
+        shutil.copy(base, depois)
+        engine = database.criar_engine(f"sqlite:///{depois}", perfil="desempenho")
+        migracoes.aplicar_migracoes(engine)
+        engine.dispose()
+
+        resultado = {
+            "gastos": args.gastos,
+            "antes (perfil padrao, sem índices compostos)": medir(antes, "padrao", args.repeticoes, args.escritas),
+            "depois (perfil desempenho, migração 1)": medir(depois, "desempenho", args.repeticoes, args.escritas),
+        }
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    print(texto)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
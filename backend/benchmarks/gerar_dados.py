@@ -0,0 +1,158 @@
+"""
+Gera um banco sintético grande para testes de desempenho.
+
+Uso: python backend/benchmarks/gerar_dados.py saida.db [--gastos 100000] [--parcelados 0.2]
+     [--cartoes 3] [--anos 5] [--categorias 12] [--metas 5] [--seed 42]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from backend.app import database, migracoes, parcelas, resumo_mensal
+from backend.app.metas import recalcular_totais
+
+# Linhas por executemany/commit
+TAMANHO_LOTE = 50_000
+
+NOMES_CATEGORIAS = ["Moradia", "Alimentação", "Transporte", "Lazer", "Saúde", "Compras", "Educação",
+                    "Assinaturas", "Viagens", "Pessoal", "Pets", "Presentes"]
+NOMES_GASTOS = ["Supermercado", "Farmácia", "Gasolina", "Restaurante", "Padaria", "Uber", "Cinema",
+                "Roupas", "Eletrônicos", "Livros", "Academia", "Streaming", "Passagem", "Hotel"]
+RESPONSAVEIS = ["Eu", "Gustavo", "Luh"]
+# Palavras das anotações (parte dos gastos), para a busca textual ter o que encontrar
+PALAVRAS_ANOTACOES = ["presente", "aniversário", "mercado", "promoção", "viagem", "férias", "conserto", "carro",
+                      "reembolsar", "dividido", "trabalho", "escola", "casa", "cachorro", "farmácia", "consulta",
+                      "assinatura", "anual", "online", "loja", "centro", "shopping", "feira", "orgânicos"]
+PARCELAMENTOS = (2, 3, 4, 6, 10, 12)
+
+
+def _formatar(data: datetime) -> str:
+    # Mesmo formato que o SQLAlchemy grava nas colunas DateTime do SQLite
+    return data.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def gerar_banco(caminho: str, gastos: int = 100_000, proporcao_parcelados: float = 0.2, cartoes: int = 3,
+                anos: int = 5, categorias: int = 12, metas: int = 5, seed: int = 42) -> dict:
+    """
+    Cria (ou sobrescreve) o banco em 'caminho' com o esquema atual e dados aleatórios reprodutíveis.
+    As parcelas são geradas com parcelas.calcular_parcelas, as mesmas regras do servidor.
+    Retorna um resumo com as quantidades e o tempo gasto.
+    """
+    inicio_geracao = time.perf_counter()
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    engine = database.criar_engine(f"sqlite:///{caminho}", perfil="padrao")
+    migracoes.preparar_banco(engine)
+    engine.dispose()
+
+    rnd = random.Random(seed)
+    # Gerador separado: as anotações não mudam os demais dados gerados com a mesma semente
+    rnd_anotacoes = random.Random(seed + 1)
+    hoje = date.today()
+    inicio = datetime(hoje.year - anos, hoje.month, 1)
+    segundos = int((datetime(hoje.year, hoje.month, 1) - inicio).total_seconds())
+
+    con = sqlite3.connect(caminho)
+    con.execute("PRAGMA synchronous=OFF")
+    con.execute("PRAGMA journal_mode=MEMORY")
+    nomes_categorias = [NOMES_CATEGORIAS[i] if i < len(NOMES_CATEGORIAS) else f"Categoria {i + 1}" for i in range(categorias)]
+    con.executemany("INSERT INTO categorias (id, nome, is_active) VALUES (?, ?, 1)",
+                    [(i + 1, nome) for i, nome in enumerate(nomes_categorias)])
+    con.executemany("INSERT INTO cartoes_credito (id, nome, dia_fechamento, is_active) VALUES (?, ?, ?, ?)",
+                    [(i + 1, f"Cartão {i + 1}", rnd.randint(1, 28), i < max(cartoes - 1, 1)) for i in range(cartoes)])
+
+    total_parcelas = 0
+    gerados = 0
+    while gerados < gastos:
+        lote_gastos, lote_parcelas = [], []
+        for gasto_id in range(gerados + 1, min(gerados + TAMANHO_LOTE, gastos) + 1):
+            data = inicio + timedelta(seconds=rnd.randrange(segundos))
+            data = data.replace(hour=0, minute=0, second=0, microsecond=0)
+            valor = round(rnd.lognormvariate(4, 1.1), 2)
+            cartao_id = rnd.randint(1, cartoes) if cartoes and rnd.random() < 0.7 else None
+            parcelado = cartao_id is not None and rnd.random() < proporcao_parcelados / 0.7
+            numero = rnd.choice(PARCELAMENTOS) if parcelado else 1
+            valor_parcela = round(valor / numero, 2) if parcelado else None
+            anotacao = (" ".join(rnd_anotacoes.sample(PALAVRAS_ANOTACOES, rnd_anotacoes.randint(1, 4)))
+                        if rnd_anotacoes.random() < 0.3 else None)
+            lote_gastos.append((gasto_id, rnd.choice(NOMES_GASTOS), anotacao, valor, rnd.choice(RESPONSAVEIS), _formatar(data),
+                                parcelado, numero, valor_parcela, rnd.randint(1, categorias), cartao_id))
+            if parcelado:
+                compra = SimpleNamespace(is_parcelado=True, numero_parcelas=numero, data=data, valor=valor,
+                                         valor_parcela=valor_parcela, cartao_id=cartao_id)
+                for dados in parcelas.calcular_parcelas(compra):
+                    lote_parcelas.append((gasto_id, dados["numero"], _formatar(dados["data_vencimento"]),
+                                          dados["valor"], dados["cartao_id"]))
+        con.executemany("INSERT INTO gastos (id, nome, anotacao, valor, responsavel, data, is_parcelado, numero_parcelas, "
+                        "valor_parcela, categoria_id, cartao_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", lote_gastos)
+        con.executemany("INSERT INTO parcelas (gasto_id, numero, data_vencimento, valor, cartao_id) VALUES (?, ?, ?, ?, ?)",
+                        lote_parcelas)
+        con.commit()
+        gerados += len(lote_gastos)
+        total_parcelas += len(lote_parcelas)
+
+    # Metas com uma contribuição por mês desde a criação
+    contribuicoes = []
+    for meta_id in range(1, metas + 1):
+        criacao = inicio + timedelta(days=rnd.randrange(365 * anos // 2 + 1))
+        con.execute("INSERT INTO metas (id, nome, valor_objetivo, data_objetivo, data_criacao) VALUES (?, ?, ?, ?, ?)",
+                    (meta_id, f"Meta {meta_id}", rnd.choice((5000, 15000, 50000)),
+                     _formatar(datetime(hoje.year + rnd.randint(1, 5), rnd.randint(1, 12), 1)), _formatar(criacao)))
+        data = criacao
+        while data.date() < hoje:
+            contribuicoes.append((round(rnd.uniform(100, 1500), 2), rnd.choice(RESPONSAVEIS), _formatar(data), meta_id))
+            data += timedelta(days=30)
+    con.executemany("INSERT INTO contribuicoes (valor, responsavel, data_contribuicao, meta_id) VALUES (?, ?, ?, ?)",
+                    contribuicoes)
+    con.commit()
+    con.close()
+
+    # Gastos e contribuições entram por fora da API: reconstrói o consolidado mensal e os totais das metas
+    engine = database.criar_engine(f"sqlite:///{caminho}", perfil="padrao")
+    with engine.begin() as conexao:
+        resumo_mensal.reconstruir(conexao)
+        recalcular_totais(conexao)
+        conexao.exec_driver_sql("ANALYZE")
+    engine.dispose()
+
+    return {
+        "gastos": gastos,
+        "parcelas": total_parcelas,
+        "cartoes": cartoes,
+        "categorias": categorias,
+        "metas": metas,
+        "contribuicoes": len(contribuicoes),
+        "anos": anos,
+        "segundos_para_gerar": round(time.perf_counter() - inicio_geracao, 1),
+    }
+
+
+def adicionar_argumentos(parser: argparse.ArgumentParser):
+    parser.add_argument("--gastos", type=int, default=100_000, help="Quantidade de gastos (10 mil a 5 milhões)")
+    parser.add_argument("--parcelados", type=float, default=0.2, help="Proporção de compras parceladas (0 a 0.7)")
+    parser.add_argument("--cartoes", type=int, default=3)
+    parser.add_argument("--anos", type=int, default=5, help="Anos de histórico até o mês atual")
+    parser.add_argument("--categorias", type=int, default=12)
+    parser.add_argument("--metas", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def gerar_a_partir_de(args, caminho: str) -> dict:
+    return gerar_banco(caminho, args.gastos, args.parcelados, args.cartoes, args.anos, args.categorias, args.metas, args.seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("saida", help="Caminho do banco a ser criado (sobrescrito se existir)")
+    adicionar_argumentos(parser)
+    args = parser.parse_args()
+    resumo = gerar_a_partir_de(args, args.saida)
+    print(f"Banco gerado em {args.saida}: {resumo}")
@@ -0,0 +1,25 @@
+"""Funções comuns aos scripts de benchmark."""
+import statistics
+from typing import List
+
+
+def percentil(ordenados: List[float], p: float) -> float:
+    # Percentil pelo método do vizinho mais próximo (suficiente para relatórios de latência)
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+
+def estatisticas(tempos_ms: List[float], duracao_segundos: float = None) -> dict:
+    """Resumo de uma série de latências em milissegundos; a vazão usa a duração total se informada."""
+    ordenados = sorted(tempos_ms)
+    duracao = duracao_segundos if duracao_segundos is not None else sum(tempos_ms) / 1000
+    return {
+        "requisicoes": len(ordenados),
+        "p50_ms": round(percentil(ordenados, 50), 2),
+        "p95_ms": round(percentil(ordenados, 95), 2),
+        "p99_ms": round(percentil(ordenados, 99), 2),
+        "media_ms": round(statistics.fmean(ordenados), 2) if ordenados else 0.0,
+        "por_segundo": round(len(ordenados) / duracao, 1) if duracao else 0.0,
+    }
@@ -0,0 +1,43 @@
+import os
+import sys
+
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import database, migracoes, resumo_mensal
+
+# --- CONFIGURAÇÃO ---
+# Uso: python backend/consolidar_resumo.py [caminho/para/app.db] [--reconstruir]
+# Sem --reconstruir apenas confere o consolidado mensal contra os gastos e lista as divergências
+# (código de saída 1 se houver alguma). Sem caminho, usa DATABASE_URL ou o app.db ao lado deste script.
+argumentos = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+RECONSTRUIR = "--reconstruir" in sys.argv[1:]
+if argumentos:
+    DATABASE_URL = f"sqlite:///{os.path.abspath(argumentos[0])}"
+else:
+    DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(os.path.dirname(__file__), 'app.db')}")
+
+engine = database.criar_engine(DATABASE_URL)
+
+# Cria a tabela e faz a primeira consolidação em bancos antigos
+migracoes.preparar_banco(engine)
+
+if RECONSTRUIR:
+    print(f"Reconstruindo o consolidado mensal de {DATABASE_URL}...")
+    with engine.begin() as conexao:
+        linhas = resumo_mensal.reconstruir(conexao)
+    print(f"{linhas} linhas gravadas.")
+    sys.exit(0)
+
+print(f"Conferindo o consolidado mensal de {DATABASE_URL}...")
+with engine.connect() as conexao:
+    divergencias = resumo_mensal.verificar(conexao)
+
+for item in divergencias:
+    print(f"  {item['mes']} categoria={item['categoria_id']} cartao={item['cartao_id']} responsavel={item['responsavel']}: "
+          f"armazenado {item['total_armazenado']:.2f} ({item['quantidade_armazenada']}), "
+          f"calculado {item['total_calculado']:.2f} ({item['quantidade_calculada']})")
+if divergencias:
+    print(f"{len(divergencias)} divergências. Rode com --reconstruir para refazer o consolidado.")
+    sys.exit(1)
+print("Consolidado em dia.")
@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+from sqlalchemy.orm import sessionmaker
+
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import database, exportacao, migracoes
+
+parser = argparse.ArgumentParser(description="Exporta gastos, metas e contribuições para CSV ou Parquet.")
+parser.add_argument("entidades", nargs="*", help=f"Uma ou mais de {sorted(exportacao.EXPORTACOES)} (padrão: todas)")
+parser.add_argument("--formato", choices=sorted(exportacao.FORMATOS), default="csv")
+parser.add_argument("--saida", default=".", help="Pasta onde os arquivos serão gravados")
+parser.add_argument("--banco", help="Caminho do app.db (padrão: DATABASE_URL ou backend/app.db)")
+args = parser.parse_args()
+for entidade in args.entidades:
+    if entidade not in exportacao.EXPORTACOES:
+        parser.error(f"Entidade desconhecida: '{entidade}'")
+
+if args.banco:
+    DATABASE_URL = f"sqlite:///{os.path.abspath(args.banco)}"
+else:
+    DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(os.path.dirname(__file__), 'app.db')}")
+
+engine = database.criar_engine(DATABASE_URL)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Bancos antigos precisam das colunas que a exportação lê (ex.: metas.valor_atual)
+migracoes.preparar_banco(engine)
+os.makedirs(args.saida, exist_ok=True)
+
+for entidade in args.entidades or sorted(exportacao.EXPORTACOES):
+    caminho = os.path.join(args.saida, f"{entidade}.{args.formato}")
+    with SessionLocal() as db:
+        colunas, lotes = exportacao.ler_lotes(db, entidade)
+        if args.formato == "csv":
+            with open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+                for pedaco in exportacao.gerar_csv(colunas, lotes):
+                    arquivo.write(pedaco)
+        else:
+            try:
+                exportacao.escrever_parquet(entidade, colunas, lotes, caminho)
+            except RuntimeError as e:
+                sys.exit(str(e))
+    print(f"{entidade}: {caminho}")
@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+from sqlalchemy.orm import sessionmaker
+
+# Adiciona o diretório raiz ao path para que o script encontre a pasta 'backend'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from backend.app import database, importacao, migracoes
+
+parser = argparse.ArgumentParser(description="Importa gastos de extratos CSV ou OFX em lotes.")
+parser.add_argument("arquivo", help="Caminho do extrato")
+parser.add_argument("--formato", choices=sorted(importacao.LEITORES), help="Padrão: deduzido pela extensão")
+parser.add_argument("--banco", help="Caminho do app.db (padrão: DATABASE_URL ou backend/app.db)")
+parser.add_argument("--categoria", help="Categoria usada quando a linha não informa uma")
+parser.add_argument("--cartao", help="Cartão usado quando a linha não informa um")
+parser.add_argument("--responsavel", default="Eu", help="Responsável usado quando a linha não informa um")
+parser.add_argument("--encoding", default="utf-8-sig")
+parser.add_argument("--sinal", choices=importacao.SINAIS, default="positivo",
+                    help="'negativo' para extratos com débitos negativos (os créditos são ignorados); no OFX é sempre assim")
+parser.add_argument("--lote", type=int, default=importacao.TAMANHO_LOTE, help="Linhas por transação")
+args = parser.parse_args()
+
+if args.banco:
+    DATABASE_URL = f"sqlite:///{os.path.abspath(args.banco)}"
+else:
+    DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(os.path.dirname(__file__), 'app.db')}")
+formato = args.formato or os.path.splitext(args.arquivo)[1].lstrip(".").lower()
+if formato not in importacao.LEITORES:
+    sys.exit(f"Formato não reconhecido: '{formato}'. Use --formato csv ou --formato ofx.")
+
+engine = database.criar_engine(DATABASE_URL)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+migracoes.preparar_banco(engine)
+
+with SessionLocal() as db, open(args.arquivo, encoding=args.encoding, errors="replace", newline="") as arquivo:
+    importador = importacao.Importador(db, args.categoria, args.cartao, args.responsavel, args.lote,
+                                       importacao.SINAL_DO_FORMATO.get(formato, args.sinal))
+    resultado = importador.importar(importacao.LEITORES[formato](arquivo))
+
+for erro in resultado["erros"]:
+    print(f"Linha {erro['linha']}: {erro['erro']}")
+print(f"{resultado['inseridos']} gastos importados em {resultado['lotes']} lotes, "
+      f"{len(resultado['erros'])} linhas com erro, "
+      f"{resultado['duracao_segundos']}s ({resultado['linhas_por_segundo']} linhas/s).")
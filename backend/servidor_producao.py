@@ -0,0 +1,68 @@
+"""
+Servidor de produção: vários workers uvicorn para as leituras e um processo escritor que recebe todas as
+escritas e as grava em lotes (um commit para várias requisições), sem o "database is locked" que vários
+processos gravando no mesmo SQLite provocariam. Detalhes em app/escritor.py.
+
+Uso: python backend/servidor_producao.py [--workers 4] [--host 0.0.0.0] [--port 8000]
+     [--escritor 127.0.0.1:8765] [--max-lote 64] [--espera-ms 0]
+
+O endereço e a chave do escritor seguem para os workers por ESCRITOR_ENDERECO e ESCRITOR_CHAVE (uma chave
+aleatória é gerada se ESCRITOR_CHAVE não estiver definida). Se o escritor cair, o servidor inteiro é
+encerrado para que o supervisor (Docker, systemd) o reinicie.
+"""
+import argparse
+import multiprocessing
+import os
+import secrets
+import signal
+import sys
+import threading
+
+# O pacote 'app' é importado pelo diretório deste script: funciona tanto em backend/ quanto no /code da imagem
+from app import escritor
+
+
+def vigiar(processo, encerrando: threading.Event):
+    processo.join()
+    if encerrando.is_set():
+        return
+    print(f"Processo escritor terminou (código {processo.exitcode}); encerrando o servidor.", file=sys.stderr)
+    os.kill(os.getpid(), signal.SIGTERM)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 2)),
+                        help="Processos que atendem as requisições (padrão: WEB_CONCURRENCY ou o número de CPUs)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--escritor", default=os.getenv("ESCRITOR_ENDERECO", "127.0.0.1:8765"),
+                        help="Endereço do processo escritor ('host:porta' ou caminho de socket Unix)")
+    parser.add_argument("--max-lote", type=int, default=escritor.MAX_LOTE, help="Escritas por commit")
+    parser.add_argument("--espera-ms", type=float, default=escritor.ESPERA_MS,
+                        help="Janela para juntar escritas antes de cada commit")
+    args = parser.parse_args()
+
+    os.environ["ESCRITOR_ENDERECO"] = args.escritor
+    os.environ.setdefault("ESCRITOR_CHAVE", secrets.token_hex(16))
+    os.environ["ESCRITOR_MAX_LOTE"] = str(args.max_lote)
+    os.environ["ESCRITOR_ESPERA_MS"] = str(args.espera_ms)
+
+    # spawn: o escritor começa limpo e lê as variáveis acima ao importar a aplicação
+    processo = multiprocessing.get_context("spawn").Process(target=escritor.servir, name="escritor", daemon=True)
+    processo.start()
+    if not escritor.aguardar(escritor.endereco(), escritor.chave(), timeout=120):
+        processo.terminate()
+        sys.exit("O processo escritor não ficou pronto a tempo.")
+    encerrando = threading.Event()
+    threading.Thread(target=vigiar, args=(processo, encerrando), daemon=True).start()
+
+    try:
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+    finally:
+        encerrando.set()
+        if processo.is_alive():
+            processo.terminate()
+            processo.join(timeout=10)
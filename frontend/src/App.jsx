@@ -10,7 +10,7 @@ import Faturas from './pages/Faturas';
 import EditExpenseModal from './components/EditExpenseModal';
 import {
   getCategorias, getCartoes, updateGasto, deleteGasto, getGastos,
-  getFatura, getMetas
+  getFaturasLote, getMetas, expandirGastos
 } from './services/api';
 
 export default function App() {
@@ -35,7 +35,8 @@ export default function App() {
       const [catRes, carRes, metRes] = await Promise.all([
         getCategorias(),
         getCartoes({ include_inactive: true }),
-        getMetas(),
+        // Só totais e subtotais; as contribuições são carregadas ao abrir cada responsável
+        getMetas({ incluir_contribuicoes: false }),
       ]);
 
       const todosOsCartoes = carRes.data;
@@ -46,13 +47,16 @@ export default function App() {
       setMetas(metRes.data);
 
       // --- LÓGICA DE BUSCA UNIFICADA ---
-      const debitosPromise = getGastos({ ano, mes, tipo_pagamento: 'debito' });
-      const faturasPromises = todosOsCartoes.map(cartao => getFatura(cartao.id, { ano, mes }));
+      // Formato compacto: categorias e cartões vêm uma vez por resposta em vez de em cada gasto
+      const debitosPromise = getGastos({ ano, mes, tipo_pagamento: 'debito', formato: 'compacto' });
+      // Uma única requisição traz a fatura do mês de todos os cartões
+      const mesFatura = `${ano}-${String(mes).padStart(2, '0')}`;
+      const faturasPromise = getFaturasLote({ inicio: mesFatura, detalhar: true, formato: 'compacto' });
       
-      const [debitosRes, ...faturasRes] = await Promise.all([debitosPromise, ...faturasPromises]);
+      const [debitosRes, faturasRes] = await Promise.all([debitosPromise, faturasPromise]);
       
-      const gastosDeFaturas = faturasRes.flatMap(res => res.data.gastos);
-      const gastosConsolidados = [...debitosRes.data, ...gastosDeFaturas];
+      const gastosDeFaturas = faturasRes.data.faturas.flatMap(fatura => expandirGastos(faturasRes.data, fatura.linhas));
+      const gastosConsolidados = [...expandirGastos(debitosRes.data), ...gastosDeFaturas];
       gastosConsolidados.sort((a, b) => new Date(b.data) - new Date(a.data));
       
       setGastosDoMes(gastosConsolidados);
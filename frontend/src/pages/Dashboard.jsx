@@ -15,7 +15,7 @@ import ExpenseChart from '../components/ExpenseChart';
 import ExpenseTable from '../components/ExpenseTable';
 import InstallmentTable from '../components/InstallmentTable';
 import Forms from '../components/Forms';
-import { getCategorias, createCategoria, deleteCategoria, getGastos, createGasto, getCartoes, updateGasto, deleteGasto, getFatura } from '../services/api';
+import { getCategorias, createCategoria, deleteCategoria, getGastos, createGasto, getCartoes, updateGasto, deleteGasto, getResumo, getResumoFatura } from '../services/api';
 import { formatCurrency } from '../utils/formatters';
 
 const getTodayString = () => new Date().toISOString().split('T')[0];
@@ -62,6 +62,25 @@ export default function Dashboard({ onEditGasto, dadosCompartilhados, setCurrent
     const [responsavelFiltro, setResponsavelFiltro] = useState('Todos');
     
     const [previaFatura, setPreviaFatura] = useState(null);
+    const [resumo, setResumo] = useState(null);
+
+    // Os totais dos KPIs são somados no servidor; gastosDoMes muda a cada fetchData, então refaz a busca junto
+    useEffect(() => {
+        const fetchResumo = async () => {
+            if (!currentDate) return;
+            const ano = currentDate.getFullYear();
+            const mes = currentDate.getMonth() + 1;
+            try {
+                const res = await getResumo({ ano, mes });
+                setResumo(res.data);
+            } catch (error) {
+                console.error("Erro ao buscar resumo do mês:", error);
+                setResumo(null);
+            }
+        };
+
+        fetchResumo();
+    }, [currentDate, gastosDoMes]);
 
     useEffect(() => {
         const fetchPreviaFatura = async () => {
@@ -69,8 +88,8 @@ export default function Dashboard({ onEditGasto, dadosCompartilhados, setCurrent
                 const ano = currentDate.getFullYear();
                 const mes = currentDate.getMonth() + 1;
                 try {
-                    const res = await getFatura(kpiCardFilter, { ano, mes });
-                    const totalFatura = res.data.gastos.reduce((sum, g) => sum + g.valor, 0);
+                    const res = await getResumoFatura(kpiCardFilter, { ano, mes });
+                    const totalFatura = res.data.total;
                     const dataFechamento = new Date(res.data.periodo_fim + 'T00:00:00');
                     setPreviaFatura({
                         total: formatCurrency(totalFatura),
@@ -125,19 +144,12 @@ export default function Dashboard({ onEditGasto, dadosCompartilhados, setCurrent
     }, [gastosDoMes, chartSourceFilter, chartCardFilter, responsavelFiltro]);
 
     const { gastoTotal, totalCartoesFiltrado, totalDebito } = useMemo(() => {
-        const gastosCartao = (gastosDoMes || []).filter(g => g.cartao);
-        const gastosDebito = (gastosDoMes || []).filter(g => !g.cartao);
-        const totalDebito = gastosDebito.reduce((sum, g) => sum + g.valor, 0);
-        
-        const cartoesParaSomar = kpiCardFilter === 'todos' 
-            ? gastosCartao 
-            : gastosCartao.filter(g => g.cartao.id === kpiCardFilter);
-        const totalCartoesFiltrado = cartoesParaSomar.reduce((sum, g) => sum + g.valor, 0);
-        
-        const gastoTotalGeral = totalDebito + gastosCartao.reduce((sum, g) => sum + g.valor, 0);
-        
-        return { gastoTotal: gastoTotalGeral, totalCartoesFiltrado, totalDebito };
-    }, [gastosDoMes, kpiCardFilter]);
+        if (!resumo) return { gastoTotal: 0, totalCartoesFiltrado: 0, totalDebito: 0 };
+        const totalCartoesFiltrado = kpiCardFilter === 'todos'
+            ? resumo.total_cartoes
+            : (resumo.por_cartao.find(c => c.id === kpiCardFilter)?.total || 0);
+        return { gastoTotal: resumo.total, totalCartoesFiltrado, totalDebito: resumo.total_debito };
+    }, [resumo, kpiCardFilter]);
     
     const numTransacoes = useMemo(() => gastosFiltrados.length, [gastosFiltrados]);
     const gastoMedio = useMemo(() => numTransacoes > 0 ? (gastoTotal / numTransacoes) : 0, [gastoTotal, numTransacoes]);
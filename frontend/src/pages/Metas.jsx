@@ -1,25 +1,53 @@
-import React, { useState, useMemo } from 'react';
+import React, { useState, useEffect } from 'react';
 import { Box, Grid, Typography, Card, CardContent, LinearProgress, Button, TextField, Dialog, DialogActions, DialogContent, DialogTitle, Divider, List, ListItem, ListItemText, Accordion, AccordionSummary, AccordionDetails, IconButton, CardActions } from '@mui/material';
 import { useSnackbar } from 'notistack';
 import ExpandMoreIcon from '@mui/icons-material/ExpandMore';
 import DeleteIcon from '@mui/icons-material/Delete';
-import { createMeta, deleteMeta, addContribuicaoToMeta, deleteContribuicao } from '../services/api';
+import { createMeta, deleteMeta, addContribuicaoToMeta, deleteContribuicao, getContribuicoesMeta } from '../services/api';
 import { formatCurrency } from '../utils/formatters';
 
 const getTodayString = () => new Date().toISOString().split('T')[0];
 
+// Tamanho da página de contribuições carregada por responsável
+const CONTRIBUICOES_POR_PAGINA = 50;
+
+const ContribuicoesDoResponsavel = ({ metaId, subtotal, onDeleteContribuicao }) => {
+    const [aberto, setAberto] = useState(false);
+    const [contribuicoes, setContribuicoes] = useState([]);
+    const [proximoCursor, setProximoCursor] = useState(null);
+
+    const carregar = async (cursor = null) => {
+        const params = { responsavel: subtotal.responsavel, limit: CONTRIBUICOES_POR_PAGINA };
+        if (cursor) params.cursor = cursor;
+        const res = await getContribuicoesMeta(metaId, params);
+        setContribuicoes(anteriores => (cursor ? [...anteriores, ...res.data.itens] : res.data.itens));
+        setProximoCursor(res.data.proximo_cursor);
+    };
+
+    // Recarrega a primeira página quando aberto ou quando o subtotal muda (nova contribuição ou exclusão)
+    useEffect(() => {
+        if (aberto) carregar();
+    }, [aberto, subtotal.total, subtotal.quantidade]);
+
+    return (
+        <Accordion expanded={aberto} onChange={(_, expandido) => setAberto(expandido)} sx={{ boxShadow: 'none', '&:before': { display: 'none' } }}>
+            <AccordionSummary expandIcon={<ExpandMoreIcon />}><Typography sx={{ flexGrow: 1 }}>{subtotal.responsavel}</Typography><Typography sx={{ fontWeight: 'bold' }}>{formatCurrency(subtotal.total)}</Typography></AccordionSummary>
+            <AccordionDetails sx={{ p: 0 }}>
+                <List dense>
+                    {contribuicoes.map(c => (
+                        <ListItem key={c.id} disableGutters secondaryAction={<IconButton edge="end" onClick={() => onDeleteContribuicao(c.id)}><DeleteIcon fontSize="small" /></IconButton>}>
+                            <ListItemText primary={formatCurrency(c.valor)} secondary={new Date(c.data_contribuicao).toLocaleDateString('pt-BR', { timeZone: 'UTC' })} />
+                        </ListItem>
+                    ))}
+                </List>
+                {proximoCursor && <Button size="small" onClick={() => carregar(proximoCursor)}>Carregar mais</Button>}
+            </AccordionDetails>
+        </Accordion>
+    );
+};
+
 const MetaCard = ({ meta, onContribuir, onDelete, onDeleteContribuicao }) => {
     const progresso = meta.valor_objetivo > 0 ? (meta.valor_atual / meta.valor_objetivo) * 100 : 0;
-    const contribuicoesAgrupadas = useMemo(() => {
-        return (meta.contribuicoes || []).reduce((acc, c) => {
-            if (!acc[c.responsavel]) {
-                acc[c.responsavel] = { total: 0, contribuicoes: [] };
-            }
-            acc[c.responsavel].total += c.valor;
-            acc[c.responsavel].contribuicoes.push(c);
-            return acc;
-        }, {});
-    }, [meta.contribuicoes]);
 
     return (
         <Card sx={{ height: '100%', display: 'flex', flexDirection: 'column' }}>
@@ -37,21 +65,10 @@ const MetaCard = ({ meta, onContribuir, onDelete, onDeleteContribuicao }) => {
                 </Box>
                 <Divider sx={{ my: 1 }} />
                 <Typography variant="subtitle2" sx={{ mb: 1 }}>Contribuições:</Typography>
-                {Object.entries(contribuicoesAgrupadas).map(([responsavel, dados]) => (
-                    <Accordion key={responsavel} sx={{ boxShadow: 'none', '&:before': { display: 'none' } }}>
-                        <AccordionSummary expandIcon={<ExpandMoreIcon />}><Typography sx={{ flexGrow: 1 }}>{responsavel}</Typography><Typography sx={{ fontWeight: 'bold' }}>{formatCurrency(dados.total)}</Typography></AccordionSummary>
-                        <AccordionDetails sx={{ p: 0 }}>
-                            <List dense>
-                                {(dados.contribuicoes || []).map(c => (
-                                    <ListItem key={c.id} disableGutters secondaryAction={<IconButton edge="end" onClick={() => onDeleteContribuicao(c.id)}><DeleteIcon fontSize="small" /></IconButton>}>
-                                        <ListItemText primary={formatCurrency(c.valor)} secondary={new Date(c.data_contribuicao).toLocaleDateString('pt-BR', { timeZone: 'UTC' })} />
-                                    </ListItem>
-                                ))}
-                            </List>
-                        </AccordionDetails>
-                    </Accordion>
+                {(meta.subtotais || []).map(subtotal => (
+                    <ContribuicoesDoResponsavel key={subtotal.responsavel} metaId={meta.id} subtotal={subtotal} onDeleteContribuicao={onDeleteContribuicao} />
                 ))}
-                {(meta.contribuicoes || []).length === 0 && <Typography variant="body2" color="text.secondary">Nenhuma contribuição ainda.</Typography>}
+                {(meta.subtotais || []).length === 0 && <Typography variant="body2" color="text.secondary">Nenhuma contribuição ainda.</Typography>}
             </CardContent>
             <CardActions>
                 <Button size="small" onClick={() => onContribuir(meta.id)}>Contribuir</Button>
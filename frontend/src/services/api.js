@@ -15,9 +15,23 @@ export const createGasto = (gasto) => api.post('/gastos/', gasto);
 export const updateGasto = (id, gastoData) => api.put(`/gastos/${id}`, gastoData);
 export const deleteGasto = (id) => api.delete(`/gastos/${id}`);
 
+// Converte uma resposta com formato=compacto em objetos de gasto com categoria e cartão embutidos
+export const expandirGastos = (payload, linhas = payload.linhas) => {
+    const categorias = new Map(payload.categorias.map(c => [c.id, c]));
+    const cartoes = new Map(payload.cartoes.map(c => [c.id, c]));
+    return linhas.map(linha => {
+        const gasto = {};
+        payload.campos.forEach((campo, i) => { gasto[campo] = linha[i]; });
+        gasto.categoria = categorias.get(gasto.categoria_id);
+        gasto.cartao = gasto.cartao_id == null ? null : cartoes.get(gasto.cartao_id);
+        return gasto;
+    });
+};
+
 // --- Funções de Meta ---
-export const getMetas = () => api.get('/metas/');
+export const getMetas = (params) => api.get('/metas/', { params });
 export const createMeta = (meta) => api.post('/metas/', meta);
+export const getContribuicoesMeta = (metaId, params) => api.get(`/metas/${metaId}/contribuicoes/`, { params });
 export const addContribuicaoToMeta = (metaId, contribuicao) => api.post(`/metas/${metaId}/contribuicoes/`, contribuicao);
 export const deleteMeta = (id) => api.delete(`/metas/${id}`);
 export const deleteContribuicao = (id) => api.delete(`/contribuicoes/${id}`);
@@ -30,5 +44,10 @@ export const reactivateCartao = (id) => api.post(`/cartoes/${id}/reactivate`);
 
 // --- Funções de Fatura ---
 export const getFatura = (cartaoId, params) => api.get(`/faturas/${cartaoId}`, { params });
+export const getFaturasLote = (params) => api.get('/faturas/batch', { params });
+
+// --- Funções de Resumo (totais calculados no servidor) ---
+export const getResumo = (params) => api.get('/resumo', { params });
+export const getResumoFatura = (cartaoId, params) => api.get(`/resumo/fatura/${cartaoId}`, { params });
 
 export default api;
\ No newline at end of file
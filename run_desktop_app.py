@@ -1,10 +1,27 @@
 import sys
 import os
 import threading
-import uvicorn
-import webview
 import shutil # <-- LINHA ADICIONADA E CORRIGIDA
-from backend.app.main import app as fastapi_app
+
+# uvicorn, webview e o backend (FastAPI + SQLAlchemy) são importados só onde são usados:
+# a janela abre com uma tela de espera enquanto o servidor carrega em outra thread.
+
+HOST = "127.0.0.1"
+PORTA = 8000
+# Segundos esperando o servidor antes de mostrar a tela de erro
+TEMPO_MAXIMO_INICIALIZACAO = 60
+
+TELA_CARREGANDO = """
+<html><body style="font-family: sans-serif; display: flex; align-items: center; justify-content: center; height: 100vh; margin: 0; color: #555;">
+<p>Iniciando a Calculadora Financeira...</p>
+</body></html>
+"""
+
+TELA_ERRO = """
+<html><body style="font-family: sans-serif; display: flex; align-items: center; justify-content: center; height: 100vh; margin: 0; color: #b00;">
+<p>Não foi possível iniciar o servidor local. Verifique se a porta 8000 está livre e abra o aplicativo novamente.</p>
+</body></html>
+"""
 
 # --- FUNÇÃO AUXILIAR PARA ENCONTRAR ARQUIVOS EMPACOTADOS ---
 def resource_path(relative_path):
@@ -17,14 +34,12 @@ def resource_path(relative_path):
 
     return os.path.join(base_path, relative_path)
 
-# --- LÓGICA DO SERVIDOR ---
-def run_server():
-    # --- LÓGICA DE GERENCIAMENTO DO BANCO DE DADOS ---
-    
+# --- LÓGICA DO BANCO DE DADOS ---
+def preparar_banco_de_dados():
     # 1. Define um caminho seguro e com permissão de escrita na pasta de dados do usuário
     app_data_path = os.path.join(os.path.expanduser('~'), 'AppData', 'Roaming', 'CalculadoraFinanceira')
     os.makedirs(app_data_path, exist_ok=True) # Cria a pasta se ela não existir
-    
+
     persistent_db_path = os.path.join(app_data_path, 'app.db')
 
     # 2. Na primeira execução, copia o banco de dados do pacote para a pasta de dados
@@ -37,25 +52,62 @@ def run_server():
         else:
             print(f"AVISO: Arquivo de banco de dados 'molde' não encontrado em {bundle_db_path}")
 
+    return persistent_db_path
 
+# --- LÓGICA DO SERVIDOR ---
+def criar_servidor(host, porta, pronto):
+    """
+    Servidor uvicorn que sinaliza 'pronto' (threading.Event) quando o lifespan terminou
+    (banco aberto, esquema conferido) e a porta já aceita conexões.
+    """
+    import uvicorn
+    from backend.app.main import app as fastapi_app
+
+    class ServidorComSinal(uvicorn.Server):
+        async def startup(self, sockets=None):
+            await super().startup(sockets=sockets)
+            # 'started' fica False se o lifespan falhou ou a porta estava ocupada
+            if self.started:
+                pronto.set()
+
+    return ServidorComSinal(uvicorn.Config(fastapi_app, host=host, port=porta))
+
+def run_server(pronto):
     # 3. Usa o banco de dados persistente para iniciar o servidor
-    os.environ["DATABASE_URL"] = f"sqlite:///{persistent_db_path}"
-    
-    uvicorn.run(fastapi_app, host="127.0.0.1", port=8000)
+    caminho_banco = preparar_banco_de_dados()
+    os.environ["DATABASE_URL"] = f"sqlite:///{caminho_banco}"
+    # Um backup por dia na pasta de dados do usuário (ver backend/app/backup.py); as variáveis de ambiente mandam
+    os.environ.setdefault("BACKUP_INTERVALO_MIN", "1440")
+    os.environ.setdefault("BACKUP_PASTA", os.path.join(os.path.dirname(caminho_banco), "backups"))
+
+    criar_servidor(HOST, PORTA, pronto).run()
+
+def aguardar_servidor(janela, frontend_path, pronto, server_thread):
+    # Roda numa thread do pywebview depois que a janela aparece: o frontend só é carregado com a API no ar
+    for _ in range(TEMPO_MAXIMO_INICIALIZACAO * 10):
+        if pronto.wait(0.1):
+            janela.load_url(f'file://{frontend_path}')
+            return
+        if not server_thread.is_alive():
+            break
+    janela.load_html(TELA_ERRO)
 
 # --- LÓGICA PRINCIPAL DA APLICAÇÃO ---
 if __name__ == '__main__':
-    server_thread = threading.Thread(target=run_server)
+    servidor_pronto = threading.Event()
+    server_thread = threading.Thread(target=run_server, args=(servidor_pronto,))
     server_thread.daemon = True
     server_thread.start()
 
+    import webview
+
     frontend_path = resource_path(os.path.join("frontend", "dist", "index.html"))
 
-    webview.create_window(
+    janela = webview.create_window(
         'Calculadora Financeira',
-        f'file://{frontend_path}',
+        html=TELA_CARREGANDO,
         width=1280,
         height=720,
         min_size=(1024, 600)
     )
-    webview.start()
\ No newline at end of file
+    webview.start(aguardar_servidor, (janela, frontend_path, servidor_pronto, server_thread))